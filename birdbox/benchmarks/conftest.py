@@ -0,0 +1,35 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+
+import pytest
+import wagtail
+
+
+@pytest.fixture(scope="session")
+def benchmark_results(request):
+    """A dict of benchmark name: Measurement.as_dict() results, written to
+    the file given by --benchmark-json once all the benchmarks have run"""
+    results = {}
+    yield results
+
+    path = request.config.getoption("--benchmark-json")
+    if path and results:
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "created": datetime.now(timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "wagtail": wagtail.__version__,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
@@ -0,0 +1,63 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Stylesheet requests and bytes on the wire for the fixture pages, with
+separate block CSS files versus a bundle per page type (common.css_bundles)"""
+
+import gzip
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import FileSystemStorage
+
+import pytest
+from wagtail.models import Page
+
+from common.css_bundles import build_bundles
+from common.utils import get_frontend_media
+from microsite.models import Footer, ProtocolTestPage
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+def _gzipped_size(storage, name):
+    with storage.open(name) as f:
+        return len(gzip.compress(f.read()))
+
+
+@pytest.fixture
+def rich_page(homepage):
+    "A page using lots of different blocks"
+    block_types = ("hero", "cards", "split", "columns", "callout", "captioned_image", "newsletter_form", "table")
+    return homepage.add_child(
+        instance=ProtocolTestPage(
+            title="Lots of blocks",
+            slug="lots-of-blocks",
+            body=[{"type": block_type, "value": {}} for block_type in block_types],
+        )
+    )
+
+
+def test_css_bundles(tmp_path, minimal_site_with_blog, rich_page):
+    storage = FileSystemStorage(location=tmp_path)
+    bundles = build_bundles(storage)
+    footer = Footer.load()
+    footer.display_footer = True
+
+    print(f"\n{'page':<30}{'requests':>10}{'gzipped bytes':>15}{'bundled requests':>18}{'bundled bytes':>15}")
+    for page in Page.objects.live().specific().order_by("path"):
+        media = get_frontend_media(page)
+        if footer.display_footer:
+            media += get_frontend_media(footer)
+        urls = {media_obj.absolute_path(path): None for media_obj in media for path in media_obj._css.get("all", [])}
+        separate_bytes = sum(_gzipped_size(staticfiles_storage, url[len(settings.STATIC_URL) :]) for url in urls)
+
+        bundle = bundles.get(page._meta.label_lower)
+        if bundle and len(urls) > 1:
+            bundled_requests, bundled_bytes = 1, _gzipped_size(storage, bundle["name"])
+        else:
+            bundled_requests, bundled_bytes = len(urls), separate_bytes
+
+        print(f"{page.title[:28]:<30}{len(urls):>10}{separate_bytes:>15,}{bundled_requests:>18}{bundled_bytes:>15,}")
+        assert bundled_requests <= len(urls)
@@ -0,0 +1,38 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""How many rejected requests - 404s and 429s - a process can answer a
+second, rendering the error page every time versus serving the pre-rendered
+page (common.error_pages)"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.shortcuts import render
+from django.test import RequestFactory
+
+import pytest
+
+from common import error_pages
+
+from .utils import measure
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+@pytest.mark.parametrize("status", (404, 429))
+def test_rejected_requests_per_second(status, minimal_site_with_blog):
+    factory = RequestFactory()
+
+    def _request():
+        request = factory.get("/wp-login.php", HTTP_ACCEPT_ENCODING="gzip, br")
+        request.user = AnonymousUser()
+        return request
+
+    error_pages.clear()
+    rendered = measure("rendered every time", lambda: render(_request(), error_pages.TEMPLATES[status], status=status), iterations=50)
+    pre_rendered = measure("pre-rendered", lambda: error_pages.error_page_response(_request(), status), iterations=500)
+
+    print(f"\n{status}s:")
+    for measurement in (rendered, pre_rendered):
+        print(f"  {measurement}  {1000 / measurement.median_ms:9.0f} req/s")
+    assert pre_rendered.median_ms < rendered.median_ms
@@ -0,0 +1,189 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""What it costs to render a representative page of each page type, through
+the test client with all the middleware: wall time, queries and memory
+allocated per request. The site has a nav of 10 sections of 10 pages each, and
+the blog index has 5,000 posts.
+
+Each page's tag version is bumped before every request, so that it's rendered
+rather than served from its stored copy (see common.compression).
+
+Results beyond THRESHOLDS fail the benchmark, listing every page that did.
+Timings vary between machines, so their thresholds are generous: they're for
+catching a page getting several times slower, while the query counts are
+exact. Run with `--benchmark-json=results.json` to keep the results.
+"""
+
+from datetime import date, timedelta
+from typing import NamedTuple
+
+from django.test import Client, override_settings
+
+import pytest
+import wagtail_factories
+
+from common.cache_tags import bump_tag_versions, page_tag
+from microsite.content_generation import bulk_add_children, stream_data
+from microsite.models import (
+    BlogIndexPage,
+    BlogPage,
+    FAQPage,
+    Footer,
+    GeneralPurposePage,
+    InnovationsContentPage,
+    LongformArticlePage,
+    MicrositeSettings,
+    ProductPage,
+    ProtocolTestPage,
+)
+from microsite.tests.factories import StructuralPageFactory
+
+from .utils import measure
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+NAV_SECTIONS = 10
+NAV_PAGES_PER_SECTION = 10
+NUM_BLOG_POSTS = 5_000
+
+
+class Threshold(NamedTuple):
+    median_ms: float
+    queries: int
+
+
+THRESHOLDS = {
+    "HomePage": Threshold(median_ms=100, queries=30),
+    # Its StreamField has both the newsletter and contact form blocks
+    "GeneralPurposePage": Threshold(median_ms=100, queries=36),
+    "ProductPage": Threshold(median_ms=100, queries=32),
+    "LongformArticlePage": Threshold(median_ms=100, queries=31),
+    "FAQPage": Threshold(median_ms=100, queries=31),
+    "InnovationsContentPage": Threshold(median_ms=100, queries=32),
+    "ProtocolTestPage": Threshold(median_ms=150, queries=33),
+    "BlogPage": Threshold(median_ms=100, queries=37),
+    "BlogIndexPage": Threshold(median_ms=300, queries=69),
+    "BlogIndexPage, last page": Threshold(median_ms=300, queries=54),
+}
+
+
+@pytest.fixture
+def site_with_nav(homepage):
+    "A site with a nav of NAV_SECTIONS sections, each of NAV_PAGES_PER_SECTION pages"
+    microsite_settings = MicrositeSettings.load()
+    microsite_settings.navigation_enabled = True
+    microsite_settings.navigation_generate_nav_from_page_tree = True
+    microsite_settings.save()
+    Footer.load()
+
+    for section_number in range(NAV_SECTIONS):
+        section = StructuralPageFactory(parent=homepage, title=f"Section {section_number}", slug=f"section-{section_number}", show_in_menus=True)
+        bulk_add_children(
+            section,
+            [
+                GeneralPurposePage(title=f"Page {section_number}.{page_number}", slug=f"page-{page_number}", show_in_menus=True)
+                for page_number in range(NAV_PAGES_PER_SECTION)
+            ],
+        )
+    return homepage
+
+
+@pytest.fixture
+def pages(site_with_nav):
+    "A page of each type, with a bit of everything it can have"
+    homepage = site_with_nav
+    homepage.content = stream_data(type(homepage).content)
+    homepage.save_revision().publish()
+
+    pages = {"HomePage": homepage}
+    for model, stream_field_name in (
+        (GeneralPurposePage, "content"),
+        (ProductPage, "content"),
+        (LongformArticlePage, "content"),
+        (FAQPage, "content"),
+        (InnovationsContentPage, "content"),
+        (ProtocolTestPage, "body"),
+    ):
+        page = model(title=model.__name__, slug=model.__name__.lower())
+        setattr(page, stream_field_name, stream_data(getattr(model, stream_field_name)))
+        pages[model.__name__] = homepage.add_child(instance=page)
+
+    blog_index = pages["BlogIndexPage"] = homepage.add_child(instance=BlogIndexPage(title="Blog", slug="blog"))
+    pages["BlogPage"] = blog_index.add_child(
+        instance=BlogPage(
+            title="Blog post",
+            slug="blog-post",
+            date=date(2024, 1, 1),
+            standfirst="A representative blog post",
+            feed_image=wagtail_factories.ImageFactory(),
+            body=stream_data(BlogPage.body),
+        )
+    )
+    return pages
+
+
+def _measure_page(name, page, query_string=""):
+    client = Client()
+    url = page.url + query_string
+
+    def _get():
+        response = client.get(url)
+        assert response.status_code == 200, f"{url}: {response.status_code}"
+        if response.streaming:
+            b"".join(response.streaming_content)
+
+    return measure(
+        name,
+        _get,
+        iterations=30,
+        warmup=5,
+        # So that the page is rendered, rather than served from its stored copy
+        setup=lambda: bump_tag_versions([page_tag(page)]),
+        count_queries=True,
+    )
+
+
+def _check(measurements, benchmark_results):
+    print()
+    failures = []
+    for measurement in measurements:
+        print(f"  {measurement}")
+        benchmark_results[f"page_rendering: {measurement.name}"] = measurement.as_dict()
+        threshold = THRESHOLDS[measurement.name]
+        if measurement.median_ms > threshold.median_ms:
+            failures.append(f"{measurement.name} took {measurement.median_ms:.1f}ms, over the {threshold.median_ms}ms threshold")
+        if measurement.queries > threshold.queries:
+            failures.append(f"{measurement.name} made {measurement.queries} queries, over the threshold of {threshold.queries}")
+    assert not failures, "\n".join(failures)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+def test_page_types(pages, benchmark_results):
+    _check(
+        [_measure_page(name, page) for name, page in pages.items() if name != "BlogIndexPage"],
+        benchmark_results,
+    )
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+def test_large_blog_index(pages, settings, benchmark_results):
+    blog_index = pages["BlogIndexPage"]
+    image = pages["BlogPage"].feed_image
+    bulk_add_children(
+        blog_index,
+        [
+            BlogPage(title=f"Blog post {i}", slug=f"blog-post-{i}", date=date(2024, 1, 1) - timedelta(days=i), feed_image=image)
+            for i in range(NUM_BLOG_POSTS)
+        ],
+    )
+    last_page = NUM_BLOG_POSTS // settings.BLOG_PAGINATION_PAGE_SIZE + 1
+
+    _check(
+        [
+            _measure_page("BlogIndexPage", blog_index),
+            _measure_page("BlogIndexPage, last page", blog_index, f"?page={last_page}"),
+        ],
+        benchmark_results,
+    )
@@ -0,0 +1,49 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""The overhead of counting and attributing a request's queries and cache
+calls (common.query_budget), for the blog index, which makes plenty of both.
+
+Requests with and without it take turns, and are compared by the quickest of
+each, as the median of a run swings by more than the overhead itself with
+whatever else the machine is doing. It's measured at about 1.3ms on 25ms, or
+5%, and 6-7% at the median."""
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+import pytest
+
+from common.cache_tags import bump_tag_versions, page_tag
+from microsite.models import BlogIndexPage
+
+from .utils import measure_interleaved
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+# Within this override, changes to settings are undone once the test is over
+@override_settings(RATELIMIT_ENABLE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+def test_query_budget_overhead(minimal_site_with_blog, benchmark_results):
+    blog_index = BlogIndexPage.objects.get()
+    client = Client()
+
+    def _get():
+        assert client.get(blog_index.url).status_code == 200
+
+    def _setup():
+        # So that the page is rendered, rather than served from its stored copy
+        bump_tag_versions([page_tag(blog_index)])
+
+    def _sample(rate):
+        return lambda: setattr(settings, "QUERY_BUDGET_SAMPLE_RATE", rate)
+
+    measurements = measure_interleaved({"not instrumented": _sample(0), "instrumented": _sample(1)}, _get, setup=_setup)
+
+    not_instrumented, instrumented = measurements
+    overhead = instrumented.min_ms / not_instrumented.min_ms - 1
+    print(f"\nBlog index\n  {not_instrumented}\n  {instrumented}\n  overhead {overhead:.0%}")
+    for measurement in measurements:
+        benchmark_results[f"query_budget: {measurement.name}"] = measurement.as_dict()
+    assert overhead < 0.25
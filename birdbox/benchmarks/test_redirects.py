@@ -0,0 +1,44 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Looking up a redirect among tens of thousands, with Wagtail's query per
+lookup versus the compiled table (common.redirects), and the cost of
+compiling the table"""
+
+import time
+
+from django.test import RequestFactory
+
+import pytest
+from wagtail.contrib.redirects.middleware import get_redirect
+from wagtail.contrib.redirects.models import Redirect
+
+from common.redirects import compile_table
+
+from .utils import measure
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+NUM_REDIRECTS = 20_000
+
+
+def test_redirect_lookups(bootstrap_minimal_site):
+    Redirect.objects.bulk_create(
+        (Redirect(old_path=f"/old/campaign-{i}", redirect_link=f"https://example.com/{i}") for i in range(NUM_REDIRECTS)),
+        batch_size=2000,
+    )
+    request = RequestFactory().get("/")
+
+    start = time.perf_counter()
+    table = compile_table(version=0)
+    compile_ms = (time.perf_counter() - start) * 1000
+    assert len(table) == NUM_REDIRECTS
+
+    paths = [f"/old/campaign-{i}/" for i in range(0, NUM_REDIRECTS, NUM_REDIRECTS // 10)] + ["/not/redirected/"]
+    queries = measure("one query per lookup", lambda: [get_redirect(request, Redirect.normalise_path(path)) for path in paths], iterations=20)
+    compiled = measure("compiled table", lambda: [table.find(None, path) for path in paths], iterations=500)
+
+    print(f"\n{NUM_REDIRECTS:,} redirects, compiled in {compile_ms:.0f}ms; {len(paths)} lookups:\n  {queries}\n  {compiled}")
+    assert table.find(None, "/old/campaign-5/").link == "https://example.com/5"
+    assert compiled.median_ms < queries.median_ms
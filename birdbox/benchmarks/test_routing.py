@@ -0,0 +1,63 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Resolving a deep URL to its page with Wagtail's tree walk versus the
+routing index (common.routing): time and queries, not counting serving it"""
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from wagtail.models import Site
+
+from common.routing import get_index
+from microsite.models import GeneralPurposePage
+from microsite.tests.factories import StructuralPageFactory
+
+from .utils import measure
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+DEPTH = 6
+
+
+@pytest.fixture
+def deep_page(homepage):
+    parent = homepage
+    for level in range(DEPTH - 1):
+        parent = StructuralPageFactory(parent=parent, slug=f"level-{level}", title=f"Level {level}")
+    return parent.add_child(instance=GeneralPurposePage(title="Deep", slug="deep"))
+
+
+def test_routing(deep_page):
+    path_components = [*(f"level-{level}" for level in range(DEPTH - 1)), "deep"]
+    path = "/" + "/".join(path_components) + "/"
+
+    def _tree_walk():
+        request = RequestFactory().get(path)
+        site = Site.find_for_request(request)
+        page, _, _ = site.root_page.localized.specific.route(request, path_components)
+        assert page.pk == deep_page.pk
+
+    def _index():
+        request = RequestFactory().get(path)
+        index = get_index()
+        route, remaining = index.match(index.find_site(request), path_components)
+        page, _, _ = route.get_page().route(request, remaining)
+        assert page.pk == deep_page.pk
+
+    results = []
+    for name, func in (("tree walk", _tree_walk), ("routing index", _index)):
+        func()  # Warm up, eg build the index
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        results.append((measure(name, func), len(queries)))
+
+    print(f"\n{DEPTH} levels deep")
+    for measurement, num_queries in results:
+        print(f"  {measurement}  {num_queries} queries")
+    # In tests, the cache is in the database, so checking the index's
+    # version is a query too
+    assert results[1][1] <= 2
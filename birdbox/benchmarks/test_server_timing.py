@@ -0,0 +1,48 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""The overhead of timing a request's phases and blocks for the Server-Timing
+header (common.server_timing), for the blog index.
+
+Timed and untimed requests take turns, and are compared by the quickest of
+each (see benchmarks.utils.measure_interleaved). It's measured at 1-2%, well
+under a millisecond on 25ms, and about the same at the median."""
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+import pytest
+
+from common.cache_tags import bump_tag_versions, page_tag
+from microsite.models import BlogIndexPage
+
+from .utils import measure_interleaved
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+# Within this override, changes to settings are undone once the test is over
+@override_settings(RATELIMIT_ENABLE=False, QUERY_BUDGET_SAMPLE_RATE=0, SERVER_TIMING_SAMPLE_RATE=0)
+def test_server_timing_overhead(minimal_site_with_blog, benchmark_results):
+    blog_index = BlogIndexPage.objects.get()
+    client = Client()
+
+    def _get():
+        assert client.get(blog_index.url).status_code == 200
+
+    def _setup():
+        # So that the page is rendered, rather than served from its stored copy
+        bump_tag_versions([page_tag(blog_index)])
+
+    def _sample(rate):
+        return lambda: setattr(settings, "SERVER_TIMING_SAMPLE_RATE", rate)
+
+    measurements = measure_interleaved({"not timed": _sample(0), "timed": _sample(1)}, _get, setup=_setup)
+
+    not_timed, timed = measurements
+    overhead = timed.min_ms / not_timed.min_ms - 1
+    print(f"\nBlog index\n  {not_timed}\n  {timed}\n  overhead {overhead:.0%}")
+    for measurement in measurements:
+        benchmark_results[f"server_timing: {measurement.name}"] = measurement.as_dict()
+    assert overhead < 0.25
@@ -0,0 +1,51 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Per-asset cost of serving static files with WhiteNoise at the front of
+MIDDLEWARE (the fast path) versus after the session/auth/OIDC middleware,
+where it used to be"""
+
+from django.conf import settings
+from django.templatetags.static import static
+from django.test import Client, override_settings
+
+import pytest
+
+from .utils import measure
+
+WHITENOISE = "whitenoise.middleware.WhiteNoiseMiddleware"
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+
+def _full_chain_middleware():
+    middleware = [x for x in settings.MIDDLEWARE if x != WHITENOISE]
+    middleware.insert(middleware.index("mozilla_django_oidc.middleware.SessionRefresh") + 1, WHITENOISE)
+    return middleware
+
+
+def _measure_static_asset(name, url, **client_kwargs):
+    client = Client(**client_kwargs)
+    client.cookies["sessionid"] = "not-a-real-session"
+
+    def _get():
+        response = client.get(url)
+        b"".join(response.streaming_content)
+        response.close()
+        assert response.status_code == 200
+
+    return measure(name, _get, iterations=500)
+
+
+@pytest.mark.parametrize("asset", ("admin/css/base.css", "admin/js/core.js"))
+def test_static_asset_fast_path(asset):
+    url = static(asset)
+
+    with override_settings(MIDDLEWARE=_full_chain_middleware()):
+        full_chain = _measure_static_asset("full middleware chain", url)
+    fast_path = _measure_static_asset("fast path", url)
+
+    print(f"\n{asset}\n  {full_chain}\n  {fast_path}")
+
+    assert fast_path.median_ms < full_chain.median_ms
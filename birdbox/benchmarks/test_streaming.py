@@ -0,0 +1,67 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Time to first byte for a large ProtocolTestPage, rendered in one go versus
+streamed (common.streaming), plus the time to send the whole streamed page"""
+
+from unittest import mock
+
+from django.test import Client, override_settings
+
+import pytest
+
+from common.cache_tags import bump_tag_versions, page_tag
+from microsite.models import Footer, ProtocolTestPage
+
+from .utils import measure
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+BLOCK_TYPES = ("hero", "cards", "split", "columns", "callout", "captioned_image", "table", "details")
+
+
+@pytest.fixture
+def large_page(homepage):
+    Footer.load()
+    return homepage.add_child(
+        instance=ProtocolTestPage(
+            title="Large page",
+            slug="large-page",
+            body=[{"type": block_type, "value": {}} for block_type in BLOCK_TYPES * 10],
+        )
+    )
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+def test_streaming_time_to_first_byte(large_page):
+    client = Client()
+    # Warm up the manifest, so that the page's headers are known
+    client.get(large_page.url)
+
+    def _get():
+        # Stale the stored copy, so that every request renders the page
+        bump_tag_versions([page_tag(large_page)])
+        response = client.get(large_page.url)
+        assert response.status_code == 200
+        return response
+
+    def _first_byte():
+        response = _get()
+        if response.streaming:
+            next(iter(response.streaming_content))
+
+    def _whole_page():
+        response = _get()
+        # The test cache is small enough that the manifest can be culled, in
+        # which case the page isn't streamed
+        if response.streaming:
+            b"".join(response.streaming_content)
+
+    with mock.patch.object(ProtocolTestPage, "stream_response", False):
+        not_streamed = measure("not streamed: first byte", _first_byte, iterations=50, warmup=5)
+    streamed = measure("streamed: first byte", _first_byte, iterations=50, warmup=5)
+    streamed_whole = measure("streamed: whole page", _whole_page, iterations=50, warmup=5)
+
+    print(f"\n{len(large_page.body)} blocks\n  {not_streamed}\n  {streamed}\n  {streamed_whole}")
+    assert streamed.median_ms < not_streamed.median_ms
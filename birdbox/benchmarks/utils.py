@@ -0,0 +1,150 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Helpers for the benchmarks in this package.
+
+Benchmarks are pytest tests marked with `@pytest.mark.benchmark`, and are only
+run when pytest is given `--run-benchmarks`, eg:
+
+    just test birdbox/benchmarks --run-benchmarks -s
+
+Add `--benchmark-json=results.json` to also write the measurements passed to
+the `benchmark_results` fixture to a file, for comparing between runs.
+"""
+
+import time
+import tracemalloc
+from statistics import mean, median, quantiles
+from typing import Callable, Dict, List, Optional
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class Measurement:
+    def __init__(self, name: str, timings_ms: List[float], peak_kb: Optional[List[float]] = None, queries: Optional[int] = None):
+        self.name = name
+        self.timings_ms = timings_ms
+        self.peak_kb = peak_kb
+        self.queries = queries
+
+    @property
+    def median_ms(self) -> float:
+        return median(self.timings_ms)
+
+    @property
+    def min_ms(self) -> float:
+        return min(self.timings_ms)
+
+    @property
+    def p95_ms(self) -> float:
+        return quantiles(self.timings_ms, n=20)[-1]
+
+    @property
+    def mean_peak_kb(self) -> Optional[float]:
+        return mean(self.peak_kb) if self.peak_kb else None
+
+    def as_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "min_ms": round(self.min_ms, 3),
+            "median_ms": round(self.median_ms, 3),
+            "p95_ms": round(self.p95_ms, 3),
+            "mean_peak_kb": round(self.mean_peak_kb, 1) if self.peak_kb else None,
+            "queries": self.queries,
+            "iterations": len(self.timings_ms),
+        }
+
+    def __str__(self):
+        description = f"{self.name:<40} min {self.min_ms:8.3f}ms  median {self.median_ms:8.3f}ms  p95 {self.p95_ms:8.3f}ms"
+        if self.peak_kb:
+            description += f"  peak alloc {self.mean_peak_kb:9.1f}KB"
+        if self.queries is not None:
+            description += f"  {self.queries:4d} queries"
+        return description
+
+
+def measure(
+    name: str,
+    func: Callable[[], object],
+    iterations: int = 200,
+    warmup: int = 20,
+    setup: Optional[Callable[[], object]] = None,
+    count_queries: bool = False,
+) -> Measurement:
+    """Call func repeatedly, recording how long each call took and the peak
+    memory it allocated. Timings and allocations are measured in separate
+    passes, because tracing allocations slows everything down.
+
+    `setup`, if given, is called before each call of func, and isn't measured.
+    With `count_queries`, the queries made by one call are counted too."""
+
+    def _call():
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    for _ in range(warmup):
+        _call()
+
+    queries = None
+    if count_queries:
+        if setup:
+            setup()
+        with CaptureQueriesContext(connection) as captured:
+            func()
+        queries = len(captured)
+
+    timings_ms = [_call() for _ in range(iterations)]
+
+    peak_kb = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            if setup:
+                setup()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            func()
+            peak_kb.append((tracemalloc.get_traced_memory()[1] - baseline) / 1024)
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(name, timings_ms, peak_kb, queries)
+
+
+def measure_interleaved(
+    variants: Dict[str, Callable[[], object]],
+    func: Callable[[], object],
+    iterations: int = 500,
+    warmup: int = 20,
+    setup: Optional[Callable[[], object]] = None,
+) -> List[Measurement]:
+    """Time func for each of `variants` - named functions that set up how it
+    should run, eg by changing settings - taking turns call by call, rather
+    than making all the calls for one variant and then the next. Whatever else
+    slows the machine down meanwhile then affects every variant alike, so they
+    can be compared with each other, best by their `min_ms`: the time a call
+    takes when nothing else gets in its way. Allocations aren't measured."""
+    names = list(variants)
+    timings_ms = {name: [] for name in names}
+
+    def _call(name):
+        variants[name]()
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        return (time.perf_counter() - start) * 1000
+
+    for i in range(warmup + iterations):
+        # Alternating the order, so that no variant always follows the same one
+        for name in names if i % 2 == 0 else reversed(names):
+            timing = _call(name)
+            if i >= warmup:
+                timings_ms[name].append(timing)
+
+    return [Measurement(name, timings_ms[name]) for name in names]
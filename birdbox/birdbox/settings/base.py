@@ -9,6 +9,7 @@ Django settings for birdbox project.
 # Build paths inside the project like this: os.path.join(BIRDBOX_BASE_DIR, ...)
 import os
 import sys
+import tempfile
 from os.path import abspath
 from pathlib import Path
 
@@ -48,6 +49,7 @@ def path_from_root(*args):
 INSTALLED_APPS = [
     "wagtail.contrib.forms",
     "wagtail.contrib.redirects",
+    "wagtail.contrib.routable_page",
     "wagtail.contrib.settings",
     "wagtail.contrib.table_block",
     "wagtail.contrib.modeladmin",
@@ -80,24 +82,79 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "common.middleware.remove_vary_on_cookie_for_statics",  # Must go above SessionMiddleware so that it runs last on the response
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "common.middleware.response_compression",  # Must go first, so that it sees the final response
+    "django.middleware.security.SecurityMiddleware",
+    # Static assets are served here, before any session, auth or rate-limiting
+    # work is done - which also means they never get a `Vary: Cookie` header
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Liveness and readiness probes are answered here, for the same reasons
+    "common.middleware.health_checks",
+    "common.middleware.profiling",
+    "common.middleware.block_profiling",
+    "common.middleware.server_timing",
+    "common.middleware.query_budget",
+    # Skips session work for anonymous visitors, so their pages don't get `Vary: Cookie`
+    "common.middleware.CookielessSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "django.middleware.security.SecurityMiddleware",
     # In case someone has their Auth0 revoked while logged in, revalidate it:
     "mozilla_django_oidc.middleware.SessionRefresh",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
     # set_remote_addr_from_forwarded_for must come before rate_limiter
     "common.middleware.set_remote_addr_from_forwarded_for",
     "common.middleware.rate_limiter",
     "django_ratelimit.middleware.RatelimitMiddleware",
-    "wagtail.contrib.redirects.middleware.RedirectMiddleware",
+    # In place of wagtail.contrib.redirects.middleware.RedirectMiddleware
+    "common.middleware.redirects",
 ]
 
+# Paths that always get full session handling, even for visitors without a
+# session cookie - see common.middleware.CookielessSessionMiddleware
+SESSION_REQUIRED_PATH_PREFIXES = [
+    "/admin/",
+    "/django-admin/",
+    "/oidc/",
+    "/handle-contact-form/",
+]
+
+# Redirects for everything under a path, which take priority over pages -
+# see common.redirects. Redirects for single paths are managed in the CMS.
+PREFIX_REDIRECTS = {
+    "/builders/": "https://builders.mozilla.org",
+}
+
+# Query budgets - see common.query_budget. The share of requests to count the
+# queries and cache calls of, from 0 to 1
+QUERY_BUDGET_SAMPLE_RATE = config("QUERY_BUDGET_SAMPLE_RATE", default="0", parser=float)
+# Raise an exception, rather than log a warning, when a request is over budget
+QUERY_BUDGET_RAISE = config("QUERY_BUDGET_RAISE", default="False", parser=bool)
+# Max queries per request, by page model, URL name or "default"
+QUERY_BUDGETS = {
+    "default": 30,
+    "microsite.BlogIndexPage": 40,
+}
+
+# The share of requests, from 0 to 1, to time and send a Server-Timing header
+# for, besides those from staff - see common.server_timing
+SERVER_TIMING_SAMPLE_RATE = config("SERVER_TIMING_SAMPLE_RATE", default="0", parser=float)
+
+# The share of requests, from 0 to 1, to profile the rendering of each type of
+# StreamField block on, for the admin report - see common.block_profiling
+BLOCK_PROFILING_SAMPLE_RATE = config("BLOCK_PROFILING_SAMPLE_RATE", default="0.01", parser=float)
+
+# Stack-sampled request profiles - see common.profiling. Off unless enabled;
+# once it is, staff can ask for a profile with an X-Birdbox-Profile header
+PROFILING_ENABLED = config("PROFILING_ENABLED", default="False", parser=bool)
+# The share of requests, from 0 to 1, to profile regardless
+PROFILING_SAMPLE_RATE = config("PROFILING_SAMPLE_RATE", default="0", parser=float)
+# Seconds between samples of a profiled request's stack
+PROFILING_INTERVAL = config("PROFILING_INTERVAL", default="0.005", parser=float)
+# Where profiles are stored, and how many of the latest are kept
+PROFILING_DIR = config("PROFILING_DIR", default=os.path.join(tempfile.gettempdir(), "birdbox-profiles"))
+PROFILING_MAX_PROFILES = config("PROFILING_MAX_PROFILES", default="50", parser=int)
+
 ROOT_URLCONF = "birdbox.urls"
 
 TEMPLATES = [
@@ -155,6 +212,64 @@ else:
         }
     }
 
+# CDN purging - see common/purging.py
+
+CDN_PURGE_BACKEND = config(
+    "CDN_PURGE_BACKEND",
+    default="common.purging.LoggingPurgeBackend",
+    parser=str,
+)
+# Only used by common.purging.HTTPPurgeBackend
+CDN_PURGE_HTTP_ENDPOINT = config("CDN_PURGE_HTTP_ENDPOINT", default="", parser=str)
+CDN_PURGE_HTTP_TOKEN = config("CDN_PURGE_HTTP_TOKEN", default="", parser=str)
+
+# Wait until edits have been quiet for this long before purging...
+CDN_PURGE_DEBOUNCE_SECONDS = config("CDN_PURGE_DEBOUNCE_SECONDS", default="5", parser=float)
+# ...but never hold a purge back for longer than this
+CDN_PURGE_MAX_DELAY_SECONDS = config("CDN_PURGE_MAX_DELAY_SECONDS", default="30", parser=float)
+# Max number of URLs or keys sent to the backend in a single call
+CDN_PURGE_BATCH_SIZE = config("CDN_PURGE_BATCH_SIZE", default="250", parser=int)
+
+# Response headers listing the cache tags (surrogate keys) a page depends on,
+# mapped to the separator each CDN expects - see common/cache_tags.py
+CACHE_TAG_HEADERS = {
+    "Surrogate-Key": " ",  # Fastly
+    "Cache-Tag": ",",  # Cloudflare
+}
+# Fastly and Cloudflare both cap these headers at 16KB
+CACHE_TAG_HEADER_MAX_LENGTH = config("CACHE_TAG_HEADER_MAX_LENGTH", default="16000", parser=int)
+
+# Maximum number of critical resources listed in a page's `Link: rel=preload`
+# header - see common/preload.py
+PRELOAD_MAX_LINKS = config("PRELOAD_MAX_LINKS", default="10", parser=int)
+
+# Compression of HTML responses - see common/compression.py. Brotli ("br") is
+# only used if the brotli package is installed. Levels are 1-9 for gzip and
+# 0-11 for Brotli: run `manage.py compression_report` to see the tradeoff
+
+RESPONSE_COMPRESSION_ENCODINGS = config(
+    "RESPONSE_COMPRESSION_ENCODINGS",
+    default="br,gzip",
+    parser=ListOf(str),
+)
+RESPONSE_COMPRESSION_LEVELS = {
+    "br": config("RESPONSE_COMPRESSION_BROTLI_LEVEL", default="6", parser=int),
+    "gzip": config("RESPONSE_COMPRESSION_GZIP_LEVEL", default="6", parser=int),
+}
+RESPONSE_COMPRESSION_MIN_LENGTH = 200
+RESPONSE_COMPRESSION_CONTENT_TYPES = [
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "image/svg+xml",
+]
+
 # Storage
 # If config is available, we use Google Cloud Storage, else (for local dev)
 # fall back to filesytem storage
@@ -254,6 +369,10 @@ WHITENOISE_ROOT = config(
 # (Which shouldn't be accessed in production anyway)
 WHITENOISE_MAX_AGE = 24 * 60 * 60  # 24 hours
 
+# Files with a hash in their name - those from collectstatic, plus the CSS
+# bundles from common/css_bundles.py - are cached forever
+WHITENOISE_IMMUTABLE_FILE_TEST = r"^.+\.[0-9a-f]{12}\..+$"
+
 # Wagtail settings
 
 WAGTAIL_SITE_NAME = "birdbox"
@@ -394,13 +513,17 @@ LOGGING = {
 # Note that we ignore at the Sentry client level
 ignore_logger("django.security.DisallowedHost")
 
+# The release being run, as set by the deployment. Used by Sentry, and in ETags
+# because a new release may render pages differently
+GIT_SHA = config("GIT_SHA", default="")
+
 # Sentry
 SENTRY_DSN = config("SENTRY_DSN", default="")
 
 if SENTRY_DSN:
     sentry_sdk.init(
         dsn=SENTRY_DSN,
-        release=config("GIT_SHA", default=""),
+        release=GIT_SHA,
         server_name=".".join(x for x in ["birdbox", APP_NAME] if x),
         integrations=[DjangoIntegration()],
     )
@@ -430,6 +553,10 @@ WATCHMAN_CHECKS = (
     "watchman.checks.caches",
     "watchman.checks.databases",
 )
+# The checks are run in the background, rather than per probe - see common.health
+READINESS_CHECK_INTERVAL = config("READINESS_CHECK_INTERVAL", default="10", parser=float)
+# A result older than this fails the probe, as the checker must have stalled
+READINESS_MAX_AGE = config("READINESS_MAX_AGE", default="30", parser=float)
 
 # Security settings (see `manage.py check --deploy`)
 
@@ -467,6 +594,12 @@ SECURE_HSTS_INCLUDE_SUBDOMAINS = False
 # Custom CSRF failure view to show custom CSRF messaging
 CSRF_FAILURE_VIEW = "common.views.csrf_failure"
 
+# When True, forms are rendered without a CSRF token in the page, and the
+# token is fetched from the (uncached) csrf-token endpoint just before the form
+# is submitted. This keeps pages with forms identical for every visitor, so
+# they can be cached at the CDN like any other page.
+FORMS_FETCH_CSRF_TOKEN = config("FORMS_FETCH_CSRF_TOKEN", default="False", parser=bool)
+
 # Authentication with Mozilla OpenID Connect / Auth0
 
 LOGIN_ERROR_URL = "/admin/"
@@ -690,6 +823,13 @@ BLOG_PAGINATION_PAGE_SIZE = config(
     parser=int,
 )
 
+# How many of a blog's latest posts are in its RSS and Atom feeds
+BLOG_FEED_LENGTH = config(
+    "BLOG_FEED_LENGTH",
+    default="20",
+    parser=int,
+)
+
 # For analytics
 GOOGLE_TAG_ID = config("GOOGLE_TAG_ID", default="", parser=str)
 
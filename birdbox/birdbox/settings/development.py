@@ -15,3 +15,6 @@ EMAIL_BACKEND = config(
     default="django.core.mail.backends.console.EmailBackend",
     parser=str,
 )
+
+# Count every request's queries locally - see common.query_budget
+QUERY_BUDGET_SAMPLE_RATE = config("QUERY_BUDGET_SAMPLE_RATE", default="1", parser=float)
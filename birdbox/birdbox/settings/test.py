@@ -6,3 +6,9 @@ from .development import *
 
 DEBUG = False
 USE_SECURE_PROXY_HEADER = False
+
+# Purge synchronously, as soon as the transaction commits
+CDN_PURGE_DEBOUNCE_SECONDS = 0
+
+# Only profile blocks in the tests that ask for it
+BLOCK_PROFILING_SAMPLE_RATE = 0
@@ -16,9 +16,11 @@ from django_ratelimit.exceptions import Ratelimited
 from wagtail import urls as wagtail_urls
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail.documents import urls as wagtaildocs_urls
+from wagtail.urls import serve_pattern
 from watchman import views as watchman_views
 
-from common.views import csrf_failure, rate_limited, redirect_view
+from common import health
+from common.views import csrf_failure, csrf_token_view, rate_limited, serve_page
 from microsite import urls as microsite_urls
 
 handler500 = "common.views.server_error_view"
@@ -37,9 +39,10 @@ urlpatterns = [
     path("django-admin/", admin.site.urls),
     path("admin/", include(wagtailadmin_urls)),
     path("documents/", include(wagtaildocs_urls)),
+    # Normally answered by common.middleware.health_checks
     path("healthz/", watchman_views.ping, name="watchman.ping"),
-    path("readiness/", watchman_views.status, name="watchman.status"),
-    re_path("^builders/", redirect_view, {"dest": "https://builders.mozilla.org"}),
+    path("readiness/", health.readiness, name="watchman.status"),
+    path("csrf-token/", csrf_token_view, name="csrf-token"),
     path("", include(microsite_urls)),
     path(
         "robots.txt",
@@ -76,6 +79,8 @@ if settings.DEBUG:
 urlpatterns = urlpatterns + [
     # For anything not caught by a more specific rule above, hand over to
     # Wagtail's page serving mechanism. This should be the last pattern in
-    # the list:
+    # the list. Pages are found via our routing index (see common.routing),
+    # which takes the place of Wagtail's own serve view:
+    re_path(serve_pattern, serve_page, name="wagtail_serve"),
     path("", include(wagtail_urls)),
 ]
@@ -0,0 +1,179 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""How long each type of StreamField block takes to render, and how many
+queries it makes, to help decide which blocks to optimise - and which to use.
+
+A sample of requests (settings.BLOCK_PROFILING_SAMPLE_RATE) is profiled by
+common.middleware.block_profiling, timing each top-level block and counting
+the queries made while it renders (see common.instrumentation). Blocks are
+grouped by class, eg CardLayoutBlock, and for each we keep:
+
+    * the number of renders, total and slowest render time, and queries
+    * a histogram of render times, in the buckets of BUCKETS
+    * the MAX_PAGES pages with the slowest renders of that type of block
+
+At the end of each profiled request, its stats are merged into those in the
+cache, so that every process adds to the same report, which is in the admin,
+under Reports. Concurrent requests can overwrite each other's updates, losing
+a few samples, which is fine for what this is for.
+"""
+
+import random
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+from .instrumentation import in_cache_call, observing_block_renders
+
+CACHE_KEY = "block-profiles"
+
+# Upper bounds of the histogram's buckets, in milliseconds. Renders slower
+# than the last go in an extra bucket.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+MAX_PAGES = 10
+
+
+class BlockStats:
+    def __init__(self):
+        self.renders = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        # Page ID -> the slowest render on that page
+        self.pages: Dict[int, float] = {}
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.renders if self.renders else 0
+
+    @property
+    def queries_per_render(self) -> float:
+        return self.queries / self.renders if self.renders else 0
+
+    def add(self, milliseconds: float, queries: int, page_id: Optional[int]) -> None:
+        self.renders += 1
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+        self.queries += queries
+        self.histogram[next((i for i, bound in enumerate(BUCKETS) if milliseconds <= bound), len(BUCKETS))] += 1
+        if page_id is not None:
+            self._add_page(page_id, milliseconds)
+
+    def merge(self, other: "BlockStats") -> None:
+        self.renders += other.renders
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.queries += other.queries
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+        for page_id, milliseconds in other.pages.items():
+            self._add_page(page_id, milliseconds)
+
+    def percentile(self, percent: float) -> Optional[int]:
+        "The upper bound of the bucket the percentile falls in, or None if it's the last one"
+        rank = self.renders * percent / 100
+        seen = 0
+        for bound, count in zip(BUCKETS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    def _add_page(self, page_id: int, milliseconds: float) -> None:
+        self.pages[page_id] = max(self.pages.get(page_id, 0), milliseconds)
+        if len(self.pages) > MAX_PAGES:
+            del self.pages[min(self.pages, key=self.pages.get)]
+
+
+class BlockProfiles:
+    "The stats for each type of block, since `since`"
+
+    def __init__(self):
+        self.since = timezone.now()
+        self.blocks: Dict[str, BlockStats] = defaultdict(BlockStats)
+
+    def merge(self, other: "BlockProfiles") -> None:
+        for name, stats in other.blocks.items():
+            self.blocks[name].merge(stats)
+
+
+def get_profiles() -> BlockProfiles:
+    return cache.get(CACHE_KEY) or BlockProfiles()
+
+
+def reset_profiles() -> None:
+    cache.delete(CACHE_KEY)
+
+
+def _save(profiles: BlockProfiles) -> None:
+    if not profiles.blocks:
+        return
+    saved = get_profiles()
+    saved.merge(profiles)
+    cache.set(CACHE_KEY, saved, timeout=None)
+
+
+class _RequestProfiler:
+    def __init__(self):
+        self.profiles = BlockProfiles()
+        self.queries = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        if not in_cache_call():
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def observe(self, child, context) -> Iterator[None]:
+        page = context.get("page") if context is not None else None
+        queries = self.queries
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            milliseconds = (time.perf_counter() - start) * 1000
+            self.profiles.blocks[type(child.block).__name__].add(milliseconds, self.queries - queries, getattr(page, "pk", None))
+
+    @contextmanager
+    def profiling(self) -> Iterator[None]:
+        with ExitStack() as stack:
+            stack.enter_context(observing_block_renders(self.observe))
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.count_query))
+            yield
+
+
+def _profiled_stream(profiler: _RequestProfiler, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    while True:
+        with profiler.profiling():
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+    _save(profiler.profiles)
+
+
+def profile_request(get_response, request: HttpRequest) -> HttpResponse:
+    "Get the response, adding its blocks' render times and queries to the profiles if sampled"
+    if random.random() >= settings.BLOCK_PROFILING_SAMPLE_RATE:
+        return get_response(request)
+
+    profiler = _RequestProfiler()
+    with profiler.profiling():
+        response = get_response(request)
+
+    if response.streaming:
+        response.streaming_content = _profiled_stream(profiler, iter(response.streaming_content))
+    else:
+        _save(profiler.profiles)
+    return response
@@ -0,0 +1,176 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Cache tags (aka surrogate keys) for precise CDN purging.
+
+While a page is rendered, the page and the template tags it uses record what
+the output depends on - the page itself, its ancestors, images, settings
+singletons, external data - as short tags on the request. They are then sent
+as `Surrogate-Key` and `Cache-Tag` headers, so that common.purging can ask the
+CDN to drop just the responses that use a changed object.
+
+Tags are deliberately terse because CDNs cap the size of these headers:
+
+    p<id>       a page
+    c<id>       the listing of a page's children (eg a blog index)
+    i<id>       an image
+    d<id>       a document
+    <modelname> a singleton, eg micrositesettings, footer
+    nav         the site navigation
+    basket      newsletter data from basket
+    overflow    stands in for the tags of a page with too many to fit in the
+                headers, and is purged along with any other tag
+
+Each tag also has a version - the time it last changed - kept in the cache and
+bumped whenever the tag is purged. common.conditional_get uses these to build
+ETag and Last-Modified headers without rendering the page.
+"""
+
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from wagtail.contrib.settings.models import BaseGenericSetting, BaseSiteSetting
+from wagtail.documents.models import AbstractDocument
+from wagtail.images.models import AbstractImage
+from wagtail.models import Page
+
+from .utils import _gather_streamfields_from_page
+
+logger = logging.getLogger(__name__)
+
+NAV_TAG = "nav"
+BASKET_TAG = "basket"
+OVERFLOW_TAG = "overflow"
+# Never sent in headers: its version is bumped by a full purge and is part of
+# every ETag, so that a full purge changes them all
+EVERYTHING_TAG = "*"
+
+_REQUEST_ATTR = "_birdbox_cache_tags"
+_VERSION_KEY_PREFIX = "cache-tag-version:"
+
+
+def page_tag(page_or_id) -> str:
+    return f"p{getattr(page_or_id, 'pk', page_or_id)}"
+
+
+def children_tag(page_or_id) -> str:
+    return f"c{getattr(page_or_id, 'pk', page_or_id)}"
+
+
+def image_tag(image_or_id) -> str:
+    return f"i{getattr(image_or_id, 'pk', image_or_id)}"
+
+
+def document_tag(document_or_id) -> str:
+    return f"d{getattr(document_or_id, 'pk', document_or_id)}"
+
+
+def model_tag(model_or_instance) -> str:
+    "For singletons such as settings, where the whole model is one dependency"
+    return model_or_instance._meta.model_name
+
+
+def tag_for_object(model, pk) -> str:
+    if issubclass(model, Page):
+        return page_tag(pk)
+    if issubclass(model, AbstractImage):
+        return image_tag(pk)
+    if issubclass(model, AbstractDocument):
+        return document_tag(pk)
+    if issubclass(model, (BaseGenericSetting, BaseSiteSetting)):
+        return model_tag(model)
+    return f"{model._meta.model_name}-{pk}"
+
+
+def add_cache_tags(request: HttpRequest, *tags: str) -> None:
+    """Record that the response to this request depends on the given tags.
+    Safe to call with a None request, eg from a template rendered outside
+    of a request cycle."""
+    if request is None:
+        return
+    recorded = request.__dict__.setdefault(_REQUEST_ATTR, {})
+    for tag in tags:
+        if tag:
+            # A dict rather than a set, to keep insertion order - the
+            # first tags recorded are the last to be dropped if the header
+            # gets too big
+            recorded[tag] = None
+
+
+def get_cache_tags(request: HttpRequest) -> List[str]:
+    return list(getattr(request, _REQUEST_ATTR, {}))
+
+
+def tags_for_references(instance) -> Iterable[str]:
+    """Tags for the pages, images and documents referenced from any of
+    the StreamFields on the given object (eg LinkBlocks, CardBlocks,
+    ImageChooserBlocks, rich text links)"""
+    for streamvalue in _gather_streamfields_from_page(instance):
+        for model, object_id, _, _ in streamvalue.stream_block.extract_references(streamvalue):
+            yield tag_for_object(model, object_id)
+
+
+def _build_header_value(tags: List[str], separator: str, max_length: int) -> str:
+    value = separator.join(tags)
+    if len(value) <= max_length:
+        return value
+
+    # Leaving room for OVERFLOW_TAG, so that the page is still purged - along
+    # with anything else - when one of the tags that didn't fit changes
+    included = []
+    length = len(OVERFLOW_TAG)
+    for tag in tags:
+        extra = len(tag) + len(separator)
+        if length + extra > max_length:
+            break
+        included.append(tag)
+        length += extra
+    logger.warning(
+        "Cache tag header limit of %d reached: dropped %d of %d tags, in favour of the %r tag",
+        max_length,
+        len(tags) - len(included),
+        len(tags),
+        OVERFLOW_TAG,
+    )
+    return separator.join([*included, OVERFLOW_TAG])
+
+
+def set_cache_tag_headers(request: HttpRequest, response: HttpResponse, tags: Optional[List[str]] = None) -> HttpResponse:
+    "Adds the headers for the given tags, or by default those recorded on the request"
+    if tags is None:
+        tags = get_cache_tags(request)
+    if tags:
+        for header_name, separator in settings.CACHE_TAG_HEADERS.items():
+            response[header_name] = _build_header_value(
+                tags,
+                separator=separator,
+                max_length=settings.CACHE_TAG_HEADER_MAX_LENGTH,
+            )
+    return response
+
+
+def bump_tag_versions(tags: Iterable[str]) -> None:
+    "Mark the given tags as changed as of now"
+    now = time.time()
+    cache.set_many({f"{_VERSION_KEY_PREFIX}{tag}": now for tag in tags if tag}, timeout=None)
+
+
+def get_tag_versions(tags: Iterable[str]) -> Dict[str, float]:
+    """Returns a dict of tag: version. A tag with no version yet - or whose
+    version has been evicted from the cache - is given one of now, so that
+    losing a version can never make an old ETag valid again"""
+    keys = {f"{_VERSION_KEY_PREFIX}{tag}": tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        for key in missing:
+            cache.add(key, now, timeout=None)
+        versions.update(cache.get_many(missing))
+    return {tag: versions.get(key, 0) for key, tag in keys.items()}
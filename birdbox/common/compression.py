@@ -0,0 +1,204 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Compression of HTML responses, with Brotli and gzip.
+
+WhiteNoise already serves precompressed static files, so this is about the
+HTML (and other text) that Django itself generates. Compression is done by
+common.middleware.response_compression, using the encodings in
+settings.RESPONSE_COMPRESSION_ENCODINGS, in order of preference, at the level
+configured for each one.
+
+Pages with validators (see common.conditional_get) are also stored, already
+compressed in every available encoding, keyed by their URL and ETag. While
+that ETag stays current, the stored variant is served as-is, with no
+rendering or compression at all.
+
+Brotli is optional: if the `brotli` package isn't installed, only gzip is
+used.
+
+For security, responses to logged-in users and responses that used a CSRF
+token are never compressed, to avoid exposing secrets to BREACH-style attacks.
+Nor are pages that show the visitor a message, which mustn't be stored for,
+or replaced by a stored copy from, anyone else.
+"""
+
+import gzip
+import hashlib
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .conditional_get import has_messages
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+IDENTITY = "identity"
+VARIANT_TIMEOUT = 60 * 60 * 24
+
+# Headers that are either recalculated when a stored variant is served, or
+# that must never be shared between visitors
+_UNSTORED_HEADERS = {"content-length", "content-encoding", "set-cookie", "vary"}
+
+
+def _gzip(content: bytes, level: int) -> bytes:
+    # mtime=0 so that the output is the same every time
+    return gzip.compress(content, compresslevel=level, mtime=0)
+
+
+def _brotli(content: bytes, level: int) -> bytes:
+    return brotli.compress(content, quality=level)
+
+
+_COMPRESSORS = {
+    "gzip": _gzip,
+    "br": _brotli,
+}
+
+
+def get_available_encodings() -> List[str]:
+    return [encoding for encoding in settings.RESPONSE_COMPRESSION_ENCODINGS if encoding == "gzip" or (encoding == "br" and brotli)]
+
+
+def compress(content: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if level is None:
+        level = settings.RESPONSE_COMPRESSION_LEVELS[encoding]
+    return _COMPRESSORS[encoding](content, level)
+
+
+def negotiate_encoding(request: HttpRequest) -> Optional[str]:
+    """Returns the most preferred of our available encodings that the
+    client accepts, or None if it accepts none of them"""
+    accepted = {}
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in get_available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    "Each encoding is a different representation, so needs a different ETag"
+    if not encoding or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decode_etags(header: str, encoding: Optional[str]) -> str:
+    "Reverses encoded_etag() for the ETags in an If-None-Match header"
+    if not encoding:
+        return header
+    return header.replace(f'-{encoding}"', '"')
+
+
+def is_sensitive(request: HttpRequest, response: HttpResponse) -> bool:
+    return bool(
+        (hasattr(request, "user") and request.user.is_authenticated)
+        or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        or response.cookies
+        # Checked as the page is rendered, before MessageMiddleware sets the cookie
+        or has_messages(request)
+    )
+
+
+def is_compressible(response: HttpResponse) -> bool:
+    if response.has_header("Content-Encoding"):
+        return False
+    if response.status_code not in (200, 404, 410, 500, 503):
+        return False
+    content_type = response.get("Content-Type", "").split(";")[0].strip().lower()
+    if response.streaming:
+        # Only streamed pages (see common.streaming): WhiteNoise has its own
+        # precompressed copies of static files
+        return content_type == "text/html"
+    if content_type not in settings.RESPONSE_COMPRESSION_CONTENT_TYPES:
+        return False
+    return len(response.content) >= settings.RESPONSE_COMPRESSION_MIN_LENGTH
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Compresses streamed content, flushing after each chunk so that the
+    client gets each one as soon as it's ready"""
+    level = settings.RESPONSE_COMPRESSION_LEVELS[encoding]
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def compress_response(response: HttpResponse, encoding: str) -> HttpResponse:
+    if response.streaming:
+        response.streaming_content = compress_stream(response.streaming_content, encoding)
+        del response["Content-Length"]
+    else:
+        response.content = compress(response.content, encoding)
+        response["Content-Length"] = str(len(response.content))
+    response["Content-Encoding"] = encoding
+    if response.has_header("ETag"):
+        response["ETag"] = encoded_etag(response["ETag"], encoding)
+    return response
+
+
+def _variant_key(request: HttpRequest, etag: str, encoding: Optional[str]) -> str:
+    source = f"{request.build_absolute_uri()}|{etag}|{encoding or IDENTITY}"
+    return f"page-variant:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def store_variants(request: HttpRequest, response: HttpResponse) -> None:
+    """Store the response, plus a compressed copy for each available encoding,
+    for get_stored_variant(). Only responses with an ETag are stored, because
+    that is what tells us whether a stored copy is still current"""
+    etag = response.get("ETag")
+    if not etag or not is_compressible(response) or is_sensitive(request, response):
+        return
+
+    headers = {key: value for key, value in response.items() if key.lower() not in _UNSTORED_HEADERS}
+    variants: Dict[str, Tuple[bytes, Dict[str, str]]] = {
+        _variant_key(request, etag, None): (response.content, headers),
+    }
+    for encoding in get_available_encodings():
+        variants[_variant_key(request, etag, encoding)] = (compress(response.content, encoding), headers)
+    cache.set_many(variants, timeout=VARIANT_TIMEOUT)
+
+
+def get_stored_variant(request: HttpRequest, etag: str) -> Optional[HttpResponse]:
+    if has_messages(request):
+        return None
+    encoding = negotiate_encoding(request)
+    stored = cache.get(_variant_key(request, etag, encoding))
+    if stored is None:
+        return None
+
+    content, headers = stored
+    response = HttpResponse(content, headers=headers)
+    if encoding:
+        response["Content-Encoding"] = encoding
+        response["ETag"] = encoded_etag(etag, encoding)
+    # Tell the compression middleware that there's nothing left to do
+    response.precompressed = True
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
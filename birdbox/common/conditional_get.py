@@ -0,0 +1,125 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Conditional GET support (ETag and Last-Modified) for Wagtail pages.
+
+Rather than hashing the rendered HTML, which means rendering it first, the
+validators are derived from what the page depends on:
+
+* the release (settings.GIT_SHA), because templates and CSS change with it
+* the page itself and when it was last published
+* the version of every cache tag recorded the last time the page was rendered
+  (see common.cache_tags), eg the settings, the Footer, linked pages, images
+
+The tags from that last render are kept in the cache as a 'manifest' for the
+URL, so a conditional request that matches can get a 304 without the page
+being rendered at all, and common.compression can tell whether a stored copy
+of the page is still current.
+
+Responses that differ per visitor - logged-in users, pages that use a CSRF
+token or show the visitor a message, previews - get no validators.
+"""
+
+import hashlib
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from wagtail.models import Page
+
+from .cache_tags import EVERYTHING_TAG, get_cache_tags, get_tag_versions
+
+MANIFEST_TIMEOUT = 60 * 60 * 24
+
+
+def has_messages(request: HttpRequest) -> bool:
+    """Whether the visitor has messages (django.contrib.messages) to be shown
+    on the page, such as a form's thanks, added before it redirected here"""
+    # Only looks in the session if the messages cookie says there's more there
+    return len(get_messages(request)) > 0
+
+
+def _is_eligible(request: HttpRequest) -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and not getattr(request, "is_preview", False)
+        and not (hasattr(request, "user") and request.user.is_authenticated)
+        and not has_messages(request)
+    )
+
+
+def _manifest_key(request: HttpRequest, page: Page) -> str:
+    source = f"{settings.GIT_SHA}|{page.pk}|{page.last_published_at}|{request.build_absolute_uri()}"
+    return f"page-manifest:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def _compute_validators(request: HttpRequest, page: Page, tags: List[str]) -> Tuple[str, int]:
+    versions = get_tag_versions([EVERYTHING_TAG, *tags])
+
+    digest = hashlib.sha256()
+    digest.update(f"{settings.GIT_SHA}|{page.pk}|{page.last_published_at}|{request.build_absolute_uri()}".encode())
+    for tag in sorted(versions):
+        digest.update(f"|{tag}:{versions[tag]}".encode())
+
+    timestamps = list(versions.values())
+    if page.last_published_at:
+        timestamps.append(page.last_published_at.timestamp())
+
+    return quote_etag(digest.hexdigest()[:32]), int(max(timestamps))
+
+
+def get_manifest_tags(request: HttpRequest, page: Page) -> Optional[List[str]]:
+    "The cache tags recorded the last time the page was rendered, if known"
+    if not _is_eligible(request):
+        return None
+    return cache.get(_manifest_key(request, page))
+
+
+def get_current_validators(request: HttpRequest, page: Page) -> Optional[Tuple[str, int]]:
+    """Returns the (ETag, Last-Modified) the page would get if it were rendered
+    now, or None if that isn't known without rendering it"""
+
+    tags = get_manifest_tags(request, page)
+    if tags is None:
+        return None
+
+    return _compute_validators(request, page, tags)
+
+
+def get_not_modified_response(request: HttpRequest, etag: str, last_modified: int) -> Optional[HttpResponse]:
+    """Returns a 304 response if the client's copy is still current, otherwise None"""
+
+    response = HttpResponse()
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    conditional_response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    if conditional_response is response:
+        return None
+    return conditional_response
+
+
+def set_validators(request: HttpRequest, page: Page, response: HttpResponse) -> HttpResponse:
+    """Adds ETag and Last-Modified headers to a freshly rendered page, and
+    records what it depended on for get_current_validators()"""
+
+    if not _is_eligible(request) or response.status_code != 200:
+        return response
+
+    if request.META.get("CSRF_COOKIE_NEEDS_UPDATE") or response.cookies:
+        # The content (or at least the response) is specific to this visitor
+        cache.delete(_manifest_key(request, page))
+        return response
+
+    tags = get_cache_tags(request)
+    cache.set(_manifest_key(request, page), tags, timeout=MANIFEST_TIMEOUT)
+
+    etag, last_modified = _compute_validators(request, page, tags)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
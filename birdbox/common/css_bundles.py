@@ -0,0 +1,155 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Bundles of block CSS, one per page type.
+
+Pages pull in a stylesheet for each kind of block they use (see
+common.utils.get_frontend_media), which can mean a dozen separate requests.
+So, for each page type, the stylesheets of every block it can contain - plus
+the page's own and the Footer's - are concatenated into a single bundle, named
+after a hash of its content. frontend_media_for_page links to the bundle
+instead of the separate files, as long as it has everything the page needs.
+
+Bundles are built by `manage.py build_css_bundles`, straight after
+collectstatic (see docker/bin/build_staticfiles.sh), which is when the static
+files exist, but there's no database: that's why there is a bundle per page
+type, rather than one per combination of blocks actually used. The CSS is
+already minified by webpack, so bundling is just concatenation.
+
+WhiteNoise serves the bundles like any other static file, with the far-future,
+immutable caching given to files with a hash in their name (see
+WHITENOISE_IMMUTABLE_FILE_TEST).
+"""
+
+import hashlib
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Type
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db.models import Model
+from django.forms import Media
+
+from wagtail.fields import StreamField
+from wagtail.models import get_page_models
+from whitenoise.compress import Compressor
+
+# Bundles go alongside the files they are made from, so that relative url()s
+# in the CSS still work
+BUNDLE_NAME_TEMPLATE = "css/bundle.{hash}.css"
+MANIFEST_NAME = "css-bundles.json"
+
+_SOURCE_MAP_COMMENT = re.compile(rb"/\*# sourceMappingURL=.*?\*/")
+
+
+def _media_for_block(block) -> List[Media]:
+    media = []
+    if hasattr(block, "frontend_media"):
+        media.append(block.frontend_media)
+    # StructBlocks and StreamBlocks have child_blocks, ListBlocks a child_block
+    for child_block in getattr(block, "child_blocks", {}).values():
+        media.extend(_media_for_block(child_block))
+    if hasattr(block, "child_block"):
+        media.extend(_media_for_block(block.child_block))
+    return media
+
+
+def _possible_media(model: type) -> List[Media]:
+    "All the frontend media that an instance of the given model could use"
+    media = []
+    # Created without calling __init__, which for pages needs the database:
+    # frontend_media properties only use static(), not the instance's fields
+    frontend_media = getattr(model.__new__(model), "frontend_media", None)
+    if frontend_media is not None:
+        media.append(frontend_media)
+    for field in model._meta.get_fields():
+        if isinstance(field, StreamField):
+            media.extend(_media_for_block(field.stream_block))
+    return media
+
+
+def get_bundle_sources(page_model: type) -> List[str]:
+    """The URLs of all the static CSS a page of the given type could need, in
+    the order they would appear in the page"""
+    from microsite.models import Footer
+
+    sources = {}
+    for model in (page_model, Footer):
+        for media in _possible_media(model):
+            for path in media._css.get("all", []):
+                url = media.absolute_path(path)
+                if url.startswith(settings.STATIC_URL):
+                    sources[url] = None
+    return list(sources)
+
+
+def _read_source(url: str) -> bytes:
+    with staticfiles_storage.open(url[len(settings.STATIC_URL) :]) as f:
+        content = f.read()
+    # Source maps are relative to the original file, so would be wrong
+    return _SOURCE_MAP_COMMENT.sub(b"", content).strip() + b"\n"
+
+
+def _save(storage: Storage, name: str, content: bytes) -> None:
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(content))
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        return
+    # Precompressed copies, for WhiteNoise to serve
+    Compressor(quiet=True).compress(path)
+
+
+def build_bundles(storage: Optional[Storage] = None) -> Dict[str, Dict]:
+    """Builds a bundle for each page type with more than one stylesheet to
+    bundle, saving them and a manifest of them to the given storage (the
+    static files storage by default). Returns the manifest, which maps each
+    page model's label to its bundle's name and source URLs."""
+
+    storage = storage or staticfiles_storage
+    bundles = {}
+    for page_model in get_page_models():
+        sources = get_bundle_sources(page_model)
+        if len(sources) < 2:
+            continue
+        content = b"".join(_read_source(url) for url in sources)
+        name = BUNDLE_NAME_TEMPLATE.format(hash=hashlib.md5(content).hexdigest()[:12])
+        # Page types with the same blocks get the same bundle
+        if not any(bundle["name"] == name for bundle in bundles.values()):
+            _save(storage, name, content)
+        bundles[page_model._meta.label_lower] = {"name": name, "sources": sources}
+
+    _save(storage, MANIFEST_NAME, json.dumps(bundles, indent=2, sort_keys=True).encode())
+    get_bundles.cache_clear()
+    return bundles
+
+
+@lru_cache(maxsize=None)
+def get_bundles() -> Dict[str, Dict]:
+    "The manifest written by build_bundles(), or an empty dict if there isn't one"
+    try:
+        with staticfiles_storage.open(MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def get_bundle_url(page_model: Optional[Type[Model]], css: Dict[str, str]) -> Optional[str]:
+    """Returns the URL of the bundle to use instead of the given CSS, a dict of
+    URL: media type, or None if there isn't one that covers all of it.
+
+    A bundle is only worth it if it saves requests: a page with a single
+    stylesheet keeps it, rather than get a bigger bundle in its place."""
+    if page_model is None or len(css) < 2 or any(medium != "all" for medium in css.values()):
+        return None
+    bundle = get_bundles().get(page_model._meta.label_lower)
+    if not bundle or not set(css).issubset(bundle["sources"]):
+        return None
+    return f"{settings.STATIC_URL}{bundle['name']}"
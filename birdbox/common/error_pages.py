@@ -0,0 +1,124 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Pre-rendered 404, 429 and 500 pages.
+
+Error pages are what scanners spraying requests at random URLs, and anyone
+being rate limited, get - so they shouldn't cost a full render, with the
+settings, nav and footer queries that go with it, every time. Instead, each
+page is rendered once per site - which decides the theme, nav and footer - and
+kept in memory, along with a compressed copy for each encoding a client has
+asked for (see common.compression).
+
+The page is rendered with a blank, anonymous request for the site, rather
+than the visitor's, so nothing personal (eg messages) ends up in it. While
+rendering, the template tags record the cache tags of what they use (see
+common.cache_tags); the page is rendered again once any of those tags'
+versions change, ie when the settings, footer or nav are edited, or on a full
+purge.
+
+Logged-in users get a normally rendered page, as it includes the Wagtail
+userbar. The 500 page is a plain template with no dependencies, so it's
+rendered just once, without touching the database or cache.
+"""
+
+import logging
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest, HttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from wagtail.models import Site
+
+from .cache_tags import EVERYTHING_TAG, get_cache_tags, get_tag_versions
+from .compression import compress, negotiate_encoding
+from .routing import find_site
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = {
+    404: "404.html",
+    429: "429.html",
+    500: "500.html",
+}
+
+
+class ErrorPage(NamedTuple):
+    content: bytes
+    tag_versions: Dict[str, float]
+    # Compressed copies, added as clients ask for them
+    variants: Dict[str, bytes]
+
+
+_pages: Dict[Tuple[Optional[int], int], ErrorPage] = {}
+
+
+def _blank_request(request: HttpRequest, site: Site) -> HttpRequest:
+    blank = HttpRequest()
+    blank.method = "GET"
+    blank.path = blank.path_info = "/"
+    blank.META = {key: request.META[key] for key in ("SERVER_NAME", "SERVER_PORT", "HTTP_HOST", "wsgi.url_scheme") if key in request.META}
+    blank.user = AnonymousUser()
+    blank._wagtail_site = site
+    return blank
+
+
+def _render(request: HttpRequest, site: Optional[Site], status: int) -> ErrorPage:
+    if site is None:
+        return ErrorPage(render_to_string(TEMPLATES[status]).encode(), {}, {})
+    blank = _blank_request(request, site)
+    content = render_to_string(TEMPLATES[status], request=blank).encode()
+    return ErrorPage(content, get_tag_versions([EVERYTHING_TAG, *get_cache_tags(blank)]), {})
+
+
+def _is_current(page: ErrorPage) -> bool:
+    return not page.tag_versions or get_tag_versions(page.tag_versions) == page.tag_versions
+
+
+def get_error_page(request: HttpRequest, status: int) -> Optional[ErrorPage]:
+    "The pre-rendered page, or None if there isn't a site to render it for"
+    site = None
+    if status != 500:
+        site = find_site(request)
+        if site is None:
+            return None
+    key = (site.pk if site else None, status)
+    page = _pages.get(key)
+    if page is None or not _is_current(page):
+        page = _pages[key] = _render(request, site, status)
+        logger.debug("Pre-rendered the %d page for %s", status, site)
+    return page
+
+
+def error_page_response(request: HttpRequest, status: int) -> HttpResponse:
+    "A response with the error page for the given status"
+
+    # The 500 page doesn't depend on the user, who may not be available if
+    # the error was with the database
+    if status != 500 and hasattr(request, "user") and request.user.is_authenticated:
+        return render(request, TEMPLATES[status], status=status)
+
+    page = get_error_page(request, status)
+    if page is None:
+        return render(request, TEMPLATES[status], status=status)
+    encoding = negotiate_encoding(request)
+    if not encoding:
+        response = HttpResponse(page.content, status=status)
+    else:
+        if encoding not in page.variants:
+            page.variants[encoding] = compress(page.content, encoding)
+        response = HttpResponse(page.variants[encoding], status=status)
+        response["Content-Encoding"] = encoding
+    # Tell the compression middleware that there's nothing left to do
+    response.precompressed = True
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def clear() -> None:
+    "Forget all the pre-rendered pages"
+    _pages.clear()
@@ -0,0 +1,129 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Liveness and readiness probes.
+
+Running django-watchman's checks on every readiness probe means a cache round
+trip and a database query per probe, per pod - plus, as probes went through
+the rate limiter, a rate-limit counter incremented in the very cache being
+checked. Instead, each process runs the checks in a background thread every
+settings.READINESS_CHECK_INTERVAL seconds, and probes are answered from the
+latest result.
+
+Until the first checks have run, and if the latest result is older than
+settings.READINESS_MAX_AGE - when the checker thread has stalled - the probe
+fails straight away, rather than waiting or reporting stale good news.
+
+The probes are answered by common.middleware.health_checks, ahead of the
+session, auth and rate-limiting middleware.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from watchman import settings as watchman_settings
+from watchman.utils import get_checks
+from watchman.views import ping
+
+logger = logging.getLogger(__name__)
+
+
+class CheckResult(NamedTuple):
+    checks: Dict[str, Any]
+    ok: bool
+    checked_at: float
+
+
+def _is_ok(result) -> bool:
+    # A check returns either {name: status} or {name: [{alias: status}, ...]},
+    # as watchman.views.run_checks expects
+    for value in result.values():
+        statuses = [value] if isinstance(value, dict) else [status for entry in value for status in entry.values()]
+        if not all(status["ok"] for status in statuses):
+            return False
+    return True
+
+
+def run_checks() -> CheckResult:
+    "Run settings.WATCHMAN_CHECKS"
+    checks: Dict[str, Any] = {}
+    ok = True
+    for check in get_checks():
+        result = check()
+        ok = ok and _is_ok(result)
+        checks.update(result)
+    return CheckResult(checks, ok, time.monotonic())
+
+
+class ReadinessChecker:
+    "Runs the checks every settings.READINESS_CHECK_INTERVAL seconds in a daemon thread"
+
+    def __init__(self):
+        self.result: Optional[CheckResult] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.result = run_checks()
+            except Exception:
+                # watchman catches failures in the checks themselves, so this
+                # is unexpected - the result will go stale and fail the probe
+                logger.exception("Readiness checks failed to run")
+            # This thread's connection is never closed by a request finishing
+            close_old_connections()
+            self._stop.wait(settings.READINESS_CHECK_INTERVAL)
+
+    def ensure_running(self) -> None:
+        """Start the thread if this process doesn't have one yet. Threads
+        don't survive a fork, so this is done lazily, by the first probe each
+        worker gets, rather than at import"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._stop.clear()
+                self.result = None
+                threading.Thread(target=self._run, name="readiness-checker", daemon=True).start()
+                self._pid = os.getpid()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._pid = None
+
+
+checker = ReadinessChecker()
+
+
+@never_cache
+def readiness(request: HttpRequest) -> HttpResponse:
+    "Readiness: the latest result of the checks, if it's recent enough"
+    checker.ensure_running()
+    result = checker.result
+    if result is None:
+        # Not ready until the first checks have run, which is answered
+        # straight away rather than holding the worker until they have
+        return JsonResponse({"error": 503, "message": "Readiness checks haven't completed"}, status=503)
+    age = time.monotonic() - result.checked_at
+    if age > settings.READINESS_MAX_AGE:
+        logger.error("Readiness checks are stale: last run %.0fs ago", age)
+        return JsonResponse({"error": 503, "message": f"Readiness checks last ran {age:.0f}s ago"}, status=503)
+    return JsonResponse(result.checks, status=200 if result.ok else watchman_settings.WATCHMAN_ERROR_CODE)
+
+
+# Liveness is just watchman's ping: the process is up and answering requests
+PROBES = {
+    "/healthz/": ping,
+    "/readiness/": readiness,
+}
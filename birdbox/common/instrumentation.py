@@ -0,0 +1,142 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Observing a request's cache calls and StreamField block renders, for
+common.query_budget, common.server_timing and common.block_profiling.
+
+Neither Django nor Wagtail has signals for these, so the first time anything
+observes them, the methods of the configured cache backends' classes - or of
+StreamChild, for blocks - are wrapped. Outside of an observed request, the
+wrappers do no more than check a ContextVar.
+
+A cache call made by another one - eg get_or_set() calling get() - is only
+reported once, as is any query made by the cache itself. Only top-level
+blocks are reported, with the time spent on any blocks inside them included
+in theirs.
+"""
+
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, ContextManager, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from wagtail.blocks import StreamValue
+
+CACHE_METHODS = (
+    "add",
+    "get",
+    "set",
+    "touch",
+    "delete",
+    "get_many",
+    "get_or_set",
+    "has_key",
+    "incr",
+    "decr",
+    "set_many",
+    "delete_many",
+    "clear",
+)
+
+# Called with the duration of each cache call, in seconds, once it's returned
+CacheObserver = Callable[[float], None]
+
+_observers: ContextVar[Tuple[CacheObserver, ...]] = ContextVar("cache_observers", default=())
+_in_cache_call: ContextVar[bool] = ContextVar("in_cache_call", default=False)
+
+
+def in_cache_call() -> bool:
+    return _in_cache_call.get()
+
+
+def _wrap_cache_method(method):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        observers = _observers.get()
+        if not observers or _in_cache_call.get():
+            return method(*args, **kwargs)
+        token = _in_cache_call.set(True)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _in_cache_call.reset(token)
+            duration = time.perf_counter() - start
+            for observer in observers:
+                observer(duration)
+
+    wrapper._observed = True
+    return wrapper
+
+
+def _instrument_caches() -> None:
+    for alias in settings.CACHES:
+        backend_class = type(caches[alias])
+        for name in CACHE_METHODS:
+            method = getattr(backend_class, name)
+            if not getattr(method, "_observed", False):
+                setattr(backend_class, name, _wrap_cache_method(method))
+
+
+@contextmanager
+def observing_cache_calls(observer: CacheObserver) -> Iterator[None]:
+    "Report every cache call made in this context to observer"
+    _instrument_caches()
+    token = _observers.set((*_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
+
+
+# Called with each top-level block as it's about to be rendered, along with
+# the template context it's being rendered in, if any. Returns a context
+# manager that the block is rendered in.
+BlockObserver = Callable[[StreamValue.StreamChild, Optional[Any]], ContextManager]
+
+_block_observers: ContextVar[Tuple[BlockObserver, ...]] = ContextVar("block_observers", default=())
+_in_block: ContextVar[bool] = ContextVar("in_block", default=False)
+
+
+def _wrap_block_method(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        observers = _block_observers.get()
+        if not observers or _in_block.get():
+            return method(self, *args, **kwargs)
+        context = args[0] if args else kwargs.get("context")
+        token = _in_block.set(True)
+        try:
+            with ExitStack() as stack:
+                for observer in observers:
+                    stack.enter_context(observer(self, context))
+                return method(self, *args, **kwargs)
+        finally:
+            _in_block.reset(token)
+
+    wrapper._observed = True
+    return wrapper
+
+
+def _instrument_blocks() -> None:
+    "Wrap each way a block gets rendered: render(), {% include_block %} and {{ block }}"
+    for name in ("render", "render_as_block", "__str__"):
+        method = getattr(StreamValue.StreamChild, name)
+        if not getattr(method, "_observed", False):
+            setattr(StreamValue.StreamChild, name, _wrap_block_method(method))
+
+
+@contextmanager
+def observing_block_renders(observer: BlockObserver) -> Iterator[None]:
+    "Report every top-level block rendered in this context to observer"
+    _instrument_blocks()
+    token = _block_observers.set((*_block_observers.get(), observer))
+    try:
+        yield
+    finally:
+        _block_observers.reset(token)
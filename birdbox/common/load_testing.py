@@ -0,0 +1,207 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Load testing in-process, without a deployed stack - see the load_test
+management command.
+
+Requests - "hits" - are either replayed from a gunicorn access log or made up
+from the live page tree, and sent straight to the WSGI application, so they go
+through all the middleware, as they would in production. Each hit's status,
+latency, queries and cache calls (see common.instrumentation) are recorded and
+summarised in a Report.
+"""
+
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from statistics import mean
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote_to_bytes, urlparse
+from wsgiref.util import setup_testing_defaults
+
+from django.db import connections
+
+from wagtail.models import Page
+
+from .instrumentation import in_cache_call, observing_cache_calls
+
+# gunicorn's default access_log_format, as in wsgi/config.py:
+# %(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"
+ACCESS_LOG_LINE = re.compile(r'^(?P<remote_addr>\S+) \S+ \S+ \[[^\]]*\] "(?P<method>[A-Z]+) (?P<target>\S+)[^"]*" (?P<status>\d{3}) ')
+
+# Only these are safe to send again
+REPLAYED_METHODS = {"GET", "HEAD"}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Hit(NamedTuple):
+    method: str
+    target: str
+    remote_addr: str
+    host: Optional[str] = None
+
+
+class Result(NamedTuple):
+    target: str
+    status: int
+    seconds: float
+    queries: int
+    cache_calls: int
+
+
+def parse_access_log(lines: Iterable[str]) -> Tuple[List[Hit], int]:
+    "The GET and HEAD requests in a gunicorn access log, and how many lines were skipped"
+    hits = []
+    skipped = 0
+    for line in lines:
+        match = ACCESS_LOG_LINE.match(line)
+        if match is None or match["method"] not in REPLAYED_METHODS:
+            skipped += 1
+            continue
+        hits.append(Hit(match["method"], match["target"], match["remote_addr"]))
+    return hits, skipped
+
+
+def synthetic_hits(count: int, rng: random.Random, not_found_share: float = 0.05) -> List[Hit]:
+    """A mix of requests for the live, public pages, weighted towards those
+    nearer the top of the tree - which get more traffic, and tend to be the
+    listings - with a share of requests for pages that don't exist"""
+    urls = []
+    weights = []
+    for page in Page.objects.live().public().specific().filter(depth__gt=1):
+        url_parts = page.get_url_parts()
+        if not url_parts:
+            continue
+        _, root_url, page_path = url_parts
+        urls.append((urlparse(root_url).hostname, page_path))
+        weights.append(2.0 ** -(page.depth - 2))
+    if not urls:
+        return []
+
+    hits = []
+    for (host, path), number in zip(rng.choices(urls, weights, k=count), range(count)):
+        if rng.random() < not_found_share:
+            path = f"/load-test-missing-{number}/"
+        # Spread over many addresses, as real traffic would be, for the rate limiter
+        hits.append(Hit("GET", path, f"10.0.{rng.randrange(256)}.{rng.randrange(1, 255)}", host))
+    return hits
+
+
+def _environ(hit: Hit, host: str, secure: bool) -> Dict:
+    path, _, query_string = hit.target.partition("?")
+    environ = {
+        "REQUEST_METHOD": hit.method,
+        # As a WSGI server would decode it
+        "PATH_INFO": unquote_to_bytes(path).decode("iso-8859-1"),
+        "QUERY_STRING": query_string,
+        "HTTP_HOST": hit.host or host,
+        "REMOTE_ADDR": hit.remote_addr,
+        "HTTP_ACCEPT_ENCODING": "gzip, br",
+        "wsgi.url_scheme": "https" if secure else "http",
+    }
+    setup_testing_defaults(environ)
+    return environ
+
+
+def send(application: Callable, hit: Hit, host: str, secure: bool = False) -> Result:
+    "Send the hit to the WSGI application, reading the whole response"
+    counts = Counter()
+
+    def _count_query(execute, sql, params, many, context):
+        if not in_cache_call():
+            counts["queries"] += 1
+        return execute(sql, params, many, context)
+
+    def _count_cache_call(duration):
+        counts["cache_calls"] += 1
+
+    statuses = []
+
+    def _start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split(" ", 1)[0]))
+
+    with ExitStack() as stack:
+        stack.enter_context(observing_cache_calls(_count_cache_call))
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_count_query))
+        start = time.perf_counter()
+        body = application(_environ(hit, host, secure), _start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        seconds = time.perf_counter() - start
+    return Result(hit.target, statuses[0], seconds, counts["queries"], counts["cache_calls"])
+
+
+def run(send_hit: Callable[[Hit], Result], hits: List[Hit], concurrency: int, mode: str = "threads") -> Tuple[List[Result], float]:
+    "Send the hits, `concurrency` at a time, returning the results and how many seconds it all took"
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [send_hit(hit) for hit in hits]
+    elif mode == "gevent":
+        from gevent.pool import Pool
+
+        results = list(Pool(concurrency).imap(send_hit, hits))
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(send_hit, hits))
+    return results, time.perf_counter() - start
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class Report:
+    def __init__(self, results: List[Result], elapsed: float, concurrency: int):
+        self.results = results
+        self.elapsed = elapsed
+        self.concurrency = concurrency
+
+    @property
+    def statuses(self) -> Counter:
+        return Counter(result.status for result in self.results)
+
+    @property
+    def error_rate(self) -> float:
+        "The share of responses that were server errors"
+        return sum(count for status, count in self.statuses.items() if status >= 500) / len(self.results)
+
+    def as_dict(self) -> Dict:
+        latencies = sorted(result.seconds * 1000 for result in self.results)
+        queries = sorted(result.queries for result in self.results)
+        return {
+            "requests": len(self.results),
+            "concurrency": self.concurrency,
+            "elapsed_s": round(self.elapsed, 3),
+            "requests_per_s": round(len(self.results) / self.elapsed, 1),
+            "latency_ms": {
+                **{f"p{percent}": round(_percentile(latencies, percent), 2) for percent in PERCENTILES},
+                "max": round(latencies[-1], 2),
+            },
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "error_rate": round(self.error_rate, 4),
+            "queries": {
+                "mean": round(mean(queries), 1),
+                "p95": _percentile(queries, 95),
+                "max": queries[-1],
+            },
+            "cache_calls": {"mean": round(mean(result.cache_calls for result in self.results), 1)},
+        }
+
+    def slowest(self, n: int = 5) -> List[Tuple[str, float, int]]:
+        "The n paths with the highest median latency: (path, median ms, requests)"
+        by_target = defaultdict(list)
+        for result in self.results:
+            by_target[result.target].append(result.seconds * 1000)
+        medians = [(target, _percentile(sorted(latencies), 50), len(latencies)) for target, latencies in by_target.items()]
+        return sorted(medians, key=lambda item: item[1], reverse=True)[:n]
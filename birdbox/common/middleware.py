@@ -7,12 +7,23 @@
 from http import HTTPStatus
 
 from django.conf import settings
-from django.http import HttpResponseBadRequest
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.http import HttpResponseBadRequest, HttpResponsePermanentRedirect, HttpResponseRedirect
+from django.utils.cache import patch_vary_headers
 
 from django_ratelimit import ALL
 from django_ratelimit.core import is_ratelimited
 from django_ratelimit.exceptions import Ratelimited
 
+from .block_profiling import profile_request
+from .compression import compress_response, decode_etags, encoded_etag, is_compressible, is_sensitive, negotiate_encoding
+from .health import PROBES
+from .profiling import sample_stacks
+from .query_budget import track_request
+from .redirects import get_prefixes, get_table
+from .routing import find_site, is_missing_page
+from .server_timing import time_request
+
 
 def rate_limiter(get_response):
     """Enforces rate-limiting on all views.
@@ -94,29 +105,178 @@ def set_remote_addr_from_forwarded_for(get_response):
     return middleware
 
 
-def remove_vary_on_cookie_for_statics(get_response):
-    """We're using whitenoise to serve static assets, but Django is setting the
-    `Vary: Cookie` header on static assets, which is stoppping the CDN from
-    caching them effectively.
+def health_checks(get_response):
+    """Answers liveness and readiness probes (see common.health) before any
+    session, auth or rate-limiting work is done, so that probes neither load
+    sessions nor count towards - or get blocked by - the rate limit."""
+
+    def middleware(request):
+        probe = PROBES.get(request.path_info)
+        if probe is not None and request.method in ("GET", "HEAD"):
+            return probe(request)
+        return get_response(request)
+
+    return middleware
+
+
+def query_budget(get_response):
+    """Counts the queries and cache calls made by a sample of requests, and
+    complains about those that go over their budget - see common.query_budget.
+
+    This goes before the session and auth middleware, so that what they do is
+    counted too."""
+
+    def middleware(request):
+        return track_request(get_response, request)
+
+    return middleware
+
+
+def profiling(get_response):
+    """Samples the stack of a sample of requests, and of those from staff that
+    ask for it, for downloading as flame graphs - see common.profiling.
+
+    This goes before the other instrumenting middleware, so that profiles
+    show what they cost."""
+
+    def middleware(request):
+        return sample_stacks(get_response, request)
+
+    return middleware
+
+
+def block_profiling(get_response):
+    """Profiles the rendering of each type of StreamField block on a sample of
+    requests, for the admin report - see common.block_profiling.
+
+    This goes before the server_timing and query_budget middleware, so that
+    saving the profiles isn't counted by them."""
+
+    def middleware(request):
+        return profile_request(get_response, request)
+
+    return middleware
+
+
+def server_timing(get_response):
+    """Adds a Server-Timing header, breaking down where the time went, to
+    responses for staff and a sample of other requests - see
+    common.server_timing.
+
+    This goes before the query_budget middleware, so that its own overhead
+    isn't in the timings."""
+
+    def middleware(request):
+        return time_request(get_response, request)
 
-    This middleware needs to go before SessionMiddleware so that it can
-    selectively prune back the Vary: Cookie header which that middleware sets.
+    return middleware
+
+
+def response_compression(get_response):
+    """Compresses HTML and other text responses with Brotli or gzip, depending
+    on what the client accepts. See common.compression for the details.
+
+    This needs to go at the top of MIDDLEWARE, so that it sees the final
+    response, including any cookies set by the other middleware.
+    """
+
+    def middleware(request):
+        encoding = negotiate_encoding(request)
+        if encoding and "HTTP_IF_NONE_MATCH" in request.META:
+            # Let the view compare the client's ETags with its own, which are
+            # for the uncompressed content
+            request.META["HTTP_IF_NONE_MATCH"] = decode_etags(request.META["HTTP_IF_NONE_MATCH"], encoding)
+
+        response = get_response(request)
+
+        if getattr(response, "precompressed", False):
+            return response
+
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            if response.has_header("ETag"):
+                response["ETag"] = encoded_etag(response["ETag"], encoding)
+                patch_vary_headers(response, ("Accept-Encoding",))
+            return response
+
+        if not is_compressible(response) or is_sensitive(request, response):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if encoding:
+            compress_response(response, encoding)
+        return response
+
+    return middleware
+
+
+class CookielessSessionMiddleware(SessionMiddleware):
+    """Drop-in replacement for SessionMiddleware that leaves anonymous
+    visitors' page views alone.
+
+    Almost every public page view asks for the session - via request.user,
+    the messages framework, the OIDC SessionRefresh middleware and the Wagtail
+    userbar - and SessionMiddleware responds by adding `Vary: Cookie`, which
+    stops the CDN from sharing cached pages between visitors.
+
+    A visitor without a session cookie has no session to load, so for their
+    GET and HEAD requests outside settings.SESSION_REQUIRED_PATH_PREFIXES we
+    skip SessionMiddleware's response handling entirely: no `Vary: Cookie`,
+    no session save. Editors have a session cookie, so they always get the
+    full treatment, including the userbar.
+
+    If anything does put data into the session during such a request, we fall
+    back to the standard behaviour so that it is not lost.
     """
 
-    VARY_HEADER_KEY = "Vary"
-    COOKIE_VALUE = "Cookie"
+    def _is_cookieless(self, request):
+        return (
+            request.method in ("GET", "HEAD")
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and not request.path.startswith(tuple(settings.SESSION_REQUIRED_PATH_PREFIXES))
+        )
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.cookieless_session = self._is_cookieless(request)
+
+    def process_response(self, request, response):
+        if getattr(request, "cookieless_session", False) and not request.session.modified:
+            return response
+        return super().process_response(request, response)
+
+
+def redirects(get_response):
+    """Replaces Wagtail's RedirectMiddleware, using the in-memory tables in
+    common.redirects rather than querying for a Redirect on every 404.
+
+    settings.PREFIX_REDIRECTS apply to everything under their path. Wagtail's
+    Redirects only apply to what would otherwise be a 404, but are checked
+    before the view is called when it's clear that there's no page at the
+    path, so that the 404 page isn't rendered for nothing.
+    """
+
+    def _find_redirect(request):
+        site = find_site(request)
+        return get_table().find(site.pk if site else None, request.get_full_path())
+
+    def _redirect(target):
+        response_class = HttpResponsePermanentRedirect if target.is_permanent else HttpResponseRedirect
+        return response_class(target.link)
 
     def middleware(request):
+        target = get_prefixes().find(request.path_info)
+        checked = False
+        if target is None and is_missing_page(request):
+            target = _find_redirect(request)
+            checked = True
+        if target is not None:
+            return _redirect(target)
+
         response = get_response(request)
-        if response.status_code == HTTPStatus.OK and request.path.startswith(settings.STATIC_URL):
-            for key, value in list(response.headers.items()):
-                if key.lower() == VARY_HEADER_KEY.lower():
-                    split_values = [x.strip() for x in value.split(",")]
-                    if split_values == [COOKIE_VALUE]:
-                        del response.headers[key]
-                    elif COOKIE_VALUE in split_values:
-                        split_values.pop(split_values.index(COOKIE_VALUE))
-                        response.headers[key] = ", ".join(split_values)
+        if response.status_code == HTTPStatus.NOT_FOUND and not checked:
+            target = _find_redirect(request)
+            if target is not None:
+                return _redirect(target)
         return response
 
     return middleware
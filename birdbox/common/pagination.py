@@ -0,0 +1,205 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Keyset (aka cursor) pagination, for listings that crawlers page deep into.
+
+Django's Paginator counts the rows, then fetches each page with an OFFSET,
+which the database can only get to by reading every row before it. Here,
+rows are ordered by a key - eg (date, pk), newest first - and a page is the
+next `per_page` rows after the last key of the page before, which an index on
+the key's fields finds straight away, however deep the page:
+
+    ?after=2024-01-31.123   the page after the row with that key
+    ?before=2024-01-31.123  the page before it
+    ?page=3                 the third page, as with Paginator
+
+Numbered pages are found from a table of the key each page starts at, built
+with one query over just the keys and cached - along with the number of
+rows - under a key that includes the cache tag versions of whatever the
+listing depends on (see common.cache_tags), so publishing a change to the
+listing builds it again. A `page` that isn't a number is the first page, and
+one that's past the end is the last, as the blog index always did.
+"""
+
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
+
+from .cache_tags import get_tag_versions
+
+CURSOR_SEPARATOR = "."
+BOUNDARIES_TIMEOUT = 60 * 60 * 24
+
+Key = Tuple[Any, ...]
+
+
+class KeysetPage:
+    """One page of rows, with what's needed to link to the pages either side
+    and to the numbered pages - a subset of django.core.paginator.Page"""
+
+    def __init__(self, paginator: "KeysetPaginator", rows: List, number: Optional[int], has_previous: bool, has_next: bool):
+        self.paginator = paginator
+        self.object_list = paginator.transform(rows) if paginator.transform else rows
+        self.number = number
+        self._has_previous = has_previous
+        self._has_next = has_next
+        self._first_key = paginator.key_for(rows[0]) if rows else None
+        self._last_key = paginator.key_for(rows[-1]) if rows else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_previous(self) -> bool:
+        return self._has_previous
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def previous_query(self) -> str:
+        "The query string for the page before this one"
+        return f"before={self.paginator.format_cursor(self._first_key)}"
+
+    def next_query(self) -> str:
+        "The query string for the page after this one"
+        return f"after={self.paginator.format_cursor(self._last_key)}"
+
+
+class KeysetPaginator:
+    """Paginates `queryset`, ordered by `fields` - which must end with a
+    unique one, such as "pk" - in descending order. The page boundaries are
+    cached under `cache_key`, versioned by the given cache tags.
+
+    With `transform`, each page's rows are passed through it, eg to page
+    through a table of keys but list the objects they're for."""
+
+    def __init__(
+        self,
+        queryset: QuerySet,
+        per_page: int,
+        fields: Sequence[str],
+        cache_key: Optional[str] = None,
+        tags: Sequence[str] = (),
+        transform: Optional[Callable[[List], List]] = None,
+    ):
+        self.per_page = per_page
+        self.fields = list(fields)
+        self.queryset = queryset.order_by(*(f"-{field}" for field in self.fields))
+        self.cache_key = cache_key
+        self.tags = list(tags)
+        self.transform = transform
+        self._boundaries = None
+
+    # The key of a row, and its cursor
+
+    def key_for(self, obj) -> Key:
+        return tuple(getattr(obj, field) for field in self.fields)
+
+    def format_cursor(self, key: Key) -> str:
+        return CURSOR_SEPARATOR.join(str(value) for value in key)
+
+    def parse_cursor(self, cursor: str) -> Optional[Key]:
+        values = cursor.split(CURSOR_SEPARATOR)
+        if len(values) != len(self.fields):
+            return None
+        model_fields = [self.queryset.model._meta.pk if field == "pk" else self.queryset.model._meta.get_field(field) for field in self.fields]
+        try:
+            return tuple(field.to_python(value) for field, value in zip(model_fields, values))
+        except ValidationError:
+            return None
+
+    def _beyond(self, key: Key, inclusive: bool = False, reverse: bool = False) -> Q:
+        """The rows after the key in the (descending) order, or before it if
+        `reverse`: (a, b) < (a0, b0) is a < a0 or (a = a0 and b < b0)"""
+        lookup = "gt" if reverse else "lt"
+        condition = Q(**{f"{self.fields[-1]}__{lookup}{'e' if inclusive else ''}": key[-1]})
+        for field, value in zip(reversed(self.fields[:-1]), reversed(key[:-1])):
+            condition = Q(**{f"{field}__{lookup}": value}) | (Q(**{field: value}) & condition)
+        return condition
+
+    # The cached page boundaries, and the count
+
+    def _load_boundaries(self) -> Tuple[int, List[Key]]:
+        keys = list(self.queryset.values_list(*self.fields))
+        return len(keys), keys[:: self.per_page]
+
+    def _get_boundaries(self) -> Tuple[int, List[Key]]:
+        if self._boundaries is None:
+            if self.cache_key is None:
+                self._boundaries = self._load_boundaries()
+            else:
+                versions = get_tag_versions(self.tags)
+                key = f"keyset-boundaries:{self.cache_key}:{self.per_page}:" + ",".join(f"{tag}@{versions[tag]}" for tag in self.tags)
+                self._boundaries = cache.get(key)
+                if self._boundaries is None:
+                    self._boundaries = self._load_boundaries()
+                    cache.set(key, self._boundaries, timeout=BOUNDARIES_TIMEOUT)
+        return self._boundaries
+
+    @property
+    def count(self) -> int:
+        return self._get_boundaries()[0]
+
+    @property
+    def num_pages(self) -> int:
+        return max(1, len(self._get_boundaries()[1]))
+
+    @property
+    def page_range(self) -> range:
+        return range(1, self.num_pages + 1)
+
+    # Pages
+
+    def page(self, number: int) -> KeysetPage:
+        "The numbered page, or the last one if there aren't that many"
+        number = min(max(1, number), self.num_pages)
+        boundaries = self._get_boundaries()[1]
+        queryset = self.queryset
+        if number > 1:
+            queryset = queryset.filter(self._beyond(boundaries[number - 1], inclusive=True))
+        return KeysetPage(self, list(queryset[: self.per_page]), number, has_previous=number > 1, has_next=number < self.num_pages)
+
+    def page_after(self, key: Key) -> Optional[KeysetPage]:
+        rows = list(self.queryset.filter(self._beyond(key))[: self.per_page + 1])
+        if not rows:
+            return None
+        return KeysetPage(self, rows[: self.per_page], self._number_of(rows[0]), has_previous=True, has_next=len(rows) > self.per_page)
+
+    def page_before(self, key: Key) -> Optional[KeysetPage]:
+        ascending = self.queryset.reverse().filter(self._beyond(key, reverse=True))
+        rows = list(ascending[: self.per_page + 1])
+        if not rows:
+            return None
+        has_previous = len(rows) > self.per_page
+        rows = rows[: self.per_page][::-1]
+        return KeysetPage(self, rows, self._number_of(rows[0]), has_previous=has_previous, has_next=True)
+
+    def _number_of(self, first_row) -> Optional[int]:
+        "The page's number, if it starts where a numbered page does"
+        try:
+            return self._get_boundaries()[1].index(self.key_for(first_row)) + 1
+        except ValueError:
+            return None
+
+    def get_page(self, request: HttpRequest) -> KeysetPage:
+        "The page asked for by the request's `after`, `before` or `page`, or else the first"
+        for param, get in (("after", self.page_after), ("before", self.page_before)):
+            if cursor := request.GET.get(param):
+                if (key := self.parse_cursor(cursor)) is not None and (page := get(key)) is not None:
+                    return page
+                # A cursor past either end, or that isn't one
+                return self.page(self.num_pages if param == "after" and key is not None else 1)
+        try:
+            number = int(request.GET.get("page", 1))
+        except ValueError:
+            number = 1
+        return self.page(number)
@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""`Link: rel=preload` headers for a page's critical resources.
+
+As with cache tags (see common.cache_tags), the template tags that output the
+critical resources - the theme CSS, block CSS, protocol-base.js, the hero or
+featured-post image - record them on the request while the page renders, and
+they are sent as a `Link` header once it has. That header is stored with the
+precompressed copies of the page (see common.compression), so serving a page
+from there costs nothing extra.
+
+The browser can then start fetching them as soon as the headers arrive, rather
+than when it gets to them in the HTML. CDNs that support 103 Early Hints (eg
+Cloudflare) build them from the `Link` headers of cached responses; gunicorn,
+being WSGI, can't send a 103 itself.
+"""
+
+from typing import List, Tuple
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+_REQUEST_ATTR = "_birdbox_preloads"
+
+# Values for the `as` attribute that we use
+STYLE = "style"
+SCRIPT = "script"
+IMAGE = "image"
+
+
+def add_preload(request: HttpRequest, url: str, as_: str) -> None:
+    """Record that the given URL is needed early to render the page. Safe to
+    call with a None request, eg from a template rendered outside of a
+    request cycle."""
+    if request is None or not url:
+        return
+    # A dict rather than a set, to keep the order they appear in the page
+    recorded = request.__dict__.setdefault(_REQUEST_ATTR, {})
+    # Only the first image is preloaded: it's the one most likely to be the
+    # Largest Contentful Paint, and later ones would just compete with it
+    if as_ == IMAGE and IMAGE in recorded.values():
+        return
+    recorded.setdefault(url, as_)
+
+
+def get_preloads(request: HttpRequest) -> List[Tuple[str, str]]:
+    return list(getattr(request, _REQUEST_ATTR, {}).items())
+
+
+def build_link_header(preloads: List[Tuple[str, str]]) -> str:
+    return ", ".join(f"<{url}>; rel=preload; as={as_}" for url, as_ in preloads)
+
+
+def set_preload_header(request: HttpRequest, response: HttpResponse) -> HttpResponse:
+    # Preloading too much competes with what's actually critical, so the
+    # number of links is capped, keeping the first ones recorded
+    preloads = get_preloads(request)[: settings.PRELOAD_MAX_LINKS]
+    if preloads and response.status_code == 200:
+        links = build_link_header(preloads)
+        if response.has_header("Link"):
+            links = f"{response['Link']}, {links}"
+        response["Link"] = links
+    return response
@@ -0,0 +1,238 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Stack-sampled profiles of production requests, for slow requests that are
+hard to reproduce elsewhere.
+
+With settings.PROFILING_ENABLED, common.middleware.profiling profiles a
+sample of requests (settings.PROFILING_SAMPLE_RATE), and any request from
+staff with an `X-Birdbox-Profile` header - whose response then has the
+profile's ID in an `X-Birdbox-Profile-Id` header.
+
+While a request is profiled, a sampler thread records the request's stack
+every settings.PROFILING_INTERVAL seconds. It's a real OS thread even under
+gevent (see wsgi/config.py), so that it runs while the request is busy, and
+it only records stacks that end at the request's own outermost frame: under
+gevent, samples taken while other greenlets run are dropped, as are those
+taken while the request is waiting on I/O. While the request holds the GIL,
+samples can't be taken more often than sys.getswitchinterval(), 5ms by
+default. One request per process is profiled at a time.
+
+Profiles are saved as folded stacks - one `frame;frame;...;frame count` line
+per stack - which flamegraph.pl, inferno and speedscope all read, along with
+the request's route, page type and settings.GIT_SHA. The last
+settings.PROFILING_MAX_PROFILES are kept in settings.PROFILING_DIR, on each
+instance's own disk, and can be listed and downloaded by staff from the
+admin: /admin/profiles/.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from importlib import import_module
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+try:
+    from gevent.monkey import get_original
+except ImportError:  # Not installed locally
+
+    def get_original(module_name, item_name):
+        return getattr(import_module(module_name), item_name)
+
+
+REQUEST_HEADER = "HTTP_X_BIRDBOX_PROFILE"
+RESPONSE_HEADER = "X-Birdbox-Profile-Id"
+
+PROFILE_ID_PATTERN = r"[0-9]+-[0-9]+"
+
+# The real ones, rather than gevent's, so that the sampler is a thread of its own
+_start_new_thread = get_original("_thread", "start_new_thread")
+_get_ident = get_original("_thread", "get_ident")
+_allocate_lock = get_original("_thread", "allocate_lock")
+_sleep = get_original("time", "sleep")
+
+# Only one request per process is profiled at a time
+_profiling = _allocate_lock()
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    "Samples the stack of the thread - or greenlet - that starts it, until it's stopped"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.duration = 0.0
+        self._stopping = False
+        self._stopped = _allocate_lock()
+
+    def start(self) -> None:
+        root = sys._getframe()
+        while root.f_back is not None:
+            root = root.f_back
+        self._root = root
+        self._thread_id = _get_ident()
+        self._started_at = time.perf_counter()
+        self._stopped.acquire()
+        _start_new_thread(self._run, ())
+
+    def stop(self) -> None:
+        self._stopping = True
+        self._stopped.acquire()
+        self._stopped.release()
+        self.duration = time.perf_counter() - self._started_at
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _sample(self) -> Optional[str]:
+        frame = sys._current_frames().get(self._thread_id)
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame))
+            if frame is self._root:
+                return ";".join(reversed(names))
+            frame = frame.f_back
+        # Another greenlet's stack
+        return None
+
+    def _run(self) -> None:
+        try:
+            while not self._stopping:
+                stack = self._sample()
+                if stack is not None:
+                    self.stacks[stack] += 1
+                _sleep(self.interval)
+        finally:
+            self._stopped.release()
+
+
+def _directory() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+def _save(profile_id: str, sampler: StackSampler, metadata: Dict) -> None:
+    directory = _directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile_id}.folded").write_text(sampler.folded())
+    (directory / f"{profile_id}.json").write_text(json.dumps(metadata))
+    # The ring buffer: drop the oldest profiles
+    for old_id in sorted(path.stem for path in directory.glob("*.json"))[: -settings.PROFILING_MAX_PROFILES]:
+        for suffix in (".json", ".folded"):
+            (directory / f"{old_id}{suffix}").unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict]:
+    "The metadata of each stored profile, newest first"
+    if not _directory().is_dir():
+        return []
+    paths = sorted(_directory().glob("*.json"), reverse=True)
+    return [json.loads(path.read_text()) for path in paths]
+
+
+def get_profile(profile_id: str) -> Optional[str]:
+    "The folded stacks of the profile, if it's still stored"
+    if not re.fullmatch(PROFILE_ID_PATTERN, profile_id):
+        return None
+    try:
+        return (_directory() / f"{profile_id}.folded").read_text()
+    except FileNotFoundError:
+        return None
+
+
+def _metadata(profile_id: str, request: HttpRequest, response: HttpResponse, sampler: StackSampler) -> Dict:
+    page = (getattr(response, "context_data", None) or {}).get("page")
+    resolver_match = request.resolver_match
+    return {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.path,
+        "route": resolver_match.route if resolver_match else None,
+        "page_type": page._meta.label if page is not None else None,
+        "status": response.status_code,
+        "git_sha": settings.GIT_SHA,
+        "profiled_at": time.time(),
+        "duration_ms": round(sampler.duration * 1000, 1),
+        "interval_ms": round(sampler.interval * 1000, 1),
+        "samples": sum(sampler.stacks.values()),
+    }
+
+
+class _ProfiledStream:
+    """Passes on a streamed response's content, finishing the profile when
+    the response is closed - which it is whether or not it was all sent"""
+
+    def __init__(self, chunks: Iterator[bytes], finish):
+        self._chunks = chunks
+        self._finish = finish
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        if self._finish is not None:
+            self._finish()
+            self._finish = None
+
+
+def _finish(profile_id, request, response, sampler) -> None:
+    try:
+        sampler.stop()
+        _save(profile_id, sampler, _metadata(profile_id, request, response, sampler))
+    finally:
+        _profiling.release()
+
+
+def _is_staff(request: HttpRequest) -> bool:
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def sample_stacks(get_response, request: HttpRequest) -> HttpResponse:
+    "Get the response, profiled if it's sampled or asked for by staff"
+    if not settings.PROFILING_ENABLED:
+        return get_response(request)
+    sampled = random.random() < settings.PROFILING_SAMPLE_RATE
+    # Whether it's from staff can only be checked once the auth middleware has run
+    requested = REQUEST_HEADER in request.META and settings.SESSION_COOKIE_NAME in request.COOKIES
+    if not (sampled or requested) or not _profiling.acquire(blocking=False):
+        return get_response(request)
+
+    sampler = StackSampler(settings.PROFILING_INTERVAL)
+    try:
+        sampler.start()
+        response = get_response(request)
+    except BaseException:
+        sampler.stop()
+        _profiling.release()
+        raise
+
+    if not sampled and not _is_staff(request):
+        sampler.stop()
+        _profiling.release()
+        return response
+
+    profile_id = f"{time.time_ns()}-{os.getpid()}"
+    if requested and _is_staff(request):
+        response[RESPONSE_HEADER] = profile_id
+    if response.streaming:
+        response.streaming_content = _ProfiledStream(iter(response.streaming_content), lambda: _finish(profile_id, request, response, sampler))
+    else:
+        _finish(profile_id, request, response, sampler)
+    return response
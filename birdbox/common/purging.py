@@ -0,0 +1,214 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""CDN purging for Birdbox.
+
+Changes made in the CMS (publishing a page, editing the site settings or the
+Footer) are queued here, debounced, batched and then handed to a pluggable
+backend, configured via settings.CDN_PURGE_BACKEND, which talks to the CDN.
+
+Nothing is queued until the surrounding DB transaction commits, so a rolled-back
+edit never triggers a purge.
+
+Purging keys also bumps their versions (see common.cache_tags), so that the
+ETags of affected pages change along with the CDN purge. The CDN is also asked
+to purge OVERFLOW_TAG with them, for pages whose tags didn't all fit in their
+headers.
+"""
+
+import logging
+import threading
+import time
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+import requests
+
+from .cache_tags import EVERYTHING_TAG, OVERFLOW_TAG, bump_tag_versions
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeError(Exception):
+    pass
+
+
+class BasePurgeBackend:
+    """Subclass this to support a specific CDN. Each method receives
+    at most settings.CDN_PURGE_BATCH_SIZE items per call."""
+
+    def purge_urls(self, urls: List[str]) -> None:
+        raise NotImplementedError
+
+    def purge_keys(self, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    def purge_all(self) -> None:
+        raise NotImplementedError
+
+
+class LoggingPurgeBackend(BasePurgeBackend):
+    """No-op backend that just logs what would have been purged. The default,
+    so that local development and tests never talk to a real CDN."""
+
+    def purge_urls(self, urls: List[str]) -> None:
+        logger.info("CDN purge of %d URL(s): %s", len(urls), " ".join(urls))
+
+    def purge_keys(self, keys: List[str]) -> None:
+        logger.info("CDN purge of %d key(s): %s", len(keys), " ".join(keys))
+
+    def purge_all(self) -> None:
+        logger.info("CDN purge of the whole site")
+
+
+class HTTPPurgeBackend(BasePurgeBackend):
+    """Sends each batch as a JSON POST to settings.CDN_PURGE_HTTP_ENDPOINT.
+
+    Useful as a stand-in for a real CDN API (eg a local HTTP server in tests),
+    or in front of a small purge relay service."""
+
+    timeout = 10
+
+    def _post(self, payload: dict) -> None:
+        headers = {}
+        if settings.CDN_PURGE_HTTP_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.CDN_PURGE_HTTP_TOKEN}"
+        try:
+            response = requests.post(
+                settings.CDN_PURGE_HTTP_ENDPOINT,
+                json=payload,
+                headers=headers,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            raise PurgeError(f"Unable to purge via {settings.CDN_PURGE_HTTP_ENDPOINT}: {ex}") from ex
+
+    def purge_urls(self, urls: List[str]) -> None:
+        self._post({"urls": urls})
+
+    def purge_keys(self, keys: List[str]) -> None:
+        self._post({"keys": keys})
+
+    def purge_all(self) -> None:
+        self._post({"purge_all": True})
+
+
+def get_backend() -> BasePurgeBackend:
+    return import_string(settings.CDN_PURGE_BACKEND)()
+
+
+def _batched(items: List[str], batch_size: int) -> Iterable[List[str]]:
+    for i in range(0, len(items), batch_size):
+        yield items[i : i + batch_size]
+
+
+class PurgeDispatcher:
+    """Collects URLs and surrogate keys to purge and sends them to the backend
+    in batches once things have gone quiet for CDN_PURGE_DEBOUNCE_SECONDS,
+    or at most CDN_PURGE_MAX_DELAY_SECONDS after the first item was queued.
+
+    A full-site purge supersedes anything else that is pending, so bulk edits
+    result in one backend call rather than thousands.
+
+    With a debounce of 0, each queued change is flushed immediately (which is
+    what the test settings use).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._urls = set()
+        self._keys = set()
+        self._purge_all = False
+        self._timer = None
+        self._first_queued_at = None
+
+    def queue(self, urls: Iterable[str] = (), keys: Iterable[str] = (), purge_all: bool = False) -> None:
+        with self._lock:
+            self._urls.update(url for url in urls if url)
+            self._keys.update(key for key in keys if key)
+            self._purge_all = self._purge_all or purge_all
+            if not (self._urls or self._keys or self._purge_all):
+                return
+            if settings.CDN_PURGE_DEBOUNCE_SECONDS <= 0:
+                flush_now = True
+            else:
+                flush_now = False
+                self._schedule_flush()
+        if flush_now:
+            self.flush()
+
+    def _schedule_flush(self) -> None:
+        # Must be called with self._lock held
+        now = time.monotonic()
+        if self._first_queued_at is None:
+            self._first_queued_at = now
+        deadline = self._first_queued_at + settings.CDN_PURGE_MAX_DELAY_SECONDS
+        delay = max(0, min(settings.CDN_PURGE_DEBOUNCE_SECONDS, deadline - now))
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            urls, keys, purge_all = sorted(self._urls), sorted(self._keys), self._purge_all
+            self._urls, self._keys, self._purge_all = set(), set(), False
+            self._first_queued_at = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not (urls or keys or purge_all):
+            return
+
+        backend = get_backend()
+        batch_size = settings.CDN_PURGE_BATCH_SIZE
+        try:
+            if purge_all:
+                backend.purge_all()
+                return
+            if keys:
+                keys.append(OVERFLOW_TAG)
+            for batch in _batched(keys, batch_size):
+                backend.purge_keys(batch)
+            for batch in _batched(urls, batch_size):
+                backend.purge_urls(batch)
+        except PurgeError as ex:
+            # Not fatal: content will still expire from the CDN via its TTL
+            logger.warning(str(ex))
+
+
+dispatcher = PurgeDispatcher()
+
+
+def purge_urls(urls: Iterable[str]) -> None:
+    """Purge the given absolute URLs once the current transaction commits"""
+    urls = list(urls)
+    transaction.on_commit(lambda: dispatcher.queue(urls=urls))
+
+
+def purge_keys(keys: Iterable[str]) -> None:
+    """Purge the given surrogate keys once the current transaction commits"""
+    keys = list(keys)
+
+    def _purge():
+        bump_tag_versions(keys)
+        dispatcher.queue(keys=keys)
+
+    transaction.on_commit(_purge)
+
+
+def purge_all() -> None:
+    """Purge the whole site from the CDN once the current transaction commits"""
+
+    def _purge():
+        bump_tag_versions([EVERYTHING_TAG])
+        dispatcher.queue(purge_all=True)
+
+    transaction.on_commit(_purge)
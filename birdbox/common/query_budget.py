@@ -0,0 +1,210 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Per-request query budgets, enforced by common.middleware.query_budget.
+
+N+1 queries are easy to add without noticing - a template looping over pages
+and calling a method that queries, say - so a sample of requests
+(settings.QUERY_BUDGET_SAMPLE_RATE) is instrumented to count:
+
+    * database queries, and how many of them were exact repeats of an earlier
+      one in the same request
+    * cache calls (see common.instrumentation) - any queries made by the
+      cache itself, as the DatabaseCache does, count as cache calls rather
+      than queries
+
+Each query and cache call is attributed to where it came from: the line of
+the innermost template being rendered, or our own code - whichever is nearer
+in the stack, not counting our template tags' nodes.
+
+Every instrumented request is logged at INFO. If it made more queries than its
+budget in settings.QUERY_BUDGETS, that's logged as a warning - or, with
+settings.QUERY_BUDGET_RAISE, raised as QueryBudgetExceeded, to make it hard to
+miss in development. Budgets are looked up by the page's model, eg
+"microsite.BlogIndexPage", then the URL name, then "default".
+
+Requests that aren't sampled pay for a single random() call. Streamed pages
+are checked once they've been sent, and only ever logged.
+"""
+
+import logging
+import random
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from os.path import relpath
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.utils import CursorWrapper
+from django.http import HttpRequest, HttpResponse
+from django.template.base import Node, Template
+
+from . import instrumentation
+from .instrumentation import in_cache_call, observing_cache_calls
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.duplicates = 0
+        self.cache_calls = 0
+        self.query_sources = Counter()
+        self.cache_sources = Counter()
+        self._seen = set()
+
+    def add_query(self, sql: str, params, source: str) -> None:
+        self.queries += 1
+        self.query_sources[source] += 1
+        try:
+            key = (sql, tuple(params) if params else ())
+            if key in self._seen:
+                self.duplicates += 1
+            else:
+                self._seen.add(key)
+        except TypeError:
+            # Unhashable params, eg a list inside executemany's
+            pass
+
+    def add_cache_call(self, duration: float) -> None:
+        self.cache_calls += 1
+        self.cache_sources[_find_source()] += 1
+
+    def summary(self) -> str:
+        return (
+            f"{self.queries} queries ({self.duplicates} duplicates), {self.cache_calls} cache calls. "
+            f"Queries from: {_top(self.query_sources)}. Cache calls from: {_top(self.cache_sources)}"
+        )
+
+
+_stats: ContextVar[Optional[RequestStats]] = ContextVar("query_budget_stats", default=None)
+
+
+def _top(sources: Counter, n: int = 5) -> str:
+    return ", ".join(f"{source} ({count})" for source, count in sources.most_common(n)) or "-"
+
+
+def _find_source() -> str:
+    "Where the current query or cache call came from - see the module docstring"
+    frame = sys._getframe(1)
+    # A query goes through every execute_wrapper() in turn - ours and any
+    # other's, eg server timing's or load_test's - and none of them is where
+    # it came from, so start from where Django called them
+    wrapped = frame
+    while wrapped is not None and wrapped.f_code is not _EXECUTE_WITH_WRAPPERS:
+        wrapped = wrapped.f_back
+    if wrapped is not None:
+        frame = wrapped.f_back
+    lineno = None
+    while frame is not None:
+        code = frame.f_code
+        if code is _NODE_RENDER:
+            # The innermost tag or variable being rendered
+            if lineno is None and getattr(frame.f_locals["self"], "token", None):
+                lineno = frame.f_locals["self"].token.lineno
+        elif code is _TEMPLATE_RENDER:
+            return f"template {frame.f_locals['self'].name}:{lineno}"
+        elif code in _BOUNDARIES:
+            # Anything further out is the middleware
+            break
+        elif (
+            code.co_filename.startswith(settings.BIRDBOX_BASE_DIR)
+            and code.co_filename not in _SKIPPED_FILES
+            # Our template tags are part of rendering the template
+            and not isinstance(frame.f_locals.get("self"), Node)
+        ):
+            return f"{relpath(code.co_filename, settings.BIRDBOX_BASE_DIR)}:{code.co_qualname}"
+        frame = frame.f_back
+    return "middleware"
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is not None and not in_cache_call():
+        stats.add_query(sql, params, _find_source())
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def _tracking(stats: RequestStats) -> Iterator[None]:
+    token = _stats.set(stats)
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(observing_cache_calls(stats.add_cache_call))
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_query_wrapper))
+            yield
+    finally:
+        _stats.reset(token)
+
+
+def _call_view(get_response, request: HttpRequest) -> HttpResponse:
+    return get_response(request)
+
+
+def _budget_keys(request: HttpRequest, response: HttpResponse) -> List[str]:
+    keys = []
+    page = (getattr(response, "context_data", None) or {}).get("page")
+    if page is not None:
+        keys.append(page._meta.label)
+    if request.resolver_match and request.resolver_match.url_name:
+        keys.append(request.resolver_match.url_name)
+    keys.append("default")
+    return keys
+
+
+def _check(request: HttpRequest, response: HttpResponse, stats: RequestStats, can_raise: bool) -> None:
+    key = next((key for key in _budget_keys(request, response) if key in settings.QUERY_BUDGETS), None)
+    budget = settings.QUERY_BUDGETS[key] if key else None
+    if budget is None or stats.queries <= budget:
+        logger.info("%s %s: %s", request.method, request.path, stats.summary())
+        return
+    message = f"{request.method} {request.path} went over its query budget of {budget} ({key}): {stats.summary()}"
+    if can_raise and settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+def _tracked_stream(request, response, stats, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # Only tracking while each chunk is produced, so that nothing is left
+    # set if the client goes away before the end
+    while True:
+        with _tracking(stats):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+    _check(request, response, stats, can_raise=False)
+
+
+_TEMPLATE_RENDER = Template.render.__code__
+_EXECUTE_WITH_WRAPPERS = CursorWrapper._execute_with_wrappers.__code__
+# Where cache calls are observed from
+_SKIPPED_FILES = {__file__, instrumentation.__file__}
+_NODE_RENDER = Node.render_annotated.__code__
+_BOUNDARIES = {_call_view.__code__, _tracked_stream.__code__}
+
+
+def track_request(get_response, request: HttpRequest) -> HttpResponse:
+    "Get the response, instrumented and checked against its budget if sampled"
+    if random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE:
+        return get_response(request)
+
+    stats = request.query_stats = RequestStats()
+    with _tracking(stats):
+        response = _call_view(get_response, request)
+
+    if response.streaming:
+        response.streaming_content = _tracked_stream(request, response, stats, iter(response.streaming_content))
+    else:
+        _check(request, response, stats, can_raise=True)
+    return response
@@ -0,0 +1,153 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""An in-memory table of redirects, used by common.middleware.redirects in
+place of Wagtail's RedirectMiddleware.
+
+Wagtail's middleware looks for a Redirect in the database on every 404, after
+the 404 page has been rendered - and most 404s are crawlers asking for long
+dead URLs. Instead, every process compiles all the redirects into a table:
+
+    * a dict per site of Wagtail's Redirects, which are for exact paths (plus
+      one for those that apply to all sites), so looking one up is a dict
+      lookup however many there are
+    * a trie, by path segment, of settings.PREFIX_REDIRECTS, which redirect
+      everything under a path, and take priority over pages
+
+Wagtail's Redirects only apply to paths that would otherwise 404, so the
+middleware checks them before the view is called if the routing index (see
+common.routing) shows there's no page at the path, and so no 404 page is
+rendered.
+
+Like the routing index, the table's version is kept with the cache tag
+versions and bumped by microsite.signal_handlers whenever a redirect changes,
+or a page - which a redirect can point to - is published, unpublished, moved
+or renamed, so each process recompiles it on the next request after a change.
+Saving a draft leaves it as it is. Redirects can also be imported in bulk
+with `manage.py bulk_import_redirects`.
+"""
+
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.encoding import uri_to_iri
+
+from wagtail.contrib.redirects.models import Redirect
+
+from .cache_tags import bump_tag_versions, get_tag_versions
+
+logger = logging.getLogger(__name__)
+
+# Never sent in headers: only used for its version
+REDIRECTS_TAG = "redirects"
+
+
+class Target(NamedTuple):
+    link: str
+    is_permanent: bool
+
+
+class PrefixTrie:
+    "Maps path prefixes, a whole segment at a time, to targets"
+
+    def __init__(self):
+        self.root = {}
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        return [segment for segment in path.split("/") if segment]
+
+    def add(self, prefix: str, target: Target) -> None:
+        node = self.root
+        for segment in self._segments(prefix):
+            node = node.setdefault(segment, {})
+        # None can't clash with a segment, which is always a non-empty string
+        node[None] = target
+
+    def find(self, path: str) -> Optional[Target]:
+        "The target of the longest prefix of the given path, if any"
+        node = self.root
+        found = node.get(None)
+        for segment in self._segments(path):
+            node = node.get(segment)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+@lru_cache(maxsize=None)
+def get_prefixes() -> PrefixTrie:
+    "settings.PREFIX_REDIRECTS, which are all permanent"
+    prefixes = PrefixTrie()
+    for prefix, link in settings.PREFIX_REDIRECTS.items():
+        prefixes.add(prefix, Target(link, is_permanent=True))
+    return prefixes
+
+
+class RedirectTable:
+    def __init__(self, version: float, exact: Dict[Optional[int], Dict[str, Target]]):
+        self.version = version
+        self.exact = exact
+
+    def __len__(self):
+        return sum(len(paths) for paths in self.exact.values())
+
+    def find(self, site_id: Optional[int], full_path: str) -> Optional[Target]:
+        """As wagtail.contrib.redirects.middleware does: the normalised path
+        with its query string, then unencoded, then without the query string,
+        preferring redirects for the given site over those for all sites"""
+        path = Redirect.normalise_path(full_path)
+        if "\0" in path:
+            return None
+        candidates = [path, uri_to_iri(path)]
+        path_without_query = path.split("?")[0]
+        if path_without_query != path:
+            candidates.append(path_without_query)
+        for candidate in candidates:
+            for table in (self.exact.get(site_id), self.exact.get(None)):
+                if table and candidate in table:
+                    return table[candidate]
+        return None
+
+
+def compile_table(version: float) -> RedirectTable:
+    exact: Dict[Optional[int], Dict[str, Target]] = {}
+    for redirect in Redirect.objects.select_related("redirect_page").iterator(chunk_size=2000):
+        if redirect.redirect_page and not redirect.redirect_page_route_path:
+            # Redirect.link gets the specific page, which would be a query
+            # per redirect, but only needs to for a route path
+            link = redirect.redirect_page.get_url()
+        else:
+            link = redirect.link
+        if link:
+            exact.setdefault(redirect.site_id, {})[redirect.old_path] = Target(link, redirect.is_permanent)
+    table = RedirectTable(version, exact)
+    logger.debug("Compiled %d redirects", len(table))
+    return table
+
+
+_table: Optional[RedirectTable] = None
+_lock = threading.Lock()
+
+
+def get_table() -> RedirectTable:
+    "The current redirect table, recompiled if redirects have changed since it was compiled"
+    global _table
+    version = get_tag_versions([REDIRECTS_TAG])[REDIRECTS_TAG]
+    if _table is None or _table.version != version:
+        with _lock:
+            if _table is None or _table.version != version:
+                _table = compile_table(version)
+    return _table
+
+
+def invalidate_table() -> None:
+    "Have every process recompile its redirect table - see common.routing.invalidate_index()"
+    bump_tag_versions([REDIRECTS_TAG])
+    transaction.on_commit(lambda: bump_tag_versions([REDIRECTS_TAG]))
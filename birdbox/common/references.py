@@ -0,0 +1,71 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Reverse lookups over Wagtail's reference index.
+
+Wagtail already keeps `ReferenceIndex` up to date whenever a page, image,
+document or registered snippet/setting is saved, recording every reference
+found in its fields and StreamFields: LinkBlocks, CardBlock links, rich text
+page/document links, ImageChooserBlocks, etc.
+
+What it lacks is a way to ask "what refers to any of these N objects?" in
+one go, which is what we need when, say, a slug change alters the URL of a
+whole subtree of pages.
+"""
+
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple, Type
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model
+
+from wagtail.models import ReferenceIndex
+
+from .cache_tags import tag_for_object
+
+# Keeps the IN (...) clauses a sensible size for large subtrees
+LOOKUP_BATCH_SIZE = 500
+
+Referrer = Tuple[Type[Model], str]
+
+
+def get_referrers(objects: Iterable[Model]) -> Dict[Model, Set[Referrer]]:
+    """Returns a dict mapping each of the given objects to the set of
+    (model, object_id) pairs that reference it.
+
+    The model in each pair is the base model recorded in the index (eg Page,
+    not BlogPage), which is all we need to build cache tags or load the
+    referring objects. Objects with no referrers are omitted."""
+
+    objects_by_key = defaultdict(list)
+    ids_by_content_type = defaultdict(list)
+    for obj in objects:
+        content_type = ReferenceIndex._get_base_content_type(obj)
+        key = (content_type.pk, str(obj.pk))
+        if key not in objects_by_key:
+            ids_by_content_type[content_type.pk].append(key[1])
+        objects_by_key[key].append(obj)
+
+    referrers = defaultdict(set)
+    for content_type_id, object_ids in ids_by_content_type.items():
+        for i in range(0, len(object_ids), LOOKUP_BATCH_SIZE):
+            rows = (
+                ReferenceIndex.objects.filter(
+                    to_content_type_id=content_type_id,
+                    to_object_id__in=object_ids[i : i + LOOKUP_BATCH_SIZE],
+                )
+                .values_list("to_object_id", "base_content_type_id", "object_id")
+                .distinct()
+            )
+            for to_object_id, base_content_type_id, object_id in rows:
+                model = ContentType.objects.get_for_id(base_content_type_id).model_class()
+                for obj in objects_by_key[(content_type_id, to_object_id)]:
+                    referrers[obj].add((model, object_id))
+
+    return dict(referrers)
+
+
+def get_referrer_tags(objects: Iterable[Model]) -> Set[str]:
+    "Cache tags for everything that references any of the given objects"
+    return {tag_for_object(model, object_id) for referrers in get_referrers(objects).values() for model, object_id in referrers}
@@ -0,0 +1,191 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""An in-memory index of the page tree, so that a URL can be resolved to a
+page without walking the tree.
+
+Wagtail's own routing starts at the site's root page and fetches each page
+along the path in turn - two queries per level - then checks the page's view
+restrictions with another. Instead, common.views.serve_page looks the path up
+in an index of every live page, keyed by url_path, which also records:
+
+    * the page's specific content type, so it can be fetched in one query
+    * whether it, or an ancestor, has view restrictions
+    * where it redirects to, for StructuralPages and ExternalRedirectionPages,
+      which can then be answered without fetching the page at all
+
+The index is built in each process the first time it's needed. Its version is
+kept in the cache, alongside the versions of the cache tags (see
+common.cache_tags), and bumped by microsite.signal_handlers whenever the tree,
+view restrictions or sites change, so each process rebuilds its index on the
+next request after a change.
+"""
+
+import logging
+import threading
+from copy import copy
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.http import HttpRequest
+from django.urls import Resolver404, resolve
+
+from wagtail.models import Page, PageViewRestriction, Site
+
+from .cache_tags import bump_tag_versions, get_tag_versions
+
+logger = logging.getLogger(__name__)
+
+# Never sent in headers: only used for its version
+ROUTING_TAG = "routing"
+
+_PAGE_ATTR = "_birdbox_route"
+
+
+class Route(NamedTuple):
+    page_id: int
+    content_type_id: int
+    restricted: bool
+    redirect_to: Optional[str]
+
+    def get_page(self) -> Optional[Page]:
+        "The specific page, in a single query - or None if it's no longer live"
+        model = ContentType.objects.get_for_id(self.content_type_id).model_class()
+        page = model.objects.live().filter(pk=self.page_id).first()
+        if page is not None:
+            setattr(page, _PAGE_ATTR, self)
+        return page
+
+
+class RoutingIndex:
+    def __init__(self, version: float, routes: Dict[str, Route]):
+        self.version = version
+        self.routes = routes
+        self.url_paths = {route.page_id: url_path for url_path, route in routes.items()}
+        # Filled in as requests come in, from Site.find_for_request()
+        self.sites: Dict[Tuple[str, int], Optional[Site]] = {}
+
+    def find_site(self, request: HttpRequest) -> Optional[Site]:
+        try:
+            key = (request.get_host().split(":")[0], int(request.get_port()))
+        except ValueError:
+            return Site.find_for_request(request)
+        if key not in self.sites:
+            self.sites[key] = Site.find_for_request(request)
+        elif not hasattr(request, "_wagtail_site"):
+            # As Site.find_for_request() would have done, so that later
+            # calls to it are free. A copy, as it's shared between requests
+            request._wagtail_site = copy(self.sites[key])
+        return self.sites[key]
+
+    def match(self, site: Site, path_components: List[str]) -> Optional[Tuple[Route, List[str]]]:
+        """Returns the route for the longest prefix of the given path that is
+        a live page, and the path components after it - which that page's own
+        route() method handles, eg for a RoutablePageMixin - or None if not
+        even the site's root page is live"""
+        root_path = self.url_paths.get(site.root_page_id)
+        if root_path is None:
+            return None
+        for length in range(len(path_components), -1, -1):
+            url_path = root_path + "".join(f"{component}/" for component in path_components[:length])
+            route = self.routes.get(url_path)
+            if route is not None:
+                return route, path_components[length:]
+        return None
+
+
+def _get_redirects(pages: List[Tuple[int, str, int, str]]) -> Dict[int, str]:
+    from microsite.models import ExternalRedirectionPage, StructuralPage
+
+    redirects = dict(ExternalRedirectionPage.objects.live().values_list("pk", "destination"))
+
+    # StructuralPages redirect to their parent
+    structural_content_type_id = ContentType.objects.get_for_model(StructuralPage).pk
+    parent_paths = {pk: path[: -Page.steplen] for pk, _, content_type_id, path in pages if content_type_id == structural_content_type_id}
+    parents = {parent.path: parent for parent in Page.objects.filter(path__in=parent_paths.values())}
+    for pk, parent_path in parent_paths.items():
+        parent = parents.get(parent_path)
+        url = parent.get_full_url() if parent else None
+        if url:
+            redirects[pk] = url
+    return redirects
+
+
+def build_index(version: float) -> RoutingIndex:
+    pages = list(Page.objects.live().values_list("pk", "url_path", "content_type_id", "path"))
+    # Restrictions apply to the whole subtree, ie every page whose
+    # treebeard path starts with the restricted page's path
+    restricted_paths = tuple(PageViewRestriction.objects.values_list("page__path", flat=True).distinct())
+    redirects = _get_redirects(pages)
+
+    routes = {
+        url_path: Route(
+            page_id=pk,
+            content_type_id=content_type_id,
+            restricted=bool(restricted_paths) and path.startswith(restricted_paths),
+            redirect_to=redirects.get(pk),
+        )
+        for pk, url_path, content_type_id, path in pages
+    }
+    logger.debug("Built routing index of %d pages", len(routes))
+    return RoutingIndex(version, routes)
+
+
+_index: Optional[RoutingIndex] = None
+_lock = threading.Lock()
+
+
+def get_index() -> RoutingIndex:
+    "The current routing index, rebuilt if the tree has changed since it was built"
+    global _index
+    version = get_tag_versions([ROUTING_TAG])[ROUTING_TAG]
+    if _index is None or _index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = build_index(version)
+    return _index
+
+
+def invalidate_index() -> None:
+    """Have every process rebuild its routing index. Done straight away, so
+    that this process sees the change, and again once the transaction commits,
+    in case another process rebuilt its index in the meantime from the data
+    as it was before the transaction"""
+    bump_tag_versions([ROUTING_TAG])
+    transaction.on_commit(lambda: bump_tag_versions([ROUTING_TAG]))
+
+
+def get_route(page: Page) -> Optional[Route]:
+    "The route the given page was found by, if it was found in the index"
+    return getattr(page, _PAGE_ATTR, None)
+
+
+def find_site(request: HttpRequest) -> Optional[Site]:
+    "Site.find_for_request(), but without a query once the index has seen the host"
+    return get_index().find_site(request)
+
+
+def is_missing_page(request: HttpRequest) -> bool:
+    """Whether the request will get a 404 because there is no page at its
+    path, as far as can be told without calling the view. False if unsure"""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return True
+    if match.url_name != "wagtail_serve":
+        return False
+
+    index = get_index()
+    site = index.find_site(request)
+    found = index.match(site, [component for component in match.args[0].split("/") if component]) if site else None
+    if found is None:
+        return False
+    route, remaining_components = found
+    if not remaining_components:
+        return False
+    # The path goes beyond the nearest live page, which is fine as long as
+    # that page has its own routing, eg a RoutablePageMixin
+    model = ContentType.objects.get_for_id(route.content_type_id).model_class()
+    return model.route is Page.route
@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Where the time goes when a page is rendered, as a Server-Timing header.
+
+Requests from staff - or, to be exact, from anyone with a session cookie, of
+whom only staff get the header - and a sample of the rest
+(settings.SERVER_TIMING_SAMPLE_RATE) are timed by
+common.middleware.server_timing. Durations are added up per phase:
+
+    * total: the whole request, from the middleware's point of view
+    * db, cache: all the queries and cache calls
+    * routing: finding the page (see common.views.serve_page)
+    * context: the page's serve() up to rendering, ie mostly get_context()
+    * nav, footer, media: parts of templates marked with `{% timed %}`
+    * block-<type>: each type of top-level StreamField block, eg block-hero
+
+db and cache overlap everything else, and the phases within the page's
+rendering include any queries they make. Timed requests are logged, with the
+durations in a `server_timing` field for structured logging.
+
+The header is sent before a streamed page's body, so it only has what was
+timed up until then, while the log has the lot. Outside of a timed request,
+timed() costs a ContextVar lookup.
+"""
+
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+
+from .instrumentation import in_cache_call, observing_block_renders, observing_cache_calls
+
+logger = logging.getLogger(__name__)
+
+
+class Timings:
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        self.counts = Counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.durations[name] = self.durations.get(name, 0) + seconds
+        self.counts[name] += 1
+
+    def as_milliseconds(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 1) for name, seconds in self.durations.items()}
+
+    def header_value(self) -> str:
+        metrics = []
+        for name, milliseconds in self.as_milliseconds().items():
+            metric = f"{name};dur={milliseconds}"
+            if self.counts[name] > 1:
+                metric += f';desc="{self.counts[name]}x"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+_timings: ContextVar[Optional[Timings]] = ContextVar("server_timings", default=None)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    "Add the time spent in this context to the current request's `name` phase, if it's being timed"
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def _query_wrapper(execute, sql, params, many, context):
+    if in_cache_call():
+        return execute(sql, params, many, context)
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def _timing(timings: Timings) -> Iterator[None]:
+    token = _timings.set(timings)
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(observing_cache_calls(lambda duration: timings.add("cache", duration)))
+            stack.enter_context(observing_block_renders(lambda child, context: timed(f"block-{child.block_type}")))
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_query_wrapper))
+            yield
+    finally:
+        _timings.reset(token)
+
+
+def _log(request: HttpRequest, timings: Timings) -> None:
+    milliseconds = timings.as_milliseconds()
+    logger.info(
+        "Server timing for %s %s: %s",
+        request.method,
+        request.path,
+        ", ".join(f"{name}={duration}ms" for name, duration in milliseconds.items()),
+        extra={"server_timing": milliseconds},
+    )
+
+
+def _timed_stream(request: HttpRequest, timings: Timings, chunks: Iterator[bytes], start: float) -> Iterator[bytes]:
+    while True:
+        with _timing(timings):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+    timings.add("total", time.perf_counter() - start)
+    _log(request, timings)
+
+
+def time_request(get_response, request: HttpRequest) -> HttpResponse:
+    "Get the response, timed and with a Server-Timing header if it's for staff or sampled"
+    sampled = random.random() < settings.SERVER_TIMING_SAMPLE_RATE
+    if not sampled and settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return get_response(request)
+
+    timings = Timings()
+    start = time.perf_counter()
+    with _timing(timings):
+        response = get_response(request)
+
+    user = getattr(request, "user", None)
+    if not sampled and not (user and user.is_staff):
+        return response
+
+    if response.streaming:
+        # What's been timed so far, before the body is sent
+        timings.add("total", time.perf_counter() - start)
+        response["Server-Timing"] = timings.header_value()
+        del timings.durations["total"], timings.counts["total"]
+        response.streaming_content = _timed_stream(request, timings, iter(response.streaming_content), start)
+    else:
+        timings.add("total", time.perf_counter() - start)
+        response["Server-Timing"] = timings.header_value()
+        _log(request, timings)
+    return response
@@ -0,0 +1,121 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Streaming page rendering, so the browser gets the <head> - and can start
+fetching CSS and JS - while the rest of the page is still being rendered.
+
+Django templates can only render to a string, all in one go, so parts of a
+template that can be sent later are wrapped in `{% streamable %}` (see
+birdbox_tags). Normally that does nothing, but when streaming, each one is
+skipped on the first pass and a marker left in its place. Everything up to
+the first marker is sent straight away, then each skipped part is rendered
+and sent in turn - and those can contain more streamable parts, eg one per
+StreamField block.
+
+Headers have to be sent before the rest of the page is rendered, so pages are
+only streamed when the cache tags and validators from the previous render are
+known (see CacheAwareAbstractBasePage.serve). Once the whole page has been
+sent, it's handed back so the cache headers, manifest and stored variants can
+be updated as usual.
+"""
+
+import logging
+import re
+import secrets
+from copy import copy
+from typing import Callable, Iterator, Optional
+
+from django.http import HttpRequest, StreamingHttpResponse
+from django.template import Context
+from django.template.response import SimpleTemplateResponse
+from django.utils.safestring import SafeString, mark_safe
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ATTR = "_birdbox_streaming"
+
+
+class _Deferred:
+    "The parts of the page skipped so far, and the marker that separates them"
+
+    def __init__(self):
+        # Random, so that page content can't fake a marker
+        self.token = secrets.token_hex(8)
+        self.marker_re = re.compile(f"<!--stream:{self.token}:([0-9]+)-->")
+        self.parts = []
+
+    def add(self, nodelist, context: Context) -> SafeString:
+        self.parts.append((nodelist, _snapshot(context)))
+        return mark_safe(f"<!--stream:{self.token}:{len(self.parts) - 1}-->")
+
+
+def _copy_dict(d: dict) -> dict:
+    # {% for %} updates its forloop dict in place on each iteration
+    return {key: dict(value) if key == "forloop" else value for key, value in d.items()}
+
+
+def _snapshot(context: Context) -> Context:
+    """A copy of the context as it is now, to render a skipped part with
+    later. The dicts in it are copied too, because tags such as {% for %}
+    update them in place as rendering carries on."""
+    snapshot = copy(context)
+    snapshot.dicts = [_copy_dict(d) for d in context.dicts]
+    snapshot.render_context.dicts = [dict(d) for d in context.render_context.dicts]
+    return snapshot
+
+
+def defer(request: Optional[HttpRequest], nodelist, context: Context) -> Optional[SafeString]:
+    """If this request is being streamed, record the nodelist to be rendered
+    later and return the marker to output in its place. Otherwise, None."""
+    deferred = getattr(request, _REQUEST_ATTR, None)
+    if deferred is None:
+        return None
+    return deferred.add(nodelist, context)
+
+
+def _expand(content: str, deferred: _Deferred) -> Iterator[bytes]:
+    position = 0
+    for match in deferred.marker_re.finditer(content):
+        if match.start() > position:
+            yield content[position : match.start()].encode()
+        nodelist, context = deferred.parts[int(match.group(1))]
+        yield from _expand(nodelist.render(context), deferred)
+        position = match.end()
+    if position < len(content):
+        yield content[position:].encode()
+
+
+def _stream(request: HttpRequest, content: str, deferred: _Deferred, on_complete: Callable[[bytes], None]) -> Iterator[bytes]:
+    chunks = []
+    try:
+        for chunk in _expand(content, deferred):
+            chunks.append(chunk)
+            yield chunk
+    except Exception:
+        # Too late for an error page: the status and headers have been sent
+        logger.exception("Error while streaming %s", request.path)
+        return
+    on_complete(b"".join(chunks))
+
+
+def stream_template_response(
+    request: HttpRequest,
+    response: SimpleTemplateResponse,
+    on_complete: Callable[[bytes], None],
+) -> StreamingHttpResponse:
+    """Turns an unrendered TemplateResponse into a StreamingHttpResponse.
+
+    The first pass over the template - everything except the streamable
+    parts - happens straight away, so errors in it still get a normal error
+    page. After the last chunk is sent, on_complete is called with the
+    content of the whole page."""
+
+    deferred = _Deferred()
+    setattr(request, _REQUEST_ATTR, deferred)
+    content = response.rendered_content
+    return StreamingHttpResponse(
+        _stream(request, content, deferred, on_complete),
+        status=response.status_code,
+        headers=response.headers,
+    )
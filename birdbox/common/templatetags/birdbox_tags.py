@@ -5,11 +5,18 @@
 from typing import Dict, List
 
 from django.conf import settings
-from django.template import Library
+from django.template import Library, Node, TemplateSyntaxError
 from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html
 
 from microsite.models import Footer
 
+from .. import server_timing
+from ..css_bundles import get_bundle_url
+from ..preload import STYLE, add_preload
+from ..streaming import defer
 from ..utils import get_frontend_media
 
 register = Library()
@@ -22,37 +29,108 @@ def frontend_media_for_page(context, page) -> Dict[str, List[str]]:
 
     request = context["request"]
 
-    css_files = []
-    js_files = []
+    # Dicts rather than sets, to dedupe while keeping the order stable -
+    # set ordering varies between processes, which would make otherwise
+    # identical responses differ byte-for-byte between workers
+    css_files = {}
+    js_files = {}
 
+    media_objs = []
     if hasattr(page, "specific"):
-        for media_obj in get_frontend_media(page.specific):
-            css_files.extend(set([x for x in media_obj.render_css()]))
-            js_files.extend(set([x for x in media_obj.render_js()]))
+        media_objs.extend(get_frontend_media(page.specific))
 
     # See if we need to gather footer media too
     footer = Footer.load(request_or_site=request)
     if footer and footer.display_footer:
-        for media_obj in get_frontend_media(footer):
-            css_files.extend(set([x for x in media_obj.render_css()]))
-            js_files.extend(set([x for x in media_obj.render_js()]))
+        media_objs.extend(get_frontend_media(footer))
+
+    for media_obj in media_objs:
+        js_files.update(dict.fromkeys(media_obj.render_js()))
+        for medium, paths in media_obj._css.items():
+            for path in paths:
+                css_files.setdefault(media_obj.absolute_path(path), medium)
+
+    # Use a single bundle of the CSS instead, if there is one - see common.css_bundles
+    bundle_url = get_bundle_url(getattr(page, "specific_class", None), css_files)
+    if bundle_url:
+        css_files = {bundle_url: "all"}
+
+    # The CSS is all in the <head>, so is all needed for first render
+    for url in css_files:
+        add_preload(request, url, STYLE)
 
     return {
         "css": render_to_string(
             "templatetags/css_frontend_media.html",
             {
-                "css_files": set(css_files),
+                "css_files": [format_html('<link href="{}" media="{}" rel="stylesheet">', url, medium) for url, medium in css_files.items()],
             },
         ),
         "js": render_to_string(
             "templatetags/js_frontend_media.html",
             {
-                "js_files": set(js_files),
+                "js_files": list(js_files),
             },
         ),
     }
 
 
+@register.simple_tag(takes_context=True)
+def preload(context, url, as_) -> str:
+    """Record a resource that's needed early to render the page, for the
+    page's `Link: rel=preload` header - see common.preload. Outputs nothing.
+
+    Usage: {% preload some_url "image" %}"""
+    add_preload(context.get("request"), url, as_)
+    return ""
+
+
+class StreamableNode(Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        marker = defer(context.get("request"), self.nodelist, context)
+        if marker is None:
+            return self.nodelist.render(context)
+        return marker
+
+
+@register.tag
+def streamable(parser, token):
+    """Marks part of a page that can be sent after the parts before it, when
+    the page is streamed - see common.streaming. Otherwise, does nothing.
+
+    Usage: {% streamable %}...{% endstreamable %}"""
+    nodelist = parser.parse(("endstreamable",))
+    parser.delete_first_token()
+    return StreamableNode(nodelist)
+
+
+class TimedNode(Node):
+    def __init__(self, name, nodelist):
+        self.name = name
+        self.nodelist = nodelist
+
+    def render(self, context):
+        with server_timing.timed(self.name):
+            return self.nodelist.render(context)
+
+
+@register.tag
+def timed(parser, token):
+    """Adds the time spent rendering part of a template to the Server-Timing
+    header, if the request is being timed - see common.server_timing.
+
+    Usage: {% timed "nav" %}...{% endtimed %}"""
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise TemplateSyntaxError(f"{bits[0]} takes a name for the timing")
+    nodelist = parser.parse(("endtimed",))
+    parser.delete_first_token()
+    return TimedNode(bits[1].strip("\"'"), nodelist)
+
+
 @register.simple_tag
 def get_alt_text_for_accessible_image_block(block_data):
     """Complements common.blocks.AccessibleImageBlock, which
@@ -97,3 +175,36 @@ def site_theme_name(prefix=""):
         theme_name = "mozilla"
 
     return prefix + theme_name
+
+
+@register.simple_tag(takes_context=True)
+def csrf_token_field(context):
+    """Use instead of {% csrf_token %} in forms on pages that may be cached.
+
+    With FORMS_FETCH_CSRF_TOKEN on, the field is rendered empty, so the page
+    is the same for every visitor, and the frontend fetches a token from the
+    csrf-token endpoint just before the form is submitted (see
+    csrf_token_script, and src/js/csrf/). Otherwise, it's the same as
+    {% csrf_token %}"""
+
+    if settings.FORMS_FETCH_CSRF_TOKEN:
+        return format_html(
+            '<input type="hidden" name="csrfmiddlewaretoken" value="" data-csrf-token-url="{}">',
+            reverse("csrf-token"),
+        )
+
+    token = context.get("csrf_token")
+    if not token or token == "NOTPROVIDED":
+        return ""
+    return format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', token)
+
+
+@register.simple_tag
+def csrf_token_script():
+    """The script that fetches a CSRF token for regular forms that use
+    csrf_token_field, when FORMS_FETCH_CSRF_TOKEN is on. Forms that are
+    submitted via XHR do this themselves"""
+
+    if not settings.FORMS_FETCH_CSRF_TOKEN:
+        return ""
+    return format_html('<script src="{}"></script>', static("js/csrf-token.js"))
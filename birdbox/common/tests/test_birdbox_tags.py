@@ -0,0 +1,69 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from unittest import mock
+
+from django.forms import Media
+from django.middleware.csrf import get_token
+from django.template import Context, Template
+from django.test import RequestFactory, override_settings
+
+import pytest
+
+from common.templatetags.birdbox_tags import frontend_media_for_page
+from microsite.blocks import ContactFormBlock
+from microsite.models import HomePage
+
+
+@pytest.mark.django_db
+@mock.patch("common.templatetags.birdbox_tags.get_frontend_media")
+def test_frontend_media_for_page__deduped_in_a_stable_order(mock_get_frontend_media, bootstrap_minimal_site):
+    mock_get_frontend_media.return_value = [
+        Media(css={"all": ["/c.css", "/a.css"]}, js=["/z.js"]),
+        Media(css={"all": ["/b.css", "/a.css"]}, js=["/y.js", "/z.js"]),
+    ]
+    context = {"request": RequestFactory().get("/")}
+
+    media = frontend_media_for_page(context, HomePage.objects.get())
+
+    css = [line.strip() for line in media["css"].splitlines() if line.strip()]
+    js = [line.strip() for line in media["js"].splitlines() if line.strip()]
+    assert [x.split('href="')[1].split('"')[0] for x in css] == ["/c.css", "/a.css", "/b.css"]
+    assert [x.split('src="')[1].split('"')[0] for x in js] == ["/z.js", "/y.js"]
+
+
+def _render_csrf_token_field(request):
+    template = Template("{% load birdbox_tags %}{% csrf_token_field %}")
+    return template.render(Context({"request": request, "csrf_token": get_token(request)}))
+
+
+@override_settings(FORMS_FETCH_CSRF_TOKEN=False)
+def test_csrf_token_field__embeds_token_by_default():
+    request = RequestFactory().get("/")
+    html = _render_csrf_token_field(request)
+    assert html.startswith('<input type="hidden" name="csrfmiddlewaretoken" value="')
+    assert 'value=""' not in html
+    assert "data-csrf-token-url" not in html
+
+
+@override_settings(FORMS_FETCH_CSRF_TOKEN=True)
+def test_csrf_token_field__can_leave_token_to_be_fetched():
+    request = RequestFactory().get("/")
+    html = _render_csrf_token_field(request)
+    assert html == '<input type="hidden" name="csrfmiddlewaretoken" value="" data-csrf-token-url="/csrf-token/">'
+
+
+@pytest.mark.django_db
+@override_settings(FORMS_FETCH_CSRF_TOKEN=True)
+def test_contact_form_block__renders_without_using_csrf_token(bootstrap_minimal_site):
+    block = ContactFormBlock()
+    value = block.to_python({"form_type": "microsite.forms.GenericContactForm", "title": "Get in touch"})
+    request = RequestFactory().get("/")
+
+    html = block.render(value, context={"request": request})
+
+    assert 'data-csrf-token-url="/csrf-token/"' in html
+    # The token was never generated, so the page needs no CSRF cookie and
+    # stays the same for every visitor
+    assert "CSRF_COOKIE" not in request.META
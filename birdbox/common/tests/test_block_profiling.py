@@ -0,0 +1,73 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+
+from django.urls import reverse
+
+import pytest
+
+from common.block_profiling import MAX_PAGES, BlockStats, get_profiles
+from microsite.models import BlogPage
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def post_with_blocks(minimal_site_with_blog):
+    post = BlogPage.objects.first()
+    post.body = [
+        {"type": "blogtext", "value": "<p>Hello</p>"},
+        {"type": "markdown", "value": "# Hello"},
+        {"type": "blogtext", "value": "<p>Again</p>"},
+    ]
+    post.save_revision().publish()
+    return post
+
+
+def test_block_stats():
+    stats = BlockStats()
+    for page_id in range(MAX_PAGES + 5):
+        stats.add(page_id, queries=1, page_id=page_id)
+    other = BlockStats()
+    other.add(600, queries=4, page_id=None)
+    stats.merge(other)
+
+    assert stats.renders == MAX_PAGES + 6
+    assert stats.max_ms == 600
+    assert stats.queries == MAX_PAGES + 9
+    assert stats.histogram[0] == 2 and stats.histogram[-1] == 1
+    assert stats.percentile(50) == 10
+    assert stats.percentile(100) is None
+    # Only the slowest pages are kept
+    assert sorted(stats.pages) == list(range(5, MAX_PAGES + 5))
+
+
+def test_profiles_sampled_requests(client, post_with_blocks, settings):
+    settings.BLOCK_PROFILING_SAMPLE_RATE = 1
+    client.get(post_with_blocks.url)
+
+    blocks = get_profiles().blocks
+    assert blocks["RichTextBlock"].renders == 2
+    assert blocks["MarkdownBlock"].renders == 1
+    assert list(blocks["RichTextBlock"].pages) == [post_with_blocks.pk]
+
+
+def test_not_sampled(client, post_with_blocks):
+    client.get(post_with_blocks.url)
+    assert not get_profiles().blocks
+
+
+def test_report(client, log_in, post_with_blocks, admin_user, settings):
+    settings.BLOCK_PROFILING_SAMPLE_RATE = 1
+    client.get(post_with_blocks.url)
+    settings.BLOCK_PROFILING_SAMPLE_RATE = 0
+
+    log_in(admin_user)
+    resp = client.get(reverse("block_profiling_report"))
+    assert resp.status_code == 200
+    assert {row["name"] for row in resp.context["rows"]} == {"MarkdownBlock", "RichTextBlock"}
+    assert post_with_blocks.title in resp.content.decode()
+
+    resp = client.post(reverse("block_profiling_report"), follow=True)
+    assert b"No blocks have been profiled yet" in resp.content
@@ -0,0 +1,84 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+import pytest
+
+from common.cache_tags import add_cache_tags, bump_tag_versions, get_cache_tags, get_tag_versions, set_cache_tag_headers
+
+
+def test_add_cache_tags__dedupes_and_keeps_order():
+    request = RequestFactory().get("/")
+    add_cache_tags(request, "p3", "nav")
+    add_cache_tags(request, "p1", "", None, "p3")
+    assert get_cache_tags(request) == ["p3", "nav", "p1"]
+
+
+def test_add_cache_tags__ignores_missing_request():
+    add_cache_tags(None, "p1")  # Does not raise
+
+
+def test_set_cache_tag_headers__no_tags_means_no_headers():
+    response = set_cache_tag_headers(RequestFactory().get("/"), HttpResponse())
+    assert "Surrogate-Key" not in response
+    assert "Cache-Tag" not in response
+
+
+@pytest.mark.parametrize(
+    "max_length, expected_surrogate_key, expected_cache_tag, expect_warning",
+    (
+        (100, "p1 p22 p333", "p1,p22,p333", False),
+        (11, "p1 p22 p333", "p1,p22,p333", False),
+        # Too long, so overflow stands in for the tags that don't fit
+        (10, "overflow", "overflow", True),
+        (1, "overflow", "overflow", True),
+    ),
+)
+def test_set_cache_tag_headers__caps_header_length(
+    max_length,
+    expected_surrogate_key,
+    expected_cache_tag,
+    expect_warning,
+):
+    request = RequestFactory().get("/")
+    add_cache_tags(request, "p1", "p22", "p333")
+    with override_settings(
+        CACHE_TAG_HEADERS={"Surrogate-Key": " ", "Cache-Tag": ","},
+        CACHE_TAG_HEADER_MAX_LENGTH=max_length,
+    ):
+        with mock.patch("common.cache_tags.logger") as mock_logger:
+            response = set_cache_tag_headers(request, HttpResponse())
+
+    assert response["Surrogate-Key"] == expected_surrogate_key
+    assert response["Cache-Tag"] == expected_cache_tag
+    assert mock_logger.warning.called is expect_warning
+
+
+def test_set_cache_tag_headers__overflow_tag_stands_in_for_dropped_tags():
+    request = RequestFactory().get("/")
+    add_cache_tags(request, *(f"p{i}" for i in range(1, 10)))
+    with override_settings(CACHE_TAG_HEADERS={"Surrogate-Key": " "}, CACHE_TAG_HEADER_MAX_LENGTH=20):
+        with mock.patch("common.cache_tags.logger") as mock_logger:
+            response = set_cache_tag_headers(request, HttpResponse())
+
+    assert response["Surrogate-Key"] == "p1 p2 p3 p4 overflow"
+    assert mock_logger.warning.call_args.args[1:] == (20, 5, 9, "overflow")
+
+
+@pytest.mark.django_db
+def test_tag_versions():
+    first = get_tag_versions(["p1", "p2"])
+    assert set(first) == {"p1", "p2"}
+    # Versions are stable until bumped
+    assert get_tag_versions(["p1", "p2"]) == first
+
+    with mock.patch("common.cache_tags.time.time", return_value=first["p1"] + 10):
+        bump_tag_versions(["p1"])
+    second = get_tag_versions(["p1", "p2"])
+    assert second["p1"] == first["p1"] + 10
+    assert second["p2"] == first["p2"]
@@ -0,0 +1,158 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import gzip
+from unittest import mock
+
+from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+
+import pytest
+
+from common import compression
+from common.middleware import response_compression
+from microsite.models import BlogIndexPage, Footer
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    (
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("deflate, gzip;q=0.5", "gzip"),
+        ("gzip;q=0", None),
+        ("*", "br"),
+        ("br, gzip", "br"),
+        ("br;q=0, gzip", "gzip"),
+        ("br", "br"),
+    ),
+)
+@mock.patch("common.compression.brotli", mock.Mock())
+def test_negotiate_encoding(accept_encoding, expected):
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+    with override_settings(RESPONSE_COMPRESSION_ENCODINGS=["br", "gzip"]):
+        assert compression.negotiate_encoding(request) == expected
+
+
+@mock.patch("common.compression.brotli", None)
+def test_negotiate_encoding__without_brotli():
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="br, gzip")
+    with override_settings(RESPONSE_COMPRESSION_ENCODINGS=["br", "gzip"]):
+        assert compression.negotiate_encoding(request) == "gzip"
+
+
+@pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+def test_compress__brotli():
+    content = b"<p>Hello</p>" * 100
+    assert compression.brotli.decompress(compression.compress(content, "br")) == content
+
+
+def test_compress__gzip_is_deterministic():
+    content = b"<p>Hello</p>" * 100
+    assert compression.compress(content, "gzip") == compression.compress(content, "gzip")
+    assert gzip.decompress(compression.compress(content, "gzip", level=1)) == content
+
+
+def _run_middleware(request, response):
+    return response_compression(lambda request: response)(request)
+
+
+def test_middleware__skips_small_and_non_text_responses():
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+
+    response = _run_middleware(request, HttpResponse("tiny"))
+    assert not response.has_header("Content-Encoding")
+
+    response = _run_middleware(request, HttpResponse(b"x" * 1000, content_type="image/png"))
+    assert not response.has_header("Content-Encoding")
+
+
+def test_middleware__skips_responses_with_secrets():
+    request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+    request.META["CSRF_COOKIE_NEEDS_UPDATE"] = True
+    response = _run_middleware(request, HttpResponse("x" * 1000))
+    assert not response.has_header("Content-Encoding")
+
+
+@pytest.mark.django_db
+def test_responses_with_messages_are_not_stored():
+    request = RequestFactory().get("/")
+    request._messages = CookieStorage(request)
+    messages.success(request, "Thanks")
+    response = HttpResponse("x" * 1000, headers={"ETag": '"abc"'})
+
+    compression.store_variants(request, response)
+    assert cache.get(compression._variant_key(request, '"abc"', None)) is None
+
+    del request._messages
+    compression.store_variants(request, response)
+    request._messages = CookieStorage(request)
+    messages.success(request, "Thanks")
+    assert compression.get_stored_variant(request, '"abc"') is None
+
+
+@pytest.mark.django_db
+class TestPageCompression:
+    @pytest.fixture(autouse=True)
+    def setup(self, minimal_site_with_blog):
+        Footer.load()
+        self.url = BlogIndexPage.objects.get().url
+
+    def test_page_is_compressed(self, client):
+        plain = client.get(self.url)
+        assert not plain.has_header("Content-Encoding")
+
+        resp = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        assert resp.status_code == 200
+        assert resp["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp["Vary"]
+        assert resp["ETag"] == plain["ETag"][:-1] + '-gzip"'
+        assert gzip.decompress(resp.content) == plain.content
+
+    def test_conditional_request_for_compressed_page(self, client):
+        etag = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+
+        resp = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp["ETag"] == etag
+
+        # A different representation
+        resp = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+
+    def test_stored_variant_is_served_without_rendering_or_compressing(self, client):
+        first = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        with mock.patch.object(BlogIndexPage, "get_context") as mock_get_context:
+            with mock.patch("common.compression.compress") as mock_compress:
+                second = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+                plain = client.get(self.url)
+
+        assert mock_get_context.call_count == 0
+        assert mock_compress.call_count == 0
+        assert second.content == first.content
+        assert second["ETag"] == first["ETag"]
+        assert second["Surrogate-Key"] == first["Surrogate-Key"]
+        assert second["Content-Encoding"] == "gzip"
+        assert not plain.has_header("Content-Encoding")
+        assert gzip.decompress(second.content) == plain.content
+
+    def test_pages_with_messages_are_neither_stored_nor_served_from_the_store(self, client, streamform):
+        # Stored for anyone without a message
+        Client().get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        assert client.post("/", {"form_id": streamform.pk, "form_reference": "feedback"}).status_code == 302
+        resp = client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        assert b"Thanks for your feedback" in resp.content
+        assert not resp.has_header("Content-Encoding")
+
+        # The message wasn't stored for the next visitor either
+        cache.clear()
+        client.post("/", {"form_id": streamform.pk, "form_reference": "feedback"})
+        assert b"Thanks for your feedback" in client.get(self.url).content
+        assert b"Thanks for your feedback" not in Client().get(self.url).content
@@ -0,0 +1,133 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, override_settings
+
+import pytest
+from wagtail.images.tests.utils import get_test_image_file
+
+from common.conditional_get import get_current_validators, set_validators
+from microsite.models import BlogIndexPage, BlogPage, Footer
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def blog_index(minimal_site_with_blog):
+    # Ensure the Footer exists before we start, so that creating it
+    # doesn't count as a change
+    Footer.load()
+    return BlogIndexPage.objects.get()
+
+
+def test_pages_have_validators(client, blog_index):
+    resp = client.get(blog_index.url)
+    assert resp.status_code == 200
+    assert resp["ETag"].startswith('"')
+    assert resp["Last-Modified"]
+
+    # Stable between requests
+    assert client.get(blog_index.url)["ETag"] == resp["ETag"]
+
+
+def test_matching_conditional_request_is_not_rendered(client, blog_index):
+    etag = client.get(blog_index.url)["ETag"]
+
+    with mock.patch.object(BlogIndexPage, "get_context") as mock_get_context:
+        resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+    assert resp["ETag"] == etag
+    assert mock_get_context.call_count == 0
+
+
+def test_no_304_for_a_visitor_with_a_message(client, blog_index, streamform):
+    etag = client.get(blog_index.url)["ETag"]
+
+    assert client.post("/", {"form_id": streamform.pk, "form_reference": "feedback"}).status_code == 302
+    resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert b"Thanks for your feedback" in resp.content
+    assert not resp.has_header("ETag")
+
+    # Once the message has been shown
+    assert client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def test_if_modified_since(client, blog_index):
+    last_modified = client.get(blog_index.url)["Last-Modified"]
+    resp = client.get(blog_index.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert resp.status_code == 304
+
+
+def test_stale_etag_renders_page(client, blog_index):
+    client.get(blog_index.url)
+    resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH='"not-the-etag"')
+    assert resp.status_code == 200
+
+
+def test_query_string_gets_its_own_validators(client, blog_index):
+    etag = client.get(blog_index.url)["ETag"]
+    resp = client.get(f"{blog_index.url}?page=2", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+
+
+def test_etag_changes_when_a_dependency_changes(client, blog_index, django_capture_on_commit_callbacks):
+    etag = client.get(blog_index.url)["ETag"]
+
+    footer = Footer.load()
+    footer.display_footer = False
+    with django_capture_on_commit_callbacks(execute=True):
+        footer.save()
+
+    resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+def test_etag_changes_when_an_image_is_replaced(client, blog_index, django_capture_on_commit_callbacks):
+    etag = client.get(blog_index.url)["ETag"]
+
+    # The blog index shows its posts' feed images
+    image = BlogPage.objects.order_by("date").first().feed_image
+    image.file = get_test_image_file(filename="replaced.png")
+    with django_capture_on_commit_callbacks(execute=True):
+        image.save()
+
+    resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+def test_etag_changes_with_release(client, blog_index):
+    with override_settings(GIT_SHA="abc123"):
+        etag = client.get(blog_index.url)["ETag"]
+    with override_settings(GIT_SHA="def456"):
+        resp = client.get(blog_index.url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+def test_no_validators_for_logged_in_users(blog_index):
+    # Logged-in users get the Wagtail userbar, etc
+    request = RequestFactory().get(blog_index.url, HTTP_IF_NONE_MATCH="*")
+    request.user = mock.Mock(is_authenticated=True)
+
+    assert get_current_validators(request, blog_index) is None
+    response = set_validators(request, blog_index, HttpResponse())
+    assert "ETag" not in response
+    assert "Last-Modified" not in response
+
+
+def test_no_validators_if_csrf_token_was_used(blog_index):
+    request = RequestFactory().get(blog_index.url)
+    request.user = AnonymousUser()
+    get_token(request)
+
+    response = set_validators(request, blog_index, HttpResponse())
+    assert "ETag" not in response
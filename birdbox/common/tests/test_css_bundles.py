@@ -0,0 +1,86 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+from unittest import mock
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import FileSystemStorage
+from django.forms import Media
+from django.templatetags.static import static
+from django.test import RequestFactory
+
+import pytest
+
+from common.css_bundles import MANIFEST_NAME, build_bundles, get_bundle_sources
+from common.templatetags.birdbox_tags import frontend_media_for_page
+from microsite.models import BlogIndexPage, BlogPage, HomePage
+
+
+def test_get_bundle_sources():
+    sources = get_bundle_sources(BlogIndexPage)
+    assert sources == [
+        static("css/birdbox-blog.css"),
+        static("css/protocol-card.css"),
+        static("css/protocol-footer-css.css"),
+    ]
+
+
+def test_build_bundles(tmp_path):
+    storage = FileSystemStorage(location=tmp_path)
+
+    bundles = build_bundles(storage)
+
+    bundle = bundles["microsite.blogindexpage"]
+    assert bundle["sources"] == get_bundle_sources(BlogIndexPage)
+    assert bundle["name"].startswith("css/bundle.")
+
+    content = storage.open(bundle["name"]).read()
+    for url in bundle["sources"]:
+        source = staticfiles_storage.open(url[len("/static/") :]).read().strip()
+        assert source in content
+
+    # Only page types with something to bundle get a bundle
+    assert "wagtailcore.page" not in bundles
+    assert json.loads(storage.open(MANIFEST_NAME).read()) == bundles
+
+
+@pytest.mark.django_db
+@mock.patch("common.templatetags.birdbox_tags.get_frontend_media")
+@mock.patch("common.css_bundles.get_bundles")
+def test_frontend_media_for_page__uses_bundle(mock_get_bundles, mock_get_frontend_media, bootstrap_minimal_site):
+    mock_get_bundles.return_value = {
+        "microsite.homepage": {
+            "name": "css/bundle.0123456789ab.css",
+            "sources": ["/a.css", "/b.css", "/c.css"],
+        }
+    }
+    mock_get_frontend_media.return_value = [Media(css={"all": ["/a.css", "/b.css"]})]
+    context = {"request": RequestFactory().get("/")}
+
+    media = frontend_media_for_page(context, HomePage.objects.get())
+    assert media["css"].strip() == '<link href="/static/css/bundle.0123456789ab.css" media="all" rel="stylesheet">'
+
+    # Anything not in the bundle means it can't be used
+    mock_get_frontend_media.return_value = [Media(css={"all": ["/a.css", "/d.css"]})]
+    media = frontend_media_for_page(context, HomePage.objects.get())
+    assert "bundle" not in media["css"]
+    assert 'href="/d.css"' in media["css"]
+
+
+@pytest.mark.django_db
+@mock.patch("common.css_bundles.get_bundles")
+def test_frontend_media_for_page__no_bundle_for_page_type(mock_get_bundles, minimal_site_with_blog):
+    mock_get_bundles.return_value = {}
+    context = {"request": RequestFactory().get("/")}
+
+    media = frontend_media_for_page(context, BlogPage.objects.first())
+    assert 'href="/static/css/birdbox-blog.' in media["css"]
+
+
+@pytest.mark.django_db
+def test_hashed_static_files_are_immutable(client):
+    resp = client.get(static("admin/css/base.css"))
+    assert "immutable" in resp["Cache-Control"]
+    resp.close()
@@ -0,0 +1,93 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import gzip
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import path
+
+import pytest
+from django_ratelimit.exceptions import Ratelimited
+
+from common import error_pages
+from common.views import rate_limited, server_error_view
+from microsite.models import MicrositeSettings
+
+pytestmark = pytest.mark.django_db
+
+urlpatterns = [
+    path("test-rate-limited/", rate_limited, {"exception": Ratelimited()}),
+    path("test-server-error/", server_error_view),
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_error_pages():
+    error_pages.clear()
+    yield
+    error_pages.clear()
+
+
+def _render_count(client, url, **kwargs):
+    with mock.patch("common.error_pages.render_to_string", wraps=error_pages.render_to_string) as mock_render:
+        for _ in range(3):
+            resp = client.get(url, **kwargs)
+    return resp, mock_render.call_count
+
+
+def test_404_is_rendered_once(client, minimal_site_with_blog):
+    resp, render_count = _render_count(client, "/nothing-here/")
+    assert resp.status_code == 404
+    assert b"Page not found" in resp.content
+    assert render_count == 1
+
+
+def test_404_is_rendered_again_when_settings_change(client, minimal_site_with_blog, django_capture_on_commit_callbacks):
+    microsite_settings = MicrositeSettings.load()
+    microsite_settings.navigation_enabled = False
+    microsite_settings.save()
+    assert b"birdbox-navigation" not in client.get("/nothing-here/").content
+
+    microsite_settings.navigation_enabled = True
+    with django_capture_on_commit_callbacks(execute=True):
+        microsite_settings.save()
+
+    assert b"birdbox-navigation" in client.get("/nothing-here/").content
+
+
+def test_404_compressed(client, minimal_site_with_blog):
+    plain = client.get("/nothing-here/")
+    resp, render_count = _render_count(client, "/nothing-here/", HTTP_ACCEPT_ENCODING="gzip")
+    assert resp["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in resp["Vary"]
+    assert gzip.decompress(resp.content) == plain.content
+    assert render_count == 0
+
+
+def test_404_for_logged_in_user_is_rendered_normally(staff_client, minimal_site_with_blog):
+    resp, render_count = _render_count(staff_client, "/nothing-here/")
+    assert resp.status_code == 404
+    assert b"Page not found" in resp.content
+    assert render_count == 0
+    assert "404.html" in [template.name for template in resp.templates]
+
+
+@pytest.mark.urls(__name__)
+def test_429(client, minimal_site_with_blog):
+    resp, render_count = _render_count(client, "/test-rate-limited/")
+    assert resp.status_code == 429
+    assert b"Please, take it easy" in resp.content
+    assert resp["Retry-After"] == "60"
+    assert resp["Cache-Control"] == "max-age=0, no-cache, no-store, must-revalidate, private"
+    assert render_count == 1
+
+
+@pytest.mark.urls(__name__)
+@override_settings(DEBUG_PROPAGATE_EXCEPTIONS=False)
+def test_500(client):
+    resp, render_count = _render_count(client, "/test-server-error/")
+    assert resp.status_code == 500
+    assert b"Internal server error" in resp.content
+    assert render_count == 1
@@ -0,0 +1,83 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import time
+from unittest import mock
+
+from django.test import override_settings
+
+import pytest
+
+from common import health
+
+pytestmark = pytest.mark.django_db
+
+OK = {"databases": [{"default": {"ok": True}}], "caches": [{"default": {"ok": True}}]}
+FAILING = {"databases": [{"default": {"ok": False, "error": "OperationalError"}}], "caches": [{"default": {"ok": True}}]}
+
+
+@pytest.fixture
+def checker():
+    with mock.patch.object(health.checker, "ensure_running"), mock.patch.object(health.checker, "result", None):
+        yield health.checker
+
+
+def test_readiness_is_served_from_memory(client, checker, django_assert_num_queries):
+    checker.result = health.CheckResult(OK, True, time.monotonic())
+    with django_assert_num_queries(0):
+        resp = client.get("/readiness/")
+    assert resp.status_code == 200
+    assert resp.json() == OK
+    assert "no-cache" in resp["Cache-Control"]
+    assert "Cookie" not in resp.get("Vary", "")
+
+
+def test_readiness_failing(client, checker):
+    checker.result = health.CheckResult(FAILING, False, time.monotonic())
+    resp = client.get("/readiness/")
+    assert resp.status_code == 500
+    assert resp.json() == FAILING
+
+
+@override_settings(READINESS_MAX_AGE=30)
+def test_readiness_stale(client, checker):
+    checker.result = health.CheckResult(OK, True, time.monotonic() - 31)
+    resp = client.get("/readiness/")
+    assert resp.status_code == 503
+    assert "31s ago" in resp.json()["message"]
+
+
+def test_readiness_never_checked(client, checker):
+    start = time.monotonic()
+    assert client.get("/readiness/").status_code == 503
+    # Without waiting for the first checks
+    assert time.monotonic() - start < 1
+
+
+@override_settings(RATELIMIT_ENABLE=True, RATELIMIT_DEFAULT_LIMIT="1/m")
+def test_probes_are_not_rate_limited(client, checker):
+    checker.result = health.CheckResult(OK, True, time.monotonic())
+    for _ in range(3):
+        assert client.get("/readiness/").status_code == 200
+        assert client.get("/healthz/").status_code == 200
+
+
+def test_run_checks():
+    result = health.run_checks()
+    assert set(result.checks) == {"caches", "databases"}
+    assert result.ok
+
+
+@override_settings(READINESS_CHECK_INTERVAL=0.05)
+def test_checker_thread():
+    checker = health.ReadinessChecker()
+    with mock.patch.object(health, "run_checks", return_value=health.CheckResult(OK, True, 0)) as mock_run_checks:
+        checker.ensure_running()
+        checker.ensure_running()
+        try:
+            time.sleep(0.2)
+            assert checker.result.checks == OK
+        finally:
+            checker.stop()
+    assert 2 <= mock_run_checks.call_count <= 6
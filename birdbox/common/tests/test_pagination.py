@@ -0,0 +1,101 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from datetime import date
+
+from django.core.paginator import Paginator
+from django.test import RequestFactory
+
+import pytest
+
+from common.cache_tags import bump_tag_versions, children_tag
+from common.pagination import KeysetPaginator
+from microsite.models import BlogIndexPage, BlogPage
+from microsite.tests.factories import BlogPageFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def blog_index(minimal_site_with_blog):
+    blog_index = BlogIndexPage.objects.get()
+    # Two on the same day, to be told apart by their IDs
+    for number, day in enumerate((1, 2, 2, 3, 4)):
+        BlogPageFactory(parent=blog_index, title=f"July {day}", slug=f"post-{number}", date=date(2023, 7, day))
+    return blog_index
+
+
+def _paginator(blog_index, **kwargs):
+    return KeysetPaginator(blog_index.get_non_featured_ordered_posts(), 3, fields=("date", "pk"), **kwargs)
+
+
+def _get_page(paginator, query_string):
+    return paginator.get_page(RequestFactory().get(f"/?{query_string}"))
+
+
+def test_numbered_pages(blog_index):
+    paginator = _paginator(blog_index)
+    offset_paginator = Paginator(blog_index.get_non_featured_ordered_posts(), 3)
+    assert paginator.count == offset_paginator.count == 7
+    assert paginator.page_range == offset_paginator.page_range
+
+    for number in paginator.page_range:
+        page = paginator.page(number)
+        assert list(page) == list(offset_paginator.page(number))
+        assert page.has_previous() == (number > 1)
+        assert page.has_next() == (number < 3)
+    assert paginator.page(99).number == 3
+
+
+def test_cursors(blog_index):
+    paginator = _paginator(blog_index)
+    first, second, last = (paginator.page(number) for number in paginator.page_range)
+
+    page = _get_page(paginator, first.next_query())
+    assert list(page) == list(second)
+    assert page.number == 2 and page.has_previous() and page.has_next()
+
+    page = _get_page(paginator, last.previous_query())
+    assert list(page) == list(second)
+
+    page = _get_page(paginator, second.previous_query())
+    assert list(page) == list(first)
+    assert page.number == 1 and not page.has_previous()
+
+    page = _get_page(paginator, second.next_query())
+    assert list(page) == list(last)
+    assert not page.has_next()
+
+
+@pytest.mark.parametrize(
+    "query_string, number",
+    [
+        ("page=junk", 1),
+        ("page=-4", 1),
+        ("page=99", 3),
+        ("after=junk", 1),
+        ("after=2023-02-31.1", 1),
+        ("after=2023-07-01", 1),
+        # Past either end
+        ("after=2000-01-01.1", 3),
+        ("before=2100-01-01.1", 1),
+    ],
+)
+def test_unexpected_query_strings(blog_index, query_string, number):
+    assert _get_page(_paginator(blog_index), query_string).number == number
+
+
+def test_boundaries_are_cached_until_the_listing_changes(blog_index, django_assert_num_queries):
+    tag = children_tag(blog_index)
+    assert _paginator(blog_index, cache_key="test", tags=[tag]).count == 7
+
+    BlogPageFactory(parent=blog_index, title="July 5", date=date(2023, 7, 5))
+    paginator = _paginator(blog_index, cache_key="test", tags=[tag])
+    # Just the cache lookups, for the tag's version and the boundaries
+    with django_assert_num_queries(2):
+        assert paginator.count == 7
+
+    bump_tag_versions([tag])
+    assert _paginator(blog_index, cache_key="test", tags=[tag]).count == 8
+    assert BlogPage.objects.count() == 9
@@ -0,0 +1,49 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from common.preload import IMAGE, SCRIPT, STYLE, add_preload, get_preloads, set_preload_header
+
+
+def test_add_preload__dedupes_and_keeps_order():
+    request = RequestFactory().get("/")
+    add_preload(request, "/static/b.css", STYLE)
+    add_preload(request, "/static/a.js", SCRIPT)
+    add_preload(request, "/static/b.css", STYLE)
+    add_preload(request, "", STYLE)
+    assert get_preloads(request) == [("/static/b.css", STYLE), ("/static/a.js", SCRIPT)]
+
+
+def test_add_preload__only_first_image():
+    request = RequestFactory().get("/")
+    add_preload(request, "/media/hero.jpg", IMAGE)
+    add_preload(request, "/media/other.jpg", IMAGE)
+    assert get_preloads(request) == [("/media/hero.jpg", IMAGE)]
+
+
+def test_add_preload__ignores_missing_request():
+    add_preload(None, "/static/a.css", STYLE)  # Does not raise
+
+
+@override_settings(PRELOAD_MAX_LINKS=2)
+def test_set_preload_header():
+    request = RequestFactory().get("/")
+    for url in ("/a.css", "/b.css", "/c.css"):
+        add_preload(request, url, STYLE)
+
+    response = set_preload_header(request, HttpResponse())
+    assert response["Link"] == "</a.css>; rel=preload; as=style, </b.css>; rel=preload; as=style"
+
+
+def test_set_preload_header__keeps_existing_links_and_skips_errors():
+    request = RequestFactory().get("/")
+    add_preload(request, "/a.js", SCRIPT)
+
+    response = HttpResponse()
+    response["Link"] = '<https://example.com/>; rel="preconnect"'
+    assert set_preload_header(request, response)["Link"] == '<https://example.com/>; rel="preconnect", </a.js>; rel=preload; as=script'
+
+    assert "Link" not in set_preload_header(request, HttpResponse(status=404))
@@ -0,0 +1,118 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import time
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import path, reverse
+
+import pytest
+
+from common.profiling import RESPONSE_HEADER, StackSampler, list_profiles
+
+pytestmark = pytest.mark.django_db
+
+
+def _busy():
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+
+
+def _view(request):
+    _busy()
+    return HttpResponse("OK")
+
+
+def _streaming_view(request):
+    def _content():
+        _busy()
+        yield "OK"
+
+    return StreamingHttpResponse(_content())
+
+
+urlpatterns = [
+    path("busy/", _view),
+    path("streaming/", _streaming_view),
+]
+
+
+@pytest.fixture(autouse=True)
+def profiling_settings(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.PROFILING_INTERVAL = 0.001
+
+
+def test_sampler():
+    sampler = StackSampler(0.001)
+    sampler.start()
+    _busy()
+    sampler.stop()
+    assert sampler.stacks
+    stack, _ = sampler.stacks.most_common(1)[0]
+    assert stack.split(";")[-1].startswith("_busy (test_profiling.py:")
+    assert "test_sampler (test_profiling.py:" in stack
+
+
+@pytest.mark.urls(__name__)
+def test_sampled(client, settings):
+    settings.PROFILING_SAMPLE_RATE = 1
+    settings.GIT_SHA = "abc123"
+    resp = client.get("/busy/")
+    # Only staff are told which profile it is
+    assert RESPONSE_HEADER not in resp
+
+    [profile] = list_profiles()
+    assert profile["path"] == "/busy/"
+    assert profile["route"] == "busy/"
+    assert profile["git_sha"] == "abc123"
+    assert profile["samples"] > 0
+
+
+@pytest.mark.urls(__name__)
+def test_not_profiled(client, settings):
+    client.get("/busy/", HTTP_X_BIRDBOX_PROFILE="1")
+    settings.PROFILING_ENABLED = False
+    settings.PROFILING_SAMPLE_RATE = 1
+    client.get("/busy/")
+    assert list_profiles() == []
+
+
+@pytest.mark.urls(__name__)
+def test_streamed_responses_are_profiled_until_closed(client, settings):
+    settings.PROFILING_SAMPLE_RATE = 1
+    resp = client.get("/streaming/")
+    assert list_profiles() == []
+    assert b"".join(resp.streaming_content) == b"OK"
+    [profile] = list_profiles()
+    assert profile["duration_ms"] >= 50
+
+
+@pytest.mark.urls(__name__)
+def test_only_the_latest_are_kept(client, settings):
+    settings.PROFILING_SAMPLE_RATE = 1
+    settings.PROFILING_MAX_PROFILES = 2
+    for _ in range(3):
+        client.get("/busy/")
+    assert len(list_profiles()) == 2
+
+
+def test_requested_by_staff(client, log_in, minimal_site_with_blog, admin_user, django_user_model):
+    log_in(django_user_model.objects.create_user(username="visitor"))
+    assert RESPONSE_HEADER not in client.get("/blog-index/", HTTP_X_BIRDBOX_PROFILE="1")
+    assert client.get(reverse("profiles")).status_code == 302
+    assert list_profiles() == []
+
+    log_in(admin_user)
+    profile_id = client.get("/blog-index/", HTTP_X_BIRDBOX_PROFILE="1")[RESPONSE_HEADER]
+    [profile] = client.get(reverse("profiles")).json()["profiles"]
+    assert profile["id"] == profile_id
+    assert profile["page_type"] == "microsite.BlogIndexPage"
+
+    resp = client.get(reverse("profile_download", args=[profile_id]))
+    assert resp["Content-Disposition"] == f'attachment; filename="profile-{profile_id}.folded"'
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in resp.content.decode().splitlines())
+    assert client.get(reverse("profile_download", args=["123-456"])).status_code == 404
@@ -0,0 +1,138 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.test import override_settings
+
+import pytest
+
+from common import purging
+
+
+class _FakeCDNHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.received.append(
+            {
+                "payload": json.loads(body),
+                "authorization": self.headers.get("Authorization"),
+            }
+        )
+        self.send_response(self.server.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_cdn():
+    server = HTTPServer(("127.0.0.1", 0), _FakeCDNHandler)
+    server.received = []
+    server.status_code = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def http_backend_settings(fake_cdn):
+    with override_settings(
+        CDN_PURGE_BACKEND="common.purging.HTTPPurgeBackend",
+        CDN_PURGE_HTTP_ENDPOINT=f"http://127.0.0.1:{fake_cdn.server_port}/purge",
+        CDN_PURGE_HTTP_TOKEN="s3kr1t",
+        CDN_PURGE_DEBOUNCE_SECONDS=0,
+        CDN_PURGE_BATCH_SIZE=2,
+    ):
+        yield
+
+
+def test_http_backend__batches_urls_and_keys(fake_cdn, http_backend_settings):
+    dispatcher = purging.PurgeDispatcher()
+    dispatcher.queue(
+        urls=["https://example.com/c/", "https://example.com/a/", "https://example.com/b/"],
+        keys=["p1"],
+    )
+    assert [x["payload"] for x in fake_cdn.received] == [
+        # Along with the tag of pages whose tags didn't all fit in their headers
+        {"keys": ["p1", "overflow"]},
+        {"urls": ["https://example.com/a/", "https://example.com/b/"]},
+        {"urls": ["https://example.com/c/"]},
+    ]
+    assert {x["authorization"] for x in fake_cdn.received} == {"Bearer s3kr1t"}
+
+
+def test_http_backend__purge_all_is_a_single_call(fake_cdn, http_backend_settings):
+    dispatcher = purging.PurgeDispatcher()
+    with override_settings(CDN_PURGE_DEBOUNCE_SECONDS=60):
+        dispatcher.queue(urls=[f"https://example.com/page-{i}/" for i in range(5000)])
+        dispatcher.queue(purge_all=True)
+    dispatcher.flush()
+    assert [x["payload"] for x in fake_cdn.received] == [{"purge_all": True}]
+
+
+def test_http_backend__errors_are_not_fatal(fake_cdn, http_backend_settings):
+    fake_cdn.status_code = 500
+    dispatcher = purging.PurgeDispatcher()
+    with mock.patch("common.purging.logger") as mock_logger:
+        dispatcher.queue(keys=["p1"])
+    assert len(fake_cdn.received) == 1
+    assert mock_logger.warning.call_count == 1
+
+
+@override_settings(CDN_PURGE_DEBOUNCE_SECONDS=0.05, CDN_PURGE_MAX_DELAY_SECONDS=10)
+@mock.patch("common.purging.get_backend")
+def test_dispatcher__debounces_into_one_batch(mock_get_backend):
+    dispatcher = purging.PurgeDispatcher()
+    for i in range(5):
+        dispatcher.queue(urls=[f"https://example.com/{i}/"])
+    assert mock_get_backend.call_count == 0
+
+    time.sleep(0.3)
+
+    backend = mock_get_backend.return_value
+    assert backend.purge_urls.call_count == 1
+    assert backend.purge_urls.call_args[0][0] == [f"https://example.com/{i}/" for i in range(5)]
+
+
+@override_settings(CDN_PURGE_DEBOUNCE_SECONDS=0.2, CDN_PURGE_MAX_DELAY_SECONDS=0)
+@mock.patch("common.purging.get_backend")
+def test_dispatcher__max_delay_caps_debouncing(mock_get_backend):
+    dispatcher = purging.PurgeDispatcher()
+    dispatcher.queue(urls=["https://example.com/"])
+    time.sleep(0.1)
+    assert mock_get_backend.return_value.purge_urls.call_count == 1
+
+
+@mock.patch("common.purging.get_backend")
+def test_dispatcher__nothing_queued_means_no_backend_call(mock_get_backend):
+    dispatcher = purging.PurgeDispatcher()
+    dispatcher.queue(urls=[None, ""])
+    dispatcher.flush()
+    assert mock_get_backend.call_count == 0
+
+
+@pytest.mark.django_db
+@mock.patch("common.purging.dispatcher")
+def test_purge_helpers_wait_for_transaction_commit(mock_dispatcher, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        purging.purge_urls(["https://example.com/"])
+        purging.purge_keys(["p1"])
+        purging.purge_all()
+    assert mock_dispatcher.queue.call_count == 0
+
+    for callback in callbacks:
+        callback()
+    assert mock_dispatcher.queue.call_args_list == [
+        mock.call(urls=["https://example.com/"]),
+        mock.call(keys=["p1"]),
+        mock.call(purge_all=True),
+    ]
@@ -0,0 +1,121 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+
+import pytest
+from wagtail.models import Page
+
+from common.query_budget import QueryBudgetExceeded
+
+pytestmark = pytest.mark.django_db
+
+
+def _view(request):
+    for _ in range(3):
+        list(Page.objects.filter(depth=1))
+    cache.get("some-key")
+    return HttpResponse("OK")
+
+
+def _streaming_view(request):
+    def _content():
+        for _ in range(2):
+            yield str(Page.objects.count())
+
+    return StreamingHttpResponse(_content())
+
+
+urlpatterns = [
+    path("view/", _view, name="test_view"),
+    path("streaming/", _streaming_view),
+]
+
+
+@pytest.fixture(autouse=True)
+def sample_everything(settings):
+    settings.QUERY_BUDGET_SAMPLE_RATE = 1
+    settings.QUERY_BUDGETS = {"default": 100}
+
+
+@pytest.mark.urls(__name__)
+def test_counts_and_attributes(client):
+    stats = client.get("/view/").wsgi_request.query_stats
+    assert stats.queries == 3
+    assert stats.duplicates == 2
+    assert stats.query_sources == {"common/tests/test_query_budget.py:_view": 3}
+    # Includes the rate limiter's
+    assert stats.cache_calls >= 2
+    assert stats.cache_sources["common/tests/test_query_budget.py:_view"] == 1
+
+
+@pytest.mark.urls(__name__)
+def test_other_query_wrappers_are_not_blamed(client):
+    # As load_test counts queries, say
+    def _count_query(execute, sql, params, many, context):
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(_count_query):
+        stats = client.get("/view/").wsgi_request.query_stats
+    assert stats.query_sources == {"common/tests/test_query_budget.py:_view": 3}
+
+
+def test_attributes_to_templates(client, minimal_site_with_blog):
+    with CaptureQueriesContext(connection) as captured:
+        resp = client.get("/blog-index/")
+    stats = resp.wsgi_request.query_stats
+    assert stats.queries > 0
+    # Each post's image rendition, say
+    assert any(source.startswith("template microsite/partials/blog_index_single_post.html:") for source in stats.query_sources)
+    assert any(source.startswith("microsite/models.py:BlogIndexPage.") for source in stats.query_sources)
+    # The DatabaseCache's queries are counted as cache calls
+    assert stats.cache_calls > 0
+    assert stats.queries < len(captured)
+
+
+@pytest.mark.urls(__name__)
+def test_within_budget_is_logged(client, caplog):
+    with caplog.at_level(logging.INFO, logger="common.query_budget"):
+        client.get("/view/")
+    assert "GET /view/: 3 queries (2 duplicates)" in caplog.text
+
+
+@pytest.mark.urls(__name__)
+def test_over_budget(client, settings, caplog):
+    settings.QUERY_BUDGETS = {"test_view": 2, "default": 100}
+    client.get("/view/")
+    assert "GET /view/ went over its query budget of 2 (test_view): 3 queries" in caplog.text
+
+    settings.QUERY_BUDGET_RAISE = True
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/view/")
+
+
+def test_budget_by_page_model(client, minimal_site_with_blog, settings, caplog):
+    settings.QUERY_BUDGETS = {"microsite.BlogIndexPage": 0, "wagtail_serve": 100}
+    client.get("/blog-index/")
+    assert "went over its query budget of 0 (microsite.BlogIndexPage)" in caplog.text
+
+
+@pytest.mark.urls(__name__)
+def test_streamed_responses_are_checked_at_the_end(client, settings, caplog):
+    settings.QUERY_BUDGETS = {"default": 1}
+    resp = client.get("/streaming/")
+    assert resp.wsgi_request.query_stats.queries == 0
+    assert b"".join(resp.streaming_content)
+    assert resp.wsgi_request.query_stats.queries == 2
+    assert "went over its query budget of 1 (default): 2 queries" in caplog.text
+
+
+@pytest.mark.urls(__name__)
+@override_settings(QUERY_BUDGET_SAMPLE_RATE=0)
+def test_not_sampled(client):
+    assert not hasattr(client.get("/view/").wsgi_request, "query_stats")
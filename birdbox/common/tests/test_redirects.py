@@ -0,0 +1,108 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from django.test import override_settings
+
+import pytest
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Site
+
+from common.cache_tags import get_tag_versions
+from common.redirects import REDIRECTS_TAG, PrefixTrie, Target, get_prefixes
+from microsite.models import BlogIndexPage, BlogPage
+
+pytestmark = pytest.mark.django_db
+
+
+def test_prefix_trie():
+    trie = PrefixTrie()
+    trie.add("/a/", Target("/to-a/", True))
+    trie.add("/a/b/c/", Target("/to-c/", False))
+
+    assert trie.find("/a/") == Target("/to-a/", True)
+    assert trie.find("/a/b/") == Target("/to-a/", True)
+    assert trie.find("/a/b/c/d/") == Target("/to-c/", False)
+    assert trie.find("/ab/") is None
+    assert trie.find("/") is None
+
+
+@pytest.fixture
+def clear_prefixes():
+    get_prefixes.cache_clear()
+    yield
+    get_prefixes.cache_clear()
+
+
+@override_settings(PREFIX_REDIRECTS={"/old-section/": "https://example.com/new-section/"})
+def test_prefix_redirects_take_priority_over_pages(client, minimal_site_with_blog, clear_prefixes):
+    blog_index = BlogIndexPage.objects.get()
+    blog_index.slug = "old-section"
+    blog_index.save_revision().publish()
+
+    resp = client.get("/old-section/blog-post-1/")
+    assert resp.status_code == 301
+    assert resp["Location"] == "https://example.com/new-section/"
+
+
+def test_redirect_for_missing_page_skips_the_view(client, minimal_site_with_blog):
+    Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/", is_permanent=False)
+
+    resp = client.get("/gone/")
+    assert resp.status_code == 302
+    assert resp["Location"] == "https://example.com/"
+    # The 404 page wasn't rendered first
+    assert "404.html" not in [template.name for template in resp.templates]
+
+
+def test_redirect_to_page(client, minimal_site_with_blog):
+    blog_page = BlogPage.objects.get(title="blog post 3")
+    Redirect.objects.create(old_path="/gone", redirect_page=blog_page)
+
+    resp = client.get("/gone/?utm_source=x")
+    assert resp.status_code == 301
+    assert resp["Location"] == blog_page.url
+
+    # Follows the page when it moves
+    blog_page.slug = "moved"
+    blog_page.save_revision().publish()
+    assert client.get("/gone/")["Location"] == BlogPage.objects.get(pk=blog_page.pk).url
+
+
+def test_table_is_not_recompiled_for_drafts(minimal_site_with_blog, django_capture_on_commit_callbacks):
+    blog_page = BlogPage.objects.get(title="blog post 3")
+    version = get_tag_versions([REDIRECTS_TAG])[REDIRECTS_TAG]
+    with django_capture_on_commit_callbacks(execute=True):
+        blog_page.slug = "draft-slug"
+        blog_page.save_revision()
+    assert get_tag_versions([REDIRECTS_TAG])[REDIRECTS_TAG] == version
+
+
+def test_pages_take_priority_over_redirects(client, minimal_site_with_blog):
+    Redirect.objects.create(old_path="/blog-index", redirect_link="https://example.com/")
+    assert client.get("/blog-index/").status_code == 200
+
+
+def test_site_specific_redirects_are_preferred(client, minimal_site_with_blog):
+    site = Site.find_for_request(client.get("/").wsgi_request)
+    Redirect.objects.create(old_path="/gone", redirect_link="https://example.com/all-sites")
+    Redirect.objects.create(old_path="/gone", site=site, redirect_link="https://example.com/this-site")
+
+    assert client.get("/gone/")["Location"] == "https://example.com/this-site"
+
+
+def test_redirects_below_pages(client, minimal_site_with_blog):
+    Redirect.objects.create(old_path="/blog-index/blog-post-1/nope", redirect_link="https://example.com/")
+    assert client.get("/blog-index/blog-post-1/nope/").status_code == 301
+
+
+def test_redirects_are_checked_for_other_404s(client, minimal_site_with_blog):
+    # Not a page, so only known to be a 404 once the view has been called
+    Redirect.objects.create(old_path="/documents/999/missing.pdf", redirect_link="https://example.com/")
+    assert client.get("/documents/999/missing.pdf").status_code == 301
+
+
+def test_no_redirect(client, minimal_site_with_blog):
+    resp = client.get("/gone/")
+    assert resp.status_code == 404
+    assert "404.html" in [template.name for template in resp.templates]
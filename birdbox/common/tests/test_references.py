@@ -0,0 +1,63 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+
+import pytest
+from wagtail.models import Page
+from wagtail.rich_text import RichText
+
+from common.references import get_referrer_tags, get_referrers
+from microsite.models import BlogPage, Footer
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def site_with_links(minimal_site_with_blog):
+    post1, post2, post3 = BlogPage.objects.order_by("date")
+
+    # A rich text link from one post to another...
+    post1.body = [("blogtext", RichText(f'<p><a linktype="page" id="{post3.pk}">Read this</a></p>'))]
+    post1.save()
+
+    # ...and a LinkBlock in the Footer
+    footer = Footer.load()
+    footer.columns = json.dumps(
+        [
+            {
+                "type": "grouped_links",
+                "value": {
+                    "title": "Blog",
+                    "links": [{"label": "Post 3", "page": post3.pk, "external_url": "", "rel": ""}],
+                },
+            }
+        ]
+    )
+    footer.save()
+    return post1, post2, post3, footer
+
+
+def test_get_referrers(site_with_links):
+    post1, post2, post3, footer = site_with_links
+
+    referrers = get_referrers([post1, post2, post3, post1.feed_image])
+
+    assert referrers[post3] == {(Page, str(post1.pk)), (Footer, str(footer.pk))}
+    # Images are referenced via plain ForeignKeys, too
+    assert referrers[post1.feed_image] == {(Page, str(post1.pk))}
+    # Nothing links to the other posts
+    assert post1 not in referrers
+    assert post2 not in referrers
+
+
+def test_get_referrers__no_objects():
+    assert get_referrers([]) == {}
+
+
+def test_get_referrer_tags(site_with_links):
+    post1, post2, post3, footer = site_with_links
+
+    assert get_referrer_tags([post3]) == {f"p{post1.pk}", "footer"}
+    assert get_referrer_tags([post2]) == set()
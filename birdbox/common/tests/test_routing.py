@@ -0,0 +1,128 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+from wagtail.models import PageViewRestriction, Site
+
+from common.cache_tags import get_tag_versions
+from common.routing import ROUTING_TAG, get_index, get_route
+from microsite.models import BlogPage, GeneralPurposePage
+from microsite.tests.factories import ExternalRedirectionPageFactory, StructuralPageFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def deep_page(homepage):
+    "A page a few levels down, under StructuralPages"
+    parent = homepage
+    for slug in ("one", "two", "three"):
+        parent = StructuralPageFactory(parent=parent, slug=slug, title=slug)
+    return parent.add_child(instance=GeneralPurposePage(title="Deep", slug="deep"))
+
+
+def test_deep_page_is_served(client, deep_page):
+    resp = client.get("/one/two/three/deep/")
+    assert resp.status_code == 200
+    assert resp.context["page"] == deep_page
+
+
+def test_route_lookup(homepage, deep_page):
+    index = get_index()
+    site = Site.objects.get(root_page=homepage)
+    with CaptureQueriesContext(connection) as queries:
+        route, remaining = index.match(site, ["one", "two", "three", "deep"])
+    assert len(queries) == 0
+    assert route.page_id == deep_page.pk
+    assert remaining == []
+    assert not route.restricted
+
+    # The specific page, in one query, knowing it has no restrictions
+    with CaptureQueriesContext(connection) as queries:
+        page = route.get_page()
+        assert not page.get_view_restrictions()
+    assert len(queries) == 1
+    assert isinstance(page, GeneralPurposePage)
+    assert get_route(page) == route
+
+
+def test_unknown_paths_fall_back_to_the_nearest_page(homepage, deep_page):
+    route, remaining = get_index().match(Site.objects.get(root_page=homepage), ["one", "two", "nope", "deeper"])
+    assert route.page_id == deep_page.get_parent().get_parent().pk
+    assert remaining == ["nope", "deeper"]
+
+
+def test_unknown_page_is_404(client, deep_page):
+    assert client.get("/one/two/nope/").status_code == 404
+    assert client.get("/one/two/three/deep/deeper/").status_code == 404
+
+
+def test_draft_page_is_404(client, deep_page):
+    deep_page.unpublish()
+    assert client.get("/one/two/three/deep/").status_code == 404
+
+
+def test_structural_page_redirects_without_being_fetched(client, deep_page):
+    with mock.patch("common.routing.Route.get_page") as mock_get_page:
+        resp = client.get("/one/two/")
+    assert resp.status_code == 302
+    assert resp["Location"] == deep_page.get_parent().get_parent().get_parent().get_full_url()
+    assert mock_get_page.call_count == 0
+
+
+def test_external_redirection_page(client, homepage):
+    ExternalRedirectionPageFactory(parent=homepage, slug="elsewhere", destination="https://example.com/path/")
+    resp = client.get("/elsewhere/")
+    assert resp.status_code == 302
+    assert resp["Location"] == "https://example.com/path/"
+
+
+def test_restricted_pages(client, deep_page):
+    assert client.get("/one/two/three/deep/").status_code == 200
+
+    PageViewRestriction.objects.create(page=deep_page.get_parent(), restriction_type=PageViewRestriction.PASSWORD, password="secret")
+
+    assert get_index().routes[deep_page.url_path].restricted
+    resp = client.get("/one/two/three/deep/")
+    assert resp.status_code == 200
+    assert b'name="password"' in resp.content
+    # The restricted StructuralPage can't redirect before the restriction
+    # is checked
+    assert client.get("/one/two/three/").status_code == 200
+
+
+def test_index_is_rebuilt_when_the_tree_changes(client, minimal_site_with_blog):
+    blog_page = BlogPage.objects.get(title="blog post 1")
+    old_url = blog_page.url
+    assert client.get(old_url).status_code == 200
+
+    blog_page.slug = "renamed"
+    blog_page.save_revision().publish()
+
+    assert client.get(old_url).status_code == 404
+    assert client.get(BlogPage.objects.get(pk=blog_page.pk).url).status_code == 200
+
+
+def test_index_is_only_rebuilt_for_changes_to_routing(minimal_site_with_blog, django_capture_on_commit_callbacks):
+    blog_page = BlogPage.objects.get(title="blog post 1")
+    version = get_tag_versions([ROUTING_TAG])[ROUTING_TAG]
+
+    # Drafts, locks and moderation leave the live tree as it was
+    with django_capture_on_commit_callbacks(execute=True):
+        blog_page.title = "Draft title"
+        revision = blog_page.save_revision()
+        blog_page.locked = True
+        blog_page.save(update_fields=["locked"])
+        draft = BlogPage(title="New draft", slug="new-draft", date=blog_page.date, live=False, feed_image=blog_page.feed_image)
+        blog_page.add_sibling(instance=draft)
+    assert get_tag_versions([ROUTING_TAG])[ROUTING_TAG] == version
+
+    with django_capture_on_commit_callbacks(execute=True):
+        revision.publish()
+    assert get_tag_versions([ROUTING_TAG])[ROUTING_TAG] > version
@@ -0,0 +1,101 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import logging
+import time
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import override_settings
+from django.urls import path
+
+import pytest
+from wagtail.models import Page
+
+from common.server_timing import Timings, timed
+from microsite.models import BlogPage
+
+pytestmark = pytest.mark.django_db
+
+
+def _view(request):
+    with timed("thinking"):
+        list(Page.objects.all())
+        time.sleep(0.01)
+    return HttpResponse("OK")
+
+
+def _streaming_view(request):
+    def _content():
+        with timed("streaming"):
+            yield str(Page.objects.count())
+
+    return StreamingHttpResponse(_content())
+
+
+urlpatterns = [
+    path("view/", _view),
+    path("streaming/", _streaming_view),
+]
+
+
+def _metrics(response):
+    return {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+
+
+def test_header_value():
+    timings = Timings()
+    timings.add("db", 0.0012)
+    timings.add("db", 0.001)
+    timings.add("total", 0.05)
+    assert timings.header_value() == 'db;dur=2.2;desc="2x", total;dur=50.0'
+
+
+def test_timed_does_nothing_outside_a_timed_request():
+    with timed("anything"):
+        pass
+
+
+@pytest.mark.urls(__name__)
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+def test_sampled(client, caplog):
+    with caplog.at_level(logging.INFO, logger="common.server_timing"):
+        resp = client.get("/view/")
+    metrics = _metrics(resp)
+    assert set(metrics) >= {"total", "thinking", "db", "cache"}
+    assert float(metrics["thinking"].split("dur=")[1]) >= 10
+
+    record = next(record for record in caplog.records if record.name == "common.server_timing")
+    assert record.getMessage().startswith("Server timing for GET /view/: ")
+    assert record.server_timing["thinking"] >= 10
+
+
+@pytest.mark.urls(__name__)
+def test_not_sampled(client):
+    assert "Server-Timing" not in client.get("/view/")
+
+
+def test_phases_and_blocks_for_staff(staff_client, minimal_site_with_blog):
+    metrics = _metrics(staff_client.get("/blog-index/"))
+    assert {"total", "db", "cache", "routing", "context", "nav", "footer", "media"} <= set(metrics)
+
+    post = BlogPage.objects.first()
+    post.body = [{"type": "blogtext", "value": "<p>Hello</p>"}, {"type": "blogtext", "value": "<p>Again</p>"}]
+    post.save_revision().publish()
+    assert _metrics(staff_client.get(post.url))["block-blogtext"].endswith(';desc="2x"')
+
+
+def test_not_for_other_users(client, log_in, minimal_site_with_blog, django_user_model):
+    log_in(django_user_model.objects.create_user(username="visitor"))
+    assert "Server-Timing" not in client.get("/blog-index/")
+
+
+@pytest.mark.urls(__name__)
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+def test_streamed_responses(client, caplog):
+    with caplog.at_level(logging.INFO, logger="common.server_timing"):
+        resp = client.get("/streaming/")
+        assert "streaming" not in _metrics(resp)
+        assert b"".join(resp.streaming_content)
+    record = next(record for record in caplog.records if record.name == "common.server_timing")
+    assert {"total", "streaming", "db"} <= set(record.server_timing)
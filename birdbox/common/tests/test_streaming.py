@@ -0,0 +1,126 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import gzip
+
+from django.http import StreamingHttpResponse
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+from django.test import RequestFactory
+
+import gevent
+import pytest
+
+from common.cache_tags import bump_tag_versions, page_tag
+from common.streaming import stream_template_response
+from microsite.models import Footer, ProtocolTestPage
+
+TEMPLATE = """{% load birdbox_tags %}<head></head>
+{% for item in items %}{% streamable %}<p>{{ forloop.counter }}: {{ item }}</p>{% streamable %}<i>{{ item }}</i>{% endstreamable %}{% endstreamable %}
+{% endfor %}<footer></footer>"""
+
+
+def _template_response(request):
+    template = engines["django"].from_string(TEMPLATE)
+    return SimpleTemplateResponse(template, {"items": ["a", "b", "c"], "request": request})
+
+
+def test_streamable_does_nothing_when_not_streaming(rf):
+    request = rf.get("/")
+    response = _template_response(request)
+    response.render()
+    assert "<p>2: b</p><i>b</i>" in response.content.decode()
+    assert "stream:" not in response.content.decode()
+
+
+def test_stream_template_response(rf):
+    request = rf.get("/")
+    expected = _template_response(RequestFactory().get("/")).render().content
+
+    completed = []
+    response = stream_template_response(request, _template_response(request), completed.append)
+    assert isinstance(response, StreamingHttpResponse)
+
+    chunks = list(response.streaming_content)
+    # The start of the page is sent before the first streamable part is rendered
+    assert chunks[0].startswith(b"<head></head>")
+    assert b"<p>" not in chunks[0]
+    assert len(chunks) > 3
+    assert b"".join(chunks) == expected
+    assert completed == [expected]
+
+
+def test_stream_template_response__error_after_start(rf):
+    request = rf.get("/")
+    template = engines["django"].from_string(
+        "{% load birdbox_tags %}<head></head>{% streamable %}{% include 'does-not-exist.html' %}{% endstreamable %}"
+    )
+    completed = []
+    response = stream_template_response(request, SimpleTemplateResponse(template, {"request": request}), completed.append)
+
+    assert list(response.streaming_content) == [b"<head></head>"]
+    # An incomplete page must not be cached
+    assert completed == []
+
+
+@pytest.mark.django_db
+class TestStreamedPage:
+    @pytest.fixture
+    def page(self, homepage):
+        Footer.load()
+        return homepage.add_child(
+            instance=ProtocolTestPage(
+                title="Streamed",
+                slug="streamed",
+                body=[{"type": block_type, "value": {}} for block_type in ("hero", "cards", "split", "callout")],
+            )
+        )
+
+    def test_first_render_is_not_streamed(self, client, page):
+        resp = client.get(page.url)
+        assert resp.status_code == 200
+        assert not resp.streaming
+
+    def test_streamed_once_headers_are_known(self, client, page):
+        first = client.get(page.url)
+        # Stale the stored copy, so that the page has to be rendered again
+        bump_tag_versions([page_tag(page)])
+
+        resp = client.get(page.url)
+        assert resp.streaming
+        assert resp["ETag"] != first["ETag"]
+        assert resp["Last-Modified"]
+        assert page_tag(page) in resp["Surrogate-Key"].split()
+        assert resp["Link"] == first["Link"]
+
+        chunks = list(resp.streaming_content)
+        assert b"</head>" in chunks[0]
+        assert b"mzp-c-callout" in first.content
+        assert b"mzp-c-callout" not in chunks[0]
+        assert b"".join(chunks) == first.content
+
+        # Once streamed, the page was stored, so is served from there
+        stored = client.get(page.url)
+        assert not stored.streaming
+        assert stored["ETag"] == resp["ETag"]
+        assert stored.content == first.content
+
+    def test_streamed_and_compressed(self, client, page):
+        first = client.get(page.url)
+        bump_tag_versions([page_tag(page)])
+
+        resp = client.get(page.url, HTTP_ACCEPT_ENCODING="gzip")
+        assert resp.streaming
+        assert resp["Content-Encoding"] == "gzip"
+        assert not resp.has_header("Content-Length")
+        assert gzip.decompress(b"".join(resp.streaming_content)) == first.content
+
+    def test_streamed_in_greenlet(self, client, page):
+        "As it would be, with gunicorn's gevent worker"
+        first = client.get(page.url)
+        bump_tag_versions([page_tag(page)])
+
+        resp = client.get(page.url)
+        content = gevent.spawn(lambda: b"".join(resp.streaming_content)).get()
+        assert content == first.content
@@ -2,8 +2,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import json
+
 from django.conf import settings
-from django.test import override_settings
+from django.test import Client, override_settings
 from django.urls import path, reverse
 
 import pytest
@@ -76,3 +78,29 @@ def test_builders_redirect_does_not_affect_anyting_else(client, minimal_site_wit
 
     resp = client.get(bp3.url, follow=False)
     assert resp.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.urls("birdbox.urls")
+def test_csrf_token_view(client):
+    resp = client.get("/csrf-token/")
+    assert resp.status_code == 200
+    assert resp.json()["csrfToken"]
+    assert "no-store" in resp["Cache-Control"]
+    assert settings.CSRF_COOKIE_NAME in resp.cookies
+
+
+@pytest.mark.django_db
+@pytest.mark.urls("birdbox.urls")
+def test_contact_form_still_protected_with_fetched_csrf_token():
+    client = Client(enforce_csrf_checks=True)
+    url = reverse("handle-contact-form", args=["GenericContactForm"])
+    data = json.dumps({"email": "test@example.com", "name": "Test"})
+
+    resp = client.post(url, data, content_type="application/json")
+    assert resp.status_code == 403
+
+    token = client.get("/csrf-token/").json()["csrfToken"]
+    resp = client.post(url, data, content_type="application/json", HTTP_X_CSRFTOKEN=token)
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
@@ -98,6 +98,10 @@ def get_freshest_newsletter_data() -> Dict:
                 data = _load_local_newsletter_data()
         try:
             cache.set(key, data, timeout=settings.BASKET_NEWSLETTER_DATA_TTL_HOURS)
+            # Imported here to avoid a circular import
+            from .cache_tags import BASKET_TAG, bump_tag_versions
+
+            bump_tag_versions([BASKET_TAG])
         except OperationalError:
             # During initial setup the cache table won't be available
             pass
@@ -2,19 +2,33 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
-from django.http import HttpResponsePermanentRedirect
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib import messages
+from django.http import Http404, HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import redirect, render
 from django.views.decorators.cache import never_cache
 
+from wagtail import hooks
+from wagtail.admin.auth import user_passes_test
+from wagtail.models import Page
+from wagtail.views import serve as wagtail_serve
 
-def server_error_view(request, template_name="500.html"):
-    """500 error handler that runs context processors."""
-    return render(request, template_name, status=500)
+from .block_profiling import BUCKETS, get_profiles, reset_profiles
+from .error_pages import error_page_response
+from .profiling import get_profile, list_profiles
+from .routing import get_index
+from .server_timing import timed
 
 
-def page_not_found_view(request, exception=None, template_name="404.html"):
-    """404 error handler that runs context processors."""
-    return render(request, template_name, status=404)
+def server_error_view(request):
+    """500 error handler, serving the pre-rendered page (see common.error_pages)"""
+    return error_page_response(request, 500)
+
+
+def page_not_found_view(request, exception=None):
+    """404 error handler, serving the pre-rendered page (see common.error_pages)"""
+    return error_page_response(request, 404)
 
 
 def csrf_failure(request, reason="CSRF failure", template_name="403_csrf.html"):
@@ -23,11 +37,107 @@ def csrf_failure(request, reason="CSRF failure", template_name="403_csrf.html"):
 
 @never_cache
 def rate_limited(request, exception):
-    """Render a rate-limited exception page"""
-    response = render(request, "429.html", status=429)
+    """Serves the pre-rendered rate-limited page (see common.error_pages)"""
+    response = error_page_response(request, 429)
     response["Retry-After"] = "60"
     return response
 
 
-def redirect_view(request, **kwargs):
-    return HttpResponsePermanentRedirect(kwargs["dest"])
+@never_cache
+def csrf_token_view(request):
+    """Returns a CSRF token (and sets the CSRF cookie it pairs with) for forms
+    on pages that were rendered without one - see FORMS_FETCH_CSRF_TOKEN"""
+    return JsonResponse({"csrfToken": get_token(request)})
+
+
+def serve_page(request, path):
+    """Serves pages in place of Wagtail's own `serve` view, finding them via
+    the routing index (see common.routing) rather than by walking the tree.
+    Anything the index can't answer is handed to Wagtail's view."""
+
+    with timed("routing"):
+        index = get_index()
+        site = index.find_site(request)
+        path_components = [component for component in path.split("/") if component]
+        match = index.match(site, path_components) if site else None
+    if site is None:
+        raise Http404
+    if match is None:
+        return wagtail_serve(request, path)
+    route, remaining_components = match
+
+    if route.redirect_to and not remaining_components and not route.restricted:
+        # A StructuralPage or ExternalRedirectionPage: no need to fetch it
+        return redirect(route.redirect_to)
+
+    with timed("routing"):
+        page = route.get_page()
+        if page is not None:
+            page, args, kwargs = page.route(request, remaining_components)
+    if page is None:
+        return wagtail_serve(request, path)
+
+    for fn in hooks.get_hooks("before_serve_page"):
+        result = fn(page, request, args, kwargs)
+        if isinstance(result, HttpResponse):
+            return result
+
+    return page.serve(request, *args, **kwargs)
+
+
+@user_passes_test(lambda user: user.is_superuser)
+def block_profiling_report(request):
+    """Admin report of how long each type of block takes to render, and where
+    - see common.block_profiling"""
+    if request.method == "POST":
+        reset_profiles()
+        messages.success(request, "The block profiles have been reset.")
+        return redirect("block_profiling_report")
+
+    profiles = get_profiles()
+    blocks = sorted(profiles.blocks.items(), key=lambda item: item[1].mean_ms, reverse=True)
+    pages = Page.objects.in_bulk({page_id for _, stats in blocks for page_id in stats.pages})
+    rows = [
+        {
+            "name": name,
+            "stats": stats,
+            "p95": stats.percentile(95),
+            "pages": [
+                (pages[page_id], milliseconds)
+                for page_id, milliseconds in sorted(stats.pages.items(), key=lambda item: item[1], reverse=True)
+                if page_id in pages
+            ],
+        }
+        for name, stats in blocks
+    ]
+    return render(
+        request,
+        "common/reports/block_profiling.html",
+        {
+            "title": "Block rendering",
+            "header_icon": "time",
+            "profiles": profiles,
+            "rows": rows,
+            "sample_rate": settings.BLOCK_PROFILING_SAMPLE_RATE * 100,
+            "last_bucket": BUCKETS[-1],
+        },
+    )
+
+
+@never_cache
+@user_passes_test(lambda user: user.is_staff)
+def profiles(request):
+    "Lists the stored request profiles, newest first - see common.profiling"
+    return JsonResponse({"profiles": list_profiles()})
+
+
+@never_cache
+@user_passes_test(lambda user: user.is_staff)
+def profile_download(request, profile_id):
+    "A stored request profile, as folded stacks for making a flame graph from"
+    folded = get_profile(profile_id)
+    if folded is None:
+        raise Http404
+    response = HttpResponse(folded, content_type="text/plain; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.folded"'
+    return response
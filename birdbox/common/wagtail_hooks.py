@@ -2,9 +2,14 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from django.urls import path, re_path, reverse
 from django.utils.safestring import mark_safe
 
 from wagtail import hooks
+from wagtail.admin.menu import AdminOnlyMenuItem
+
+from .profiling import PROFILE_ID_PATTERN
+from .views import block_profiling_report, profile_download, profiles
 
 
 @hooks.register("insert_editor_js")
@@ -34,3 +39,29 @@ def patch_in_dynamic_theme_color_name():
         """
         % theme_name  # noqa: F522 F524  # Old-style formatting needed to avoid breaking hook rendering
     )
+
+
+@hooks.register("register_admin_urls")
+def register_block_profiling_report_url():
+    return [
+        path("reports/block-rendering/", block_profiling_report, name="block_profiling_report"),
+    ]
+
+
+@hooks.register("register_admin_urls")
+def register_profile_urls():
+    return [
+        path("profiles/", profiles, name="profiles"),
+        re_path(rf"^profiles/(?P<profile_id>{PROFILE_ID_PATTERN})/$", profile_download, name="profile_download"),
+    ]
+
+
+@hooks.register("register_reports_menu_item")
+def register_block_profiling_report_menu_item():
+    return AdminOnlyMenuItem(
+        "Block rendering",
+        reverse("block_profiling_report"),
+        name="block-rendering",
+        icon_name="time",
+        order=1200,
+    )
@@ -0,0 +1,20 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from django.apps import AppConfig
+
+
+class MicrositeConfig(AppConfig):
+    name = "microsite"
+
+    def ready(self):
+        from wagtail.models import ReferenceIndex
+
+        from . import signal_handlers
+        from .models import Footer
+
+        # Settings aren't indexed by default, but the Footer links to pages
+        ReferenceIndex.register_model(Footer)
+
+        signal_handlers.register_signal_handlers()
@@ -0,0 +1,105 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""The tag and month archives of each blog (see BlogIndexPage's routes).
+
+Rather than count and list a blog's posts by tag or month with GROUP BY
+queries on every view, each archive is a BlogArchive row with its count of
+posts, and a BlogArchivePost row per post in it. They're updated post by post
+as posts are published, unpublished, moved and deleted (see
+microsite.signal_handlers), touching only the archives the post was or now is
+in. rebuild_archives() builds a blog's archives from scratch, eg for posts
+that were published before archives existed - see the rebuild_blog_archives
+management command.
+"""
+
+from collections import defaultdict
+from typing import Dict, Tuple
+
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateformat import format as format_date
+
+from .models import ArchiveKind, BlogArchive, BlogArchivePost, BlogIndexPage, BlogPage, BlogPageTag, month_key
+
+BATCH_SIZE = 1000
+
+# (blog index ID, kind, key)
+ArchiveKey = Tuple[int, str, str]
+
+
+def _month_label(date) -> str:
+    return format_date(date, "F Y")
+
+
+def _archive_keys(post: BlogPage) -> Dict[ArchiveKey, str]:
+    "The archives the post belongs in, with their labels"
+    parent = post.get_parent()
+    if not post.live or parent is None or parent.specific_class is not BlogIndexPage:
+        return {}
+    keys = {(parent.pk, ArchiveKind.MONTH, month_key(post.date.year, post.date.month)): _month_label(post.date)}
+    for tag in post.tags.all():
+        keys[(parent.pk, ArchiveKind.TAG, tag.slug)] = tag.name
+    return keys
+
+
+@transaction.atomic
+def update_archives(post: BlogPage, removed: bool = False) -> None:
+    """Bring the archives up to date with the post, as it now is - or, if
+    `removed`, as if it were gone"""
+    wanted = {} if removed else _archive_keys(post)
+    current = {
+        (archived.archive.blog_index_id, archived.archive.kind, archived.archive.key): archived
+        for archived in BlogArchivePost.objects.filter(post=post).select_related("archive")
+    }
+
+    left = [archived for key, archived in current.items() if key not in wanted]
+    if left:
+        BlogArchivePost.objects.filter(pk__in=[archived.pk for archived in left]).delete()
+        left_archive_ids = [archived.archive_id for archived in left]
+        BlogArchive.objects.filter(pk__in=left_archive_ids).update(post_count=F("post_count") - 1)
+        BlogArchive.objects.filter(pk__in=left_archive_ids, post_count__lte=0).delete()
+
+    if any(archived.date != post.date for key, archived in current.items() if key in wanted):
+        BlogArchivePost.objects.filter(post=post).update(date=post.date)
+
+    for (blog_index_id, kind, key), label in wanted.items():
+        if (blog_index_id, kind, key) in current:
+            continue
+        archive, _ = BlogArchive.objects.get_or_create(blog_index_id=blog_index_id, kind=kind, key=key, defaults={"label": label})
+        BlogArchivePost.objects.create(archive=archive, post=post, date=post.date)
+        BlogArchive.objects.filter(pk=archive.pk).update(post_count=F("post_count") + 1, label=label)
+
+
+@transaction.atomic
+def rebuild_archives(blog_index: BlogIndexPage) -> int:
+    "Build the blog's archives from its live posts, returning how many there are"
+    posts = dict(BlogPage.objects.child_of(blog_index).live().values_list("pk", "date"))
+    members = defaultdict(list)
+    labels = {}
+    for post_id, date in posts.items():
+        key = (ArchiveKind.MONTH, month_key(date.year, date.month))
+        members[key].append(post_id)
+        labels[key] = _month_label(date)
+    tagged = BlogPageTag.objects.filter(content_object_id__in=posts).values_list("content_object_id", "tag__slug", "tag__name")
+    for post_id, slug, name in tagged.iterator():
+        members[(ArchiveKind.TAG, slug)].append(post_id)
+        labels[(ArchiveKind.TAG, slug)] = name
+
+    BlogArchive.objects.filter(blog_index=blog_index).delete()
+    archives = BlogArchive.objects.bulk_create(
+        [
+            BlogArchive(blog_index=blog_index, kind=kind, key=key, label=labels[(kind, key)], post_count=len(post_ids))
+            for (kind, key), post_ids in members.items()
+        ]
+    )
+    BlogArchivePost.objects.bulk_create(
+        (
+            BlogArchivePost(archive=archive, post_id=post_id, date=posts[post_id])
+            for archive in archives
+            for post_id in members[(archive.kind, archive.key)]
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return len(archives)
@@ -0,0 +1,295 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Made-up content, in bulk, for finding where a microsite stops scaling -
+see the generate_content management command - and for the benchmarks.
+
+Pages are inserted in batches by bulk_add_children(), rather than with
+add_child(), which would take hours for 100,000 of them. Their StreamFields
+are filled with one of every block defined in microsite.blocks, with made-up
+content, by stream_data().
+"""
+
+import io
+import logging
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterator, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from PIL import Image as PILImage
+from taggit.models import Tag
+from wagtail.blocks import RichTextBlock
+from wagtail.images import get_image_model
+from wagtail.models import Page
+from wagtailmarkdown.blocks import MarkdownBlock
+
+from common.blocks import AccessibleImageBlockBase
+from common.cache_tags import bump_tag_versions, children_tag
+from common.routing import invalidate_index
+from common.utils import get_freshest_newsletter_options
+from microsite.archives import rebuild_archives
+from microsite.blocks import ContactFormBlock, NewsletterFormBlock, SectionHeadingBlock
+from microsite.forms import CONTACT_FORM_CHOICES
+from microsite.models import BlogIndexPage, BlogPage, BlogPageTag, GeneralPurposePage, MicrositeSettings, StructuralPage
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# What generated content is dated from, rather than today, so that the same
+# seed generates the same archives whenever it's run
+BASE_DATE = date(2024, 1, 1)
+
+# Blocks that render with all their fields left empty
+EMPTY_BLOCKS = {
+    "article",
+    "biography_grid",
+    "callout",
+    "captioned_image",
+    "captioned_image_layout",
+    "cards",
+    "columns",
+    "compact_callout",
+    "custom_form",
+    "details",
+    "hero",
+    "horizontal_image",
+    "split",
+    "table",
+    "video",
+}
+TEXT = "<p>Lorem ipsum dolor sit amet, <a href='https://www.mozilla.org/'>consectetur</a> adipiscing elit.</p>" * 5
+MARKDOWN = "## Lorem ipsum\n\nDolor sit amet, [consectetur](https://www.mozilla.org/) adipiscing elit.\n\n* One\n* Two\n"
+
+IMAGE_COLOURS = ("#20123a", "#592acb", "#0060df", "#00b3f4", "#3fe1b0", "#ff7139", "#e22850")
+
+
+def _image(images: Optional[Iterator[int]]) -> dict:
+    if images is None:
+        return {}
+    return {"image": next(images), "alt_text": "Generated image"}
+
+
+def _block_value(name: str, block, images: Optional[Iterator[int]]):
+    if isinstance(block, AccessibleImageBlockBase):
+        return _image(images)
+    if name in EMPTY_BLOCKS:
+        return {}
+    if isinstance(block, RichTextBlock):
+        return TEXT
+    if isinstance(block, MarkdownBlock):
+        return MARKDOWN
+    if isinstance(block, SectionHeadingBlock):
+        return {"intro_para": "Lorem ipsum", "body": TEXT}
+    if isinstance(block, NewsletterFormBlock):
+        # The newsletters come from Basket's data - or, without it, the copy
+        # in settings.FALLBACK_NEWSLETTER_DATA_PATH
+        return {"newsletter": [get_freshest_newsletter_options()[0][0]], "accompanying_image": _image(images)}
+    if isinstance(block, ContactFormBlock):
+        return {"form_type": CONTACT_FORM_CHOICES[0][0], "title": "Get in touch"}
+    raise ValueError(f"Don't know how to make up content for the {name!r} block: add it to microsite.content_generation")
+
+
+def stream_data(stream_field, images: Optional[Iterator[int]] = None) -> List[dict]:
+    """One of every block in the StreamField, with made-up content. With
+    `images`, an iterator of image IDs, the image blocks show the next of
+    them, rather than nothing"""
+    return [{"type": name, "value": _block_value(name, block, images)} for name, block in stream_field.field.stream_block.child_blocks.items()]
+
+
+def bulk_add_children(parent: Page, pages: List[Page], base_date: date = BASE_DATE) -> None:
+    """Add unsaved pages of one type under parent, live, in far less time than
+    add_child() would take for thousands of them: the page rows are inserted
+    in bulk, and the rest of each page's row as loaddata would, skipping
+    revisions, the search and reference indexes and most signal handlers.
+    They're published as of the start of base_date, not now, so that the same
+    pages come out the same whenever they're made. Only for made-up content.
+
+    This leans on private APIs, as of Django 4.2 and django-treebeard 4.8, so
+    may need changing when they're upgraded: treebeard's MP_Node._get_path()
+    and _str2int(), to make the pages' materialised paths as add_child() does,
+    and Django's Model._save_table(), to insert each page's own row."""
+    parent.refresh_from_db()
+    content_type = ContentType.objects.get_for_model(type(pages[0]))
+    last_child = parent.get_last_child()
+    first_step = Page._str2int(last_child.path[-Page.steplen :]) + 1 if last_child else 1
+    published_at = datetime.combine(base_date, time(), tzinfo=timezone.utc)
+
+    for step, page in enumerate(pages, start=first_step):
+        page.path = Page._get_path(parent.path, parent.depth + 1, step)
+        page.depth = parent.depth + 1
+        page.numchild = 0
+        page.url_path = f"{parent.url_path}{page.slug}/"
+        page.draft_title = page.title
+        page.content_type = content_type
+        page.locale_id = parent.locale_id
+        page.live = True
+        page.first_published_at = page.last_published_at = page.latest_revision_created_at = published_at
+
+    page_fields = {field.attname for field in Page._meta.concrete_fields} - {"id"}
+    with transaction.atomic():
+        created = Page.objects.bulk_create(
+            [Page(**{field: getattr(page, field) for field in page_fields}) for page in pages],
+            batch_size=500,
+        )
+        for page, page_row in zip(pages, created):
+            page.id = page.page_ptr_id = page_row.pk
+            # Just the subclass's own row, as save_base(raw=True) - and so
+            # loaddata - would save it, but without the post_save handlers,
+            # which would index the page for search and invalidate the
+            # routing index, page by page
+            page._save_table(raw=True, cls=type(page), force_insert=True)
+        Page.objects.filter(pk=parent.pk).update(numchild=parent.numchild + len(pages))
+    invalidate_index()
+    # As publishing them would, for the parent's listing - eg a blog index
+    bump_tag_versions([children_tag(parent)])
+
+
+def _next_number(parent: Page) -> int:
+    "So that slugs don't clash with those of pages generated before"
+    parent.refresh_from_db()
+    return parent.numchild
+
+
+class ContentGenerator:
+    """Generates each kind of content under `root`, reproducibly for a given
+    seed, dated from `base_date`, reporting progress to `log` - by default,
+    the module's logger"""
+
+    def __init__(self, root: Page, seed: int = 0, base_date: date = BASE_DATE, log=logger.info):
+        self.root = root
+        self.rng = random.Random(seed)
+        self.base_date = base_date
+        self.log = log
+        self.image_ids = []
+
+    def _images(self) -> Optional[Iterator[int]]:
+        if not self.image_ids:
+            return None
+        return iter(lambda: self.rng.choice(self.image_ids), None)
+
+    def _stream_data(self, stream_field, repeat: int = 1) -> List[dict]:
+        images = self._images()
+        return [block for _ in range(repeat) for block in stream_data(stream_field, images)]
+
+    def images(self, count: int, size: int = 64) -> None:
+        "An image library of `count` small PNGs, each of one colour"
+        image_model = get_image_model()
+        for start in range(0, count, BATCH_SIZE):
+            images = []
+            for number in range(start, min(start + BATCH_SIZE, count)):
+                buffer = io.BytesIO()
+                PILImage.new("RGB", (size, size), self.rng.choice(IMAGE_COLOURS)).save(buffer, "PNG")
+                image = image_model(title=f"Generated image {number}", width=size, height=size, file_size=buffer.tell())
+                image.file.save(f"generated-{number}.png", ContentFile(buffer.getvalue()), save=False)
+                images.append(image)
+            self.image_ids += [image.pk for image in image_model.objects.bulk_create(images)]
+            self.log(f"Images: {len(self.image_ids)}/{count}")
+
+    def blog(self, posts: int, tags: int = 50, authors: int = 20, tags_per_post: int = 3) -> BlogIndexPage:
+        "A blog index of `posts` posts, a day apart back from the base date, each with some of `tags` tags and `authors` authors"
+        blog_index = BlogIndexPage(title="Generated blog", slug=f"generated-blog-{_next_number(self.root)}")
+        self.root.add_child(instance=blog_index)
+
+        Tag.objects.bulk_create([Tag(name=f"Generated {number}", slug=f"generated-{number}") for number in range(tags)], ignore_conflicts=True)
+        tag_ids = list(Tag.objects.filter(slug__startswith="generated-").order_by("pk").values_list("pk", flat=True)[:tags])
+        user_model = get_user_model()
+        user_model.objects.bulk_create(
+            [user_model(username=f"generated-author-{number}", first_name="Author", last_name=str(number)) for number in range(authors)],
+            ignore_conflicts=True,
+        )
+        author_ids = list(user_model.objects.filter(username__startswith="generated-author-").order_by("pk").values_list("pk", flat=True)[:authors])
+        images = self._images()
+
+        for start in range(0, posts, BATCH_SIZE):
+            pages = [
+                BlogPage(
+                    title=f"Generated post {number}",
+                    slug=f"generated-post-{number}",
+                    date=self.base_date - timedelta(days=number),
+                    standfirst=f"Generated post {number}",
+                    feed_image_id=next(images) if images else None,
+                    body=self._stream_data(BlogPage.body),
+                )
+                for number in range(start, min(start + BATCH_SIZE, posts))
+            ]
+            bulk_add_children(blog_index, pages, self.base_date)
+            with transaction.atomic():
+                BlogPageTag.objects.bulk_create(
+                    [
+                        BlogPageTag(content_object_id=page.pk, tag_id=tag_id)
+                        for page in pages
+                        for tag_id in self.rng.sample(tag_ids, min(tags_per_post, len(tag_ids)))
+                    ]
+                )
+                BlogPage.authors.through.objects.bulk_create(
+                    [BlogPage.authors.through(blogpage_id=page.pk, user_id=self.rng.choice(author_ids)) for page in pages if author_ids]
+                )
+            self.log(f"Blog posts: {min(start + BATCH_SIZE, posts)}/{posts}")
+        # bulk_add_children() skips the signal handlers that would have added
+        # each post to its archives
+        self.log(f"Blog archives: {rebuild_archives(blog_index)}")
+        return blog_index
+
+    def hierarchy(self, depth: int, breadth: int, blocks: int = 1) -> StructuralPage:
+        """A tree of StructuralPages `depth` levels deep, each with `breadth`
+        children, with GeneralPurposePages as its leaves, each with `blocks`
+        of every block"""
+        top = StructuralPage(title="Generated hierarchy", slug=f"generated-hierarchy-{_next_number(self.root)}")
+        self.root.add_child(instance=top)
+        parents = [top]
+        for level in range(1, depth + 1):
+            leaves = level == depth
+            children = []
+            for parent in parents:
+                if leaves:
+                    pages = [
+                        GeneralPurposePage(
+                            title=f"Generated page {number}",
+                            slug=f"page-{number}",
+                            content=self._stream_data(GeneralPurposePage.content, blocks),
+                        )
+                        for number in range(breadth)
+                    ]
+                else:
+                    pages = [StructuralPage(title=f"Generated section {number}", slug=f"section-{number}") for number in range(breadth)]
+                bulk_add_children(parent, pages, self.base_date)
+                children += pages
+            parents = children
+            self.log(f"Hierarchy: level {level}/{depth}, {len(children)} pages")
+        return top
+
+    def nav(self, sections: int, pages_per_section: int, blocks: int = 1) -> None:
+        """`sections` StructuralPages in the root's menu, each with
+        `pages_per_section` GeneralPurposePages, and the nav turned on"""
+        microsite_settings = MicrositeSettings.load()
+        microsite_settings.navigation_enabled = True
+        microsite_settings.navigation_generate_nav_from_page_tree = True
+        microsite_settings.save()
+
+        first = _next_number(self.root)
+        section_pages = [
+            StructuralPage(title=f"Generated section {number}", slug=f"generated-section-{number}", show_in_menus=True)
+            for number in range(first, first + sections)
+        ]
+        bulk_add_children(self.root, section_pages, self.base_date)
+        for section in section_pages:
+            bulk_add_children(
+                section,
+                [
+                    GeneralPurposePage(
+                        title=f"{section.title}.{number}",
+                        slug=f"page-{number}",
+                        show_in_menus=True,
+                        content=self._stream_data(GeneralPurposePage.content, blocks),
+                    )
+                    for number in range(pages_per_section)
+                ],
+                self.base_date,
+            )
+        self.log(f"Nav: {sections} sections of {pages_per_section} pages")
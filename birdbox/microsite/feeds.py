@@ -0,0 +1,107 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""RSS and Atom feeds of a blog's latest posts (see BlogIndexPage's routes).
+
+Feed readers poll often, and almost always for a feed that hasn't changed.
+Each item is made from what's stored for the post - its standfirst (or
+search description) and a rendition of its feed image - never from rendering
+its body, and the XML is cached under the versions of the blog's cache tags
+(see common.cache_tags), so it's only generated again once a post has been
+published or unpublished, or the blog itself changed. Images' tags are
+checked too, as changing an image changes its renditions' URLs.
+
+The feed view goes through CacheAwareAbstractBasePage.serve(), so it also
+gets an ETag and Last-Modified, and stored, compressed copies: most polls are
+answered with a 304 or a stored copy, from the cache, without the view being
+called at all.
+"""
+
+import hashlib
+from datetime import datetime, time, timezone
+from typing import Iterable, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed, SyndicationFeed
+from django.utils.html import format_html
+
+from common.cache_tags import add_cache_tags, children_tag, get_tag_versions, image_tag, page_tag
+
+FEED_TYPES = {
+    "rss": Rss201rev2Feed,
+    "atom": Atom1Feed,
+}
+FEED_TIMEOUT = 60 * 60 * 24
+# The card images on the blog index are 16:9, so this crops the same way
+FEED_IMAGE_FILTER = "fill-1200x675"
+
+
+def _feed_key(request: HttpRequest, blog_index, feed_type: str) -> str:
+    versions = get_tag_versions([page_tag(blog_index), children_tag(blog_index)])
+    # Rendition URLs are made absolute with the request's host, but any query
+    # string - such as a feed reader's tracking parameters - makes no difference
+    source = f"{settings.GIT_SHA}|{blog_index.pk}|{feed_type}|{request.build_absolute_uri('/')}|" + ",".join(
+        f"{tag}@{version}" for tag, version in sorted(versions.items())
+    )
+    return f"blog-feed:{hashlib.md5(source.encode()).hexdigest()}"
+
+
+def _description(request: HttpRequest, post) -> str:
+    excerpt = post.standfirst or post.search_description
+    if not post.feed_image:
+        return format_html("<p>{}</p>", excerpt)
+    rendition = post.feed_image.get_rendition(FEED_IMAGE_FILTER)
+    return format_html(
+        '<p><img src="{}" width="{}" height="{}" alt="{}"></p><p>{}</p>',
+        request.build_absolute_uri(rendition.url),
+        rendition.width,
+        rendition.height,
+        post.feed_image_alt_text,
+        excerpt,
+    )
+
+
+def build_feed(request: HttpRequest, blog_index, posts: Iterable, feed_type: str) -> SyndicationFeed:
+    "The feed of `posts`, which should be the blog's latest, newest first"
+    feed = FEED_TYPES[feed_type](
+        title=blog_index.title,
+        link=blog_index.get_full_url(request),
+        description=blog_index.search_description or blog_index.title,
+        feed_url=blog_index.get_full_url(request) + blog_index.reverse_subpage(f"{feed_type}_feed"),
+    )
+    for post in posts:
+        url = post.get_full_url(request)
+        feed.add_item(
+            title=post.title,
+            link=url,
+            unique_id=url,
+            description=_description(request, post),
+            author_name=post.get_author_info() or None,
+            pubdate=datetime.combine(post.date, time.min, tzinfo=timezone.utc),
+            updateddate=post.last_published_at,
+            categories=[tag.name for tag in post.tags.all()],
+        )
+    return feed
+
+
+def get_feed(request: HttpRequest, blog_index, feed_type: str) -> Tuple[str, str]:
+    """The (XML, content type) of the blog's feed, from the cache if it's still
+    current, recording the cache tags it depends on"""
+    key = _feed_key(request, blog_index, feed_type)
+    cached = cache.get(key)
+    if cached is not None:
+        xml, content_type, image_versions = cached
+        if get_tag_versions(image_versions) == image_versions:
+            add_cache_tags(request, children_tag(blog_index), *image_versions)
+            return xml, content_type
+
+    posts = list(blog_index.get_feed_posts())
+    feed = build_feed(request, blog_index, posts, feed_type)
+    xml = feed.writeString("utf-8")
+    image_versions = get_tag_versions({image_tag(post.feed_image_id) for post in posts if post.feed_image_id})
+    cache.set(key, (xml, feed.content_type, image_versions), timeout=FEED_TIMEOUT)
+    add_cache_tags(request, children_tag(blog_index), *image_versions)
+    return xml, feed.content_type
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from sys import stdout
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.transaction import atomic
+
+from wagtail.models import Page, ReferenceIndex
+
+
+def _print(*args):
+    stdout.write("\n".join(args) + "\n")
+
+
+class Command(BaseCommand):
+    help = (
+        "Build or refresh Wagtail's reference index for every page, image, document and registered setting. "
+        "Unlike rebuild_references_index, works in small batches, each in its own transaction, "
+        "so it can be run against a live site and safely re-run if interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of objects to index per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        for model in self._models_to_index():
+            count = self._index_model(model, batch_size)
+            _print(f"Indexed {count} {model._meta.verbose_name_plural}")
+            total += count
+        _print(f"Done: indexed {total} objects")
+
+    def _models_to_index(self):
+        # Page subclasses are indexed via Page.objects.specific(), so that each
+        # page is only processed once and with all of its fields available
+        for model in apps.get_models():
+            if not ReferenceIndex.is_indexed(model):
+                continue
+            if issubclass(model, Page) and model is not Page:
+                continue
+            yield model
+
+    def _index_model(self, model, batch_size):
+        count = 0
+        last_pk = None
+        while True:
+            queryset = model.objects.order_by("pk")
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            if model is Page:
+                queryset = queryset.specific()
+            batch = list(queryset[:batch_size])
+            if not batch:
+                return count
+
+            with atomic():
+                for instance in batch:
+                    ReferenceIndex.create_or_update_for_object(instance)
+
+            count += len(batch)
+            last_pk = batch[-1].pk
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from sys import stdout
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand
+
+from common.css_bundles import build_bundles
+
+
+def _print(*args):
+    stdout.write("\n".join(args) + "\n")
+
+
+class Command(BaseCommand):
+    help = "Bundle the block CSS for each page type into a single, content-hashed file - see common/css_bundles.py. Run straight after collectstatic."
+
+    def handle(self, *args, **options):
+        bundles = build_bundles()
+        for label, bundle in sorted(bundles.items()):
+            _print(f"{label}: {len(bundle['sources'])} stylesheets -> {bundle['name']} ({staticfiles_storage.size(bundle['name']):,} bytes)")
+        _print(f"Done: built {len({bundle['name'] for bundle in bundles.values()})} bundles for {len(bundles)} page types")
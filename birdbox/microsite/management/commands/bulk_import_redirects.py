@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import csv
+from sys import stdout
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.transaction import atomic
+
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.models import Site
+
+from common.redirects import invalidate_table
+
+
+def _print(*args):
+    stdout.write("\n".join(args) + "\n")
+
+
+def _is_valid_link(link):
+    return link.startswith(("/", "http://", "https://"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Import redirects in bulk from a CSV file of `from,to` rows, with an optional header row. "
+        "Existing redirects from the same paths are updated. Unlike Wagtail's import_redirects, rows are "
+        "inserted in batches, so tens of thousands of redirects take seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", help="Path to the CSV file")
+        parser.add_argument(
+            "--site",
+            help="Hostname of the site the redirects are for. By default, they apply to all sites",
+        )
+        parser.add_argument(
+            "--temporary",
+            action="store_true",
+            help="Make the redirects temporary (302) rather than permanent (301)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of redirects to insert or update per transaction",
+        )
+
+    def handle(self, *args, **options):
+        site = None
+        if options["site"]:
+            try:
+                site = Site.objects.get(hostname=options["site"])
+            except Site.DoesNotExist:
+                raise CommandError(f"No site with hostname {options['site']}")
+
+        redirects, skipped = self._read(options["csv_file"])
+        is_permanent = not options["temporary"]
+        batch_size = options["batch_size"]
+
+        created = updated = 0
+        old_paths = list(redirects)
+        for i in range(0, len(old_paths), batch_size):
+            batch = old_paths[i : i + batch_size]
+            with atomic():
+                existing = {redirect.old_path: redirect for redirect in Redirect.objects.filter(site=site, old_path__in=batch)}
+                for redirect in existing.values():
+                    redirect.redirect_link = redirects[redirect.old_path]
+                    redirect.redirect_page = None
+                    redirect.is_permanent = is_permanent
+                Redirect.objects.bulk_update(existing.values(), ["redirect_link", "redirect_page", "is_permanent"])
+                Redirect.objects.bulk_create(
+                    Redirect(old_path=old_path, site=site, redirect_link=redirects[old_path], is_permanent=is_permanent)
+                    for old_path in batch
+                    if old_path not in existing
+                )
+            created += len(batch) - len(existing)
+            updated += len(existing)
+
+        # Bulk inserts and updates don't send the signals that would do this
+        invalidate_table()
+        _print(f"Done: created {created} and updated {updated} redirects, skipped {len(skipped)} invalid rows")
+        for line_number, row in skipped:
+            _print(f"  line {line_number}: {','.join(row)}")
+
+    def _read(self, path):
+        "Returns a dict of normalised old path: link, and a list of the rows skipped"
+        redirects = {}
+        skipped = []
+        try:
+            with open(path, newline="") as f:
+                for line_number, row in enumerate(csv.reader(f), start=1):
+                    if line_number == 1 and row and row[0].strip().lower() == "from":
+                        continue
+                    if len(row) < 2 or not row[0].strip() or not _is_valid_link(row[1].strip()):
+                        skipped.append((line_number, row))
+                        continue
+                    old_path = Redirect.normalise_path(row[0])
+                    link = row[1].strip()
+                    if link.startswith("/") and old_path == Redirect.normalise_path(link):
+                        # Would redirect to itself
+                        skipped.append((line_number, row))
+                        continue
+                    # The last row for a path wins, as it would if imported one at a time
+                    redirects[old_path] = link
+        except OSError as ex:
+            raise CommandError(f"Could not read {path}: {ex}")
+        return redirects, skipped
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import time
+from statistics import median
+from sys import stdout
+from urllib.parse import urlparse
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from wagtail.models import Page
+
+from common.compression import compress, get_available_encodings
+
+DEFAULT_LEVELS = {
+    "gzip": [1, 6, 9],
+    "br": [1, 5, 9, 11],
+}
+
+
+def _print(*args):
+    stdout.write("\n".join(args) + "\n")
+
+
+class Command(BaseCommand):
+    help = "Report the bytes-on-wire vs CPU tradeoff of each compression encoding and level, for real pages on this site"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pages",
+            type=int,
+            default=20,
+            help="Maximum number of live pages to sample",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of times to compress each page, to get stable timings",
+        )
+
+    def handle(self, *args, **options):
+        documents = self._fetch_pages(options["pages"])
+        if not documents:
+            raise CommandError("No live pages could be fetched")
+
+        total_bytes = sum(len(content) for content in documents)
+        _print(
+            f"Sampled {len(documents)} pages: {total_bytes:,} bytes uncompressed, median {int(median(len(x) for x in documents)):,} bytes",
+            "",
+            f"{'encoding':<10}{'level':>6}{'total bytes':>14}{'ratio':>8}{'median ms/page':>16}{'max ms/page':>13}",
+        )
+
+        for encoding in get_available_encodings():
+            for level in DEFAULT_LEVELS[encoding]:
+                compressed_bytes = 0
+                timings = []
+                for content in documents:
+                    start = time.perf_counter()
+                    for _ in range(options["repeat"]):
+                        compressed = compress(content, encoding, level=level)
+                    timings.append((time.perf_counter() - start) * 1000 / options["repeat"])
+                    compressed_bytes += len(compressed)
+                _print(
+                    f"{encoding:<10}{level:>6}{compressed_bytes:>14,}{compressed_bytes / total_bytes:>8.1%}"
+                    f"{median(timings):>16.2f}{max(timings):>13.2f}"
+                )
+
+        if "br" not in get_available_encodings():
+            _print("", "Brotli is not available: install the 'brotli' package to include it")
+
+    def _fetch_pages(self, limit):
+        client = Client()
+        documents = []
+        for page in Page.objects.live().public().specific().order_by("path")[: limit * 2]:
+            url_parts = page.get_url_parts()
+            if not url_parts:
+                continue
+            _, root_url, page_path = url_parts
+            root = urlparse(root_url)
+            response = client.get(page_path, HTTP_HOST=root.netloc, secure=root.scheme == "https")
+            if response.status_code == 200 and response.get("Content-Type", "").startswith("text/html"):
+                documents.append(response.content)
+            if len(documents) == limit:
+                break
+        return documents
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wagtail.models import Page, Site
+
+from microsite.content_generation import BASE_DATE, ContentGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate made-up content in bulk, for finding where a microsite stops scaling: an image library, a blog, "
+        "a deep hierarchy of StructuralPages and a nav of many sections, with StreamFields of every block. The same "
+        "seed and base date generate the same content. Pages are inserted directly, without revisions, and aren't indexed for "
+        "search or references - run update_index and rebuild_references_index afterwards if that's wanted. "
+        "Never run it against a real site's database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--parent",
+            type=int,
+            help="ID of the page to generate content under. Defaults to the default site's root page",
+        )
+        parser.add_argument("--images", type=int, default=0, help="Number of images to add to the image library")
+        parser.add_argument("--blog-posts", type=int, default=0, help="Number of posts to add to a new blog index")
+        parser.add_argument("--tags", type=int, default=50, help="Number of tags to choose the blog posts' tags from")
+        parser.add_argument("--authors", type=int, default=20, help="Number of users to choose the blog posts' authors from")
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=0,
+            help="Number of levels of StructuralPages in a new hierarchy, with GeneralPurposePages at the bottom",
+        )
+        parser.add_argument("--breadth", type=int, default=5, help="Number of children of each page in the hierarchy")
+        parser.add_argument("--nav-sections", type=int, default=0, help="Number of sections to add to the nav")
+        parser.add_argument("--nav-pages", type=int, default=10, help="Number of pages in each nav section")
+        parser.add_argument(
+            "--blocks",
+            type=int,
+            default=1,
+            help="How many times to repeat every block in the StreamFields of the hierarchy's and the nav's pages",
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for generating the same content again")
+        parser.add_argument(
+            "--base-date",
+            type=date.fromisoformat,
+            default=BASE_DATE,
+            help=f"Date, as YYYY-MM-DD, that the content is published on and the blog posts go back from. Defaults to {BASE_DATE}",
+        )
+
+    def handle(self, *args, **options):
+        root = self._root(options["parent"])
+        generator = ContentGenerator(root, seed=options["seed"], base_date=options["base_date"], log=self.stdout.write)
+        start = time.perf_counter()
+
+        if options["images"]:
+            generator.images(options["images"])
+        if options["blog_posts"]:
+            blog_index = generator.blog(options["blog_posts"], tags=options["tags"], authors=options["authors"])
+            self.stdout.write(f"Blog: {blog_index.url_path}")
+        if options["depth"]:
+            top = generator.hierarchy(options["depth"], options["breadth"], blocks=options["blocks"])
+            self.stdout.write(f"Hierarchy: {top.url_path}")
+        if options["nav_sections"]:
+            generator.nav(options["nav_sections"], options["nav_pages"], blocks=options["blocks"])
+
+        self.stdout.write(f"Generated content in {time.perf_counter() - start:.1f}s")
+
+    def _root(self, page_id):
+        if page_id is not None:
+            try:
+                return Page.objects.get(pk=page_id).specific
+            except Page.DoesNotExist:
+                raise CommandError(f"There is no page {page_id}")
+        site = Site.objects.order_by("-is_default_site", "pk").first()
+        if site is None:
+            raise CommandError("There is no site to generate content for")
+        return site.root_page.specific
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import random
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from wagtail.models import Site
+
+from common.load_testing import PERCENTILES, Report, parse_access_log, run, send, synthetic_hits
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the site in-process, by replaying a gunicorn access log - or a made-up mix of requests for the "
+        "live pages - against the WSGI application, and report throughput, latency, errors, queries and cache calls. "
+        "Works offline, against the local SQLite database, for comparing changes on a laptop. Set RATELIMIT_ENABLE=False "
+        "if the requests come from fewer addresses than the rate limit allows for."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--access-log",
+            help="Path to a gunicorn access log to replay the GET and HEAD requests of. By default, requests are made up",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            help="Number of requests to send. Defaults to every request in the access log, or 1000",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=4,
+            help="Number of requests to send at a time",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=("threads", "gevent"),
+            default="threads",
+            help=(
+                "Send concurrent requests from threads, or from greenlets, as the production workers do (see wsgi/config.py). "
+                "gevent is experimental: it monkey-patches after Django is set up, unlike gunicorn, and isn't tested"
+            ),
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Number of requests to send, one at a time, before measuring",
+        )
+        parser.add_argument(
+            "--host",
+            help="Host header to send for the access log's requests. Defaults to the default site's hostname",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed for the made-up requests, so that runs can be compared",
+        )
+        parser.add_argument(
+            "--json",
+            help="Path to write the report to, as JSON",
+        )
+
+    def handle(self, *args, **options):
+        if options["mode"] == "gevent":
+            self.stderr.write("--mode gevent is experimental, see --help")
+            self._patch_for_gevent()
+
+        host = options["host"] or self._default_host()
+        hits = self._hits(options)
+        if not hits:
+            raise CommandError("Nothing to request")
+
+        # Imported here, as wsgi.app sets up Django for production if it hasn't been already
+        from wsgi.app import application
+
+        send_hit = partial(send, application, host=host)
+        warmup = hits[: options["warmup"]]
+        run(send_hit, warmup, concurrency=1)
+        results, elapsed = run(send_hit, hits, options["concurrency"], options["mode"])
+
+        report = Report(results, elapsed, options["concurrency"])
+        self._print_report(report, options["mode"])
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump(report.as_dict(), f, indent=2)
+
+    def _patch_for_gevent(self):
+        "Monkey-patch, as gunicorn's gevent worker does - if later on, as Django's already set up"
+        from asgiref.local import Local
+        from gevent import monkey
+
+        connections.close_all()
+        monkey.patch_all()
+        # Connections belong to the thread they were made in, and each
+        # greenlet is a thread of its own once patched - but the connections'
+        # thread-local storage was made before, with the unpatched threading.
+        # This replaces a private attribute of Django's ConnectionHandler
+        # (as of Django 4.2), so may need changing when Django is upgraded
+        connections._connections = Local(connections.thread_critical)
+
+    def _default_host(self):
+        site = Site.objects.order_by("-is_default_site", "pk").first()
+        return site.hostname if site else "localhost"
+
+    def _hits(self, options):
+        count = options["requests"]
+        if not options["access_log"]:
+            return synthetic_hits(count or 1000, random.Random(options["seed"]))
+
+        try:
+            with open(options["access_log"]) as f:
+                hits, skipped = parse_access_log(f)
+        except OSError as ex:
+            raise CommandError(f"Could not read {options['access_log']}: {ex}")
+        if skipped:
+            self.stdout.write(f"Skipped {skipped} lines that weren't GET or HEAD requests")
+        if hits and count:
+            # Replay the log as many times as it takes
+            hits = (hits * (count // len(hits) + 1))[:count]
+        return hits
+
+    def _print_report(self, report, mode):
+        summary = report.as_dict()
+        latency = summary["latency_ms"]
+        self._print(
+            f"{summary['requests']} requests, {summary['concurrency']} at a time ({mode}), in {summary['elapsed_s']}s: "
+            f"{summary['requests_per_s']} requests/s",
+            "Latency: " + ", ".join(f"p{percent} {latency[f'p{percent}']}ms" for percent in PERCENTILES) + f", max {latency['max']}ms",
+            "Statuses: " + ", ".join(f"{status} x{count}" for status, count in summary["statuses"].items()),
+            f"Error rate: {summary['error_rate']:.2%}",
+            f"Queries per request: mean {summary['queries']['mean']}, p95 {summary['queries']['p95']}, max {summary['queries']['max']}",
+            f"Cache calls per request: mean {summary['cache_calls']['mean']}",
+            "Slowest paths, by median:",
+            *(f"  {median_ms:>8.1f}ms  {target} (x{count})" for target, median_ms, count in report.slowest()),
+        )
+
+    def _print(self, *lines):
+        self.stdout.write("\n".join(lines))
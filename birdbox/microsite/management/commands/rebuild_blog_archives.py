@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from django.core.management.base import BaseCommand
+
+from microsite.archives import rebuild_archives
+from microsite.models import BlogIndexPage
+
+
+class Command(BaseCommand):
+    help = (
+        "Build every blog's tag and month archives from scratch, from its live posts. Archives are kept up to date "
+        "as posts are published and unpublished, so this is only needed once, after migrating, or if they've somehow "
+        "got out of step. Each blog is rebuilt in its own transaction."
+    )
+
+    def handle(self, *args, **options):
+        for blog_index in BlogIndexPage.objects.order_by("path"):
+            count = rebuild_archives(blog_index)
+            self.stdout.write(f"{blog_index.url_path}: {count} archives")
@@ -0,0 +1,21 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+# Generated by Django 4.2.28 on 2026-10-19 13:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("microsite", "0113_alter_generalpurposepage_content_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="blogpage",
+            index=models.Index(fields=["date", "page_ptr"], name="blogpage_date_id_idx"),
+        ),
+    ]
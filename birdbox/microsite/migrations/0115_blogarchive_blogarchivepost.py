@@ -0,0 +1,71 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+# Generated by Django 4.2.28 on 2026-10-19 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("microsite", "0114_blogpage_date_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlogArchive",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(choices=[("tag", "Tag"), ("month", "Month")], max_length=10)),
+                ("key", models.CharField(max_length=100)),
+                ("label", models.CharField(max_length=255)),
+                ("post_count", models.PositiveIntegerField(default=0)),
+                (
+                    "blog_index",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archives",
+                        to="microsite.blogindexpage",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="BlogArchivePost",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                (
+                    "archive",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="posts",
+                        to="microsite.blogarchive",
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="microsite.blogpage",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="blogarchive",
+            constraint=models.UniqueConstraint(fields=("blog_index", "kind", "key"), name="unique_blog_archive"),
+        ),
+        migrations.AddConstraint(
+            model_name="blogarchivepost",
+            constraint=models.UniqueConstraint(fields=("archive", "post"), name="unique_blog_archive_post"),
+        ),
+        migrations.AddIndex(
+            model_name="blogarchivepost",
+            index=models.Index(fields=["archive", "date", "post"], name="blogarchivepost_date_idx"),
+        ),
+    ]
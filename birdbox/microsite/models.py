@@ -7,7 +7,6 @@ from typing import List
 from django import forms
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 from django.db.models import (
     CASCADE,
     SET_NULL,
@@ -15,15 +14,21 @@ from django.db.models import (
     CharField,
     DateField,
     ForeignKey,
+    Index,
     Model,
+    PositiveIntegerField,
     TextChoices,
+    UniqueConstraint,
     URLField,
 )
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
+from django.template.response import SimpleTemplateResponse
 from django.templatetags.static import static
 from django.utils.cache import add_never_cache_headers
 from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
+from django.utils.http import http_date
 from django.utils.safestring import mark_safe
 from django.views.decorators.cache import never_cache
 
@@ -32,15 +37,32 @@ from modelcluster.fields import ParentalKey, ParentalManyToManyField
 from taggit.models import TaggedItemBase
 from wagtail.admin.panels import FieldPanel, MultiFieldPanel
 from wagtail.blocks import RichTextBlock
+from wagtail.contrib.routable_page.models import RoutablePageMixin, path
 from wagtail.contrib.settings.models import BaseGenericSetting, register_setting
 from wagtail.fields import RichTextField, StreamField
-from wagtail.models import LockableMixin, Page
+from wagtail.models import LockableMixin, Page, PageViewRestriction
 from wagtail.snippets.models import register_snippet
 from wagtailmarkdown.blocks import MarkdownBlock
 from wagtailmetadata.models import MetadataPageMixin
 from wagtailstreamforms.blocks import WagtailFormBlock
 
 from birdbox.protocol_links import get_docs_link
+from common.cache_tags import (
+    add_cache_tags,
+    children_tag,
+    get_cache_tags,
+    image_tag,
+    page_tag,
+    set_cache_tag_headers,
+    tags_for_references,
+)
+from common.compression import get_stored_variant, store_variants
+from common.conditional_get import get_current_validators, get_manifest_tags, get_not_modified_response, set_validators
+from common.pagination import KeysetPaginator
+from common.preload import set_preload_header
+from common.routing import get_route
+from common.server_timing import timed
+from common.streaming import stream_template_response
 
 from .blocks import (
     ArticleBlock,
@@ -64,6 +86,7 @@ from .blocks import (
     SplitBlock,
     VideoEmbedBlock,
 )
+from .feeds import get_feed
 
 ALL = "__all__"
 
@@ -92,17 +115,91 @@ class CacheAwareAbstractBasePage(Page):
 
     2) Applies `never_cache` headers the `wagtail.Page` class's
     `serve_password_required_response` method.
+
+    3) Adds cache-tag headers (see common.cache_tags) listing what the
+    rendered response depends on, so the CDN can be purged precisely.
+
+    4) Adds ETag and Last-Modified headers (see common.conditional_get) and
+    answers matching conditional requests with a 304, without rendering.
+
+    5) Stores precompressed copies of pages that have an ETag (see
+    common.compression), and serves them while that ETag is current.
+
+    6) Adds a `Link: rel=preload` header for the page's critical CSS, JS and
+    images (see common.preload).
+
+    7) For page types with `stream_response = True`, streams the page once
+    its headers are known from a previous render (see common.streaming).
     """
 
+    # Opt-in: only pages whose templates use {% streamable %} benefit
+    stream_response = False
+
     class Meta:
         abstract = True
 
+    def get_view_restrictions(self):
+        # Pages found via the routing index already know whether they have
+        # any restrictions, which saves a query on every request
+        route = get_route(self)
+        if route is not None and not route.restricted:
+            return PageViewRestriction.objects.none()
+        return super().get_view_restrictions()
+
     def serve(self, request, *args, **kwargs):
-        response = super().serve(request, *args, **kwargs)
+        add_cache_tags(request, page_tag(self))
         if len(self.get_view_restrictions()):
+            response = self.get_response(request, *args, **kwargs)
             add_never_cache_headers(response)
+            return response
+
+        validators = get_current_validators(request, self)
+        if validators:
+            response = get_not_modified_response(request, *validators) or get_stored_variant(request, validators[0])
+            if response:
+                return response
+
+        with timed("context"):
+            # A TemplateResponse, rendered later on
+            response = self.get_response(request, *args, **kwargs)
+        if validators and self.stream_response and isinstance(response, SimpleTemplateResponse):
+            return self._stream(request, response, *validators)
+        if hasattr(response, "add_post_render_callback"):
+            # Tags are recorded as the template renders, so the headers
+            # can only be set once it has
+            response.add_post_render_callback(lambda rendered: self._add_cache_headers(request, rendered))
+        else:
+            self._add_cache_headers(request, response)
         return response
 
+    def get_response(self, request, *args, **kwargs):
+        "The response that serve() adds all of the above to: by default, Page.serve()'s"
+        return super().serve(request, *args, **kwargs)
+
+    def _stream(self, request, response, etag, last_modified):
+        def _on_complete(content):
+            # Now the whole page has been rendered, bring the manifest and
+            # stored variants up to date, as for a page that wasn't streamed
+            self._add_cache_headers(request, HttpResponse(content, status=response.status_code, headers=response.headers))
+
+        streaming_response = stream_template_response(request, response, _on_complete)
+
+        # Only the start of the page has been rendered so far, so the headers
+        # come from what was recorded the last time it was rendered in full
+        tags = list(dict.fromkeys([*get_cache_tags(request), *(get_manifest_tags(request, self) or [])]))
+        set_cache_tag_headers(request, streaming_response, tags=tags)
+        set_preload_header(request, streaming_response)
+        streaming_response["ETag"] = etag
+        streaming_response["Last-Modified"] = http_date(last_modified)
+        return streaming_response
+
+    def _add_cache_headers(self, request, response):
+        add_cache_tags(request, *tags_for_references(self))
+        set_cache_tag_headers(request, response)
+        set_preload_header(request, response)
+        set_validators(request, self, response)
+        store_variants(request, response)
+
 
 class BaseProtocolPage(MetadataPageMixin, CacheAwareAbstractBasePage):
     """Abstract wagtail.Page subclass that features fields we want on _all_ pages,
@@ -211,6 +308,9 @@ class StructuralPage(BaseProtocolPage):
         return redirect(self.get_parent().get_full_url())
 
     def serve(self, request):
+        route = get_route(self)
+        if route is not None and route.redirect_to:
+            return redirect(route.redirect_to)
         return redirect(self.get_parent().get_full_url())
 
 
@@ -1028,6 +1128,12 @@ class BlogPage(BaseProtocolPage):
     parent_page_types = ["BlogIndexPage"]
     subpage_types = []
 
+    class Meta:
+        indexes = [
+            # For the blog index's keyset pagination (see common.pagination)
+            Index(fields=["date", "page_ptr"], name="blogpage_date_id_idx"),
+        ]
+
     @property
     def frontend_media(self):
         "Custom property that lets us selectively include CSS"
@@ -1039,6 +1145,12 @@ class BlogPage(BaseProtocolPage):
             },
         )
 
+    def get_context(self, request, *args, **kwargs):
+        context = super().get_context(request, *args, **kwargs)
+        if self.header_image_id:
+            add_cache_tags(request, image_tag(self.header_image_id))
+        return context
+
     def get_preview_text(self):
         if self.standfirst:
             return self.standfirst
@@ -1056,7 +1168,7 @@ class BlogPage(BaseProtocolPage):
         }
 
 
-class BlogIndexPage(BaseProtocolPage):
+class BlogIndexPage(RoutablePageMixin, BaseProtocolPage):
     # No additional fields needed
 
     read_more_cta_label = CharField(
@@ -1086,36 +1198,131 @@ class BlogIndexPage(BaseProtocolPage):
             },
         )
 
-    def get_context(self, request, *args, **kwargs):
+    def serve(self, request, view=None, args=None, kwargs=None):
+        # Through CacheAwareAbstractBasePage.serve(), rather than straight to
+        # the view as RoutablePageMixin.serve() would, so that the archives
+        # get the same cache headers and stored copies as the index
+        return BaseProtocolPage.serve(self, request, view, args, kwargs)
+
+    def get_response(self, request, view=None, args=None, kwargs=None):
+        if view is None:
+            view, args, kwargs = self.resolve_subpage("/")
+        request.is_preview = getattr(request, "is_preview", False)
+        return view(request, *(args or ()), **(kwargs or {}))
+
+    @path("tag/<slug:tag>/", name="tag")
+    def tag_archive(self, request, tag):
+        return self._serve_archive(request, ArchiveKind.TAG, tag)
+
+    @path("<int:year>/<int:month>/", name="month")
+    def month_archive(self, request, year, month):
+        return self._serve_archive(request, ArchiveKind.MONTH, month_key(year, month))
+
+    @path("feed/rss/", name="rss_feed")
+    def rss_feed(self, request):
+        return self._serve_feed(request, "rss")
+
+    @path("feed/atom/", name="atom_feed")
+    def atom_feed(self, request):
+        return self._serve_feed(request, "atom")
+
+    def _serve_feed(self, request, feed_type):
+        xml, content_type = get_feed(request, self, feed_type)
+        return HttpResponse(xml, content_type=content_type)
+
+    def get_feed_posts(self):
+        "The latest posts, for the blog's feeds"
+        posts = BlogPage.objects.child_of(self).live().order_by("-date", "-pk")
+        posts = posts.select_related("feed_image").prefetch_related("tags", "authors", "feed_image__renditions")
+        return posts[: settings.BLOG_FEED_LENGTH]
+
+    def _serve_archive(self, request, kind, key):
+        archive = BlogArchive.objects.filter(blog_index=self, kind=kind, key=key).first()
+        if archive is None:
+            raise Http404
+        return self.render(request, archive=archive)
+
+    def get_context(self, request, *args, archive=None, **kwargs):
         context = super().get_context(request, *args, **kwargs)
 
-        # add featured post to the context:
-        context["featured_post"] = self.get_specific_featured_post(
-            is_preview_mode=request.is_preview,
-        )
-
-        # now paginate the rest
-        non_featured_posts = self.get_non_featured_ordered_posts(
-            is_preview_mode=request.is_preview,
-        )
-        paginator = Paginator(non_featured_posts, settings.BLOG_PAGINATION_PAGE_SIZE)
-        page = request.GET.get("page")
-        try:
-            posts = paginator.page(page)
-        except PageNotAnInteger:
-            posts = paginator.page(1)
-        except EmptyPage:
-            posts = paginator.page(paginator.num_pages)
+        if archive is None:
+            # add featured post to the context:
+            featured_post = context["featured_post"] = self.get_specific_featured_post(
+                is_preview_mode=request.is_preview,
+            )
+
+            # now paginate the rest
+            non_featured_posts = self.get_non_featured_ordered_posts(
+                exclude_featured_post=False,
+                is_preview_mode=request.is_preview,
+            )
+            if featured_post:
+                non_featured_posts = non_featured_posts.exclude(id=featured_post.id)
+            paginator = KeysetPaginator(
+                non_featured_posts,
+                settings.BLOG_PAGINATION_PAGE_SIZE,
+                fields=("date", "pk"),
+                # Previews list drafts too, so their page boundaries aren't shared
+                cache_key=None if request.is_preview else f"blog-index-{self.pk}",
+                tags=[children_tag(self)],
+            )
+        else:
+            # An archive lists all its posts, featured or not, from its own
+            # list of them, so it takes no longer to page through however
+            # many other posts there are
+            context["featured_post"] = None
+            context["archive"] = archive
+            paginator = KeysetPaginator(
+                archive.posts.all(),
+                settings.BLOG_PAGINATION_PAGE_SIZE,
+                fields=("date", "post_id"),
+                cache_key=f"blog-archive-{archive.pk}",
+                tags=[children_tag(self)],
+                transform=self._posts_for,
+            )
+        posts = paginator.get_page(request)
 
         context["non_featured_posts"] = posts
+        context["tag_archives"], context["month_archives"] = self.get_archives(request)
+
+        add_cache_tags(request, children_tag(self))
+        for post in [context["featured_post"], *posts]:
+            if post:
+                add_cache_tags(request, page_tag(post))
+                if post.feed_image_id:
+                    add_cache_tags(request, image_tag(post.feed_image_id))
         return context
 
+    def _posts_for(self, archived_posts) -> List[BlogPage]:
+        posts = BlogPage.objects.select_related("feed_image").prefetch_related("tags", "feed_image__renditions")
+        posts = posts.in_bulk([archived.post_id for archived in archived_posts])
+        return [posts[archived.post_id] for archived in archived_posts if archived.post_id in posts]
+
+    def get_archives(self, request):
+        "The blog's tag archives, by name, and its month archives, newest first, each with its URL"
+        index_url = self.get_url(request)
+        tag_archives, month_archives = [], []
+        for archive in self.archives.order_by("kind", "label"):
+            if archive.kind == ArchiveKind.TAG:
+                archive.url = index_url + self.reverse_subpage("tag", args=[archive.key])
+                tag_archives.append(archive)
+            else:
+                # YYYY-MM, keeping the month's leading zero
+                archive.url = index_url + self.reverse_subpage("month", args=archive.key.split("-"))
+                month_archives.append(archive)
+        month_archives.sort(key=lambda archive: archive.key, reverse=True)
+        return tag_archives, month_archives
+
     def get_non_featured_ordered_posts(
         self,
         exclude_featured_post=True,
         is_preview_mode=False,
     ):
-        posts = BlogPage.objects.child_of(self).specific().order_by("-date")
+        # Already specific, as BlogPages are all they can be, and with what
+        # each post's card shows
+        posts = (
+            BlogPage.objects.child_of(self).select_related("feed_image").prefetch_related("tags", "feed_image__renditions").order_by("-date", "-pk")
+        )
         if not is_preview_mode:
             # We only want live posts
             posts = posts.live()
@@ -1128,13 +1335,63 @@ class BlogIndexPage(BaseProtocolPage):
         self,
         is_preview_mode=False,
     ) -> List[BlogPage]:
-        base_qs = BlogPage.objects.child_of(self).specific().order_by("-date")
+        base_qs = BlogPage.objects.child_of(self).select_related("feed_image").order_by("-date", "-pk")
         if not is_preview_mode:
             # We only want live posts
             base_qs = base_qs.live()
         return base_qs.filter(is_featured=True).first()
 
 
+class ArchiveKind(TextChoices):
+    TAG = "tag", "Tag"
+    MONTH = "month", "Month"
+
+
+def month_key(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}"
+
+
+class BlogArchive(Model):
+    """A tag or a month of a blog's live posts, with how many there are. Kept
+    up to date as posts are published, unpublished, moved and deleted - see
+    microsite.archives - so that listing them needs no aggregate queries"""
+
+    blog_index = ForeignKey(BlogIndexPage, on_delete=CASCADE, related_name="archives")
+    kind = CharField(max_length=10, choices=ArchiveKind.choices)
+    # A tag's slug, or a month as YYYY-MM
+    key = CharField(max_length=100)
+    label = CharField(max_length=255)
+    post_count = PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["blog_index", "kind", "key"], name="unique_blog_archive"),
+        ]
+
+    def __str__(self):
+        return self.label
+
+
+class BlogArchivePost(Model):
+    "A post in a BlogArchive, with its date, so that an archive is paged through on just this table"
+
+    archive = ForeignKey(BlogArchive, on_delete=CASCADE, related_name="posts")
+    post = ForeignKey(BlogPage, on_delete=CASCADE, related_name="+")
+    date = DateField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["archive", "post"], name="unique_blog_archive_post"),
+        ]
+        indexes = [
+            # For keyset pagination (see common.pagination)
+            Index(fields=["archive", "date", "post"], name="blogarchivepost_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.archive}: {self.post_id}"
+
+
 @register_setting(icon="list-ul", order=2)
 class Footer(BaseGenericSetting):
     # Rather than model this as a Snippet + some singleton hackery and _then_
@@ -1369,6 +1626,8 @@ class ProtocolTestPage(BaseProtocolPage):
     DO NOT USE IN PRODUCTION
     """
 
+    stream_response = True
+
     # title comes from the base Page class
 
     body = StreamField(
@@ -0,0 +1,145 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Signal handlers that keep the CDN, the routing index, the redirect table
+and the blog archives in step with changes made in the CMS"""
+
+from django.db.models.signals import post_delete, post_save
+
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.documents import get_document_model
+from wagtail.images import get_image_model
+from wagtail.models import Page, PageViewRestriction, Site
+from wagtail.signals import page_published, page_slug_changed, page_unpublished, post_page_move
+
+from common import purging
+from common.cache_tags import NAV_TAG, children_tag, model_tag, page_tag, tag_for_object
+from common.redirects import invalidate_table
+from common.references import get_referrer_tags
+from common.routing import invalidate_index
+
+from .archives import update_archives
+from .models import BlogPage, Footer, FormStandardMessages, MicrositeSettings
+
+
+def purge_for_page_change(sender, instance, **kwargs):
+    # Purges the page itself, anything that renders or links to it, and any
+    # listing of its siblings (eg a BlogIndexPage and its BlogPages)
+    keys = [page_tag(instance), children_tag(instance.get_parent())]
+    if instance.show_in_menus:
+        keys.append(NAV_TAG)
+    purging.purge_keys(keys)
+
+
+def _purge_for_url_change(page, *parents):
+    # The page and everything below it now has a new URL, so anything that
+    # links to any of them is rendering a stale href
+    subtree = list(Page.objects.descendant_of(page, inclusive=True).only("pk", "show_in_menus"))
+    keys = [page_tag(p) for p in subtree]
+    keys.extend(children_tag(parent) for parent in parents if parent)
+    keys.extend(sorted(get_referrer_tags(subtree)))
+    if any(p.show_in_menus for p in subtree):
+        keys.append(NAV_TAG)
+    purging.purge_keys(keys)
+
+
+def purge_for_slug_change(sender, instance, **kwargs):
+    _purge_for_url_change(instance, instance.get_parent())
+
+
+def purge_for_page_move(sender, instance, parent_page_before=None, parent_page_after=None, **kwargs):
+    _purge_for_url_change(instance, parent_page_before, parent_page_after)
+
+
+def purge_for_sitewide_change(sender, instance, **kwargs):
+    # Settings, the Footer and the form wording are used by (nearly) every
+    # page, but only those responses will be tagged with them
+    purging.purge_keys([model_tag(instance)])
+
+
+def purge_for_media_change(sender, instance, **kwargs):
+    # Pages and feeds show an image's renditions, or link to a document, by
+    # URLs that change when its file is replaced, and go away with it
+    purging.purge_keys([tag_for_object(sender, instance.pk)])
+
+
+# The fields of a page that the routing index is built from. Saves of drafts,
+# locks and moderation only update other fields, and so can be ignored
+ROUTING_FIELDS = {"url_path", "slug", "live", "content_type", "destination"}
+
+
+def _changes_routing(page, created=False, update_fields=None):
+    if created:
+        # A new page is only routed to once it's published
+        return page.live
+    return update_fields is None or not ROUTING_FIELDS.isdisjoint(update_fields)
+
+
+def invalidate_in_memory_tables(sender, instance, created=False, update_fields=None, **kwargs):
+    if isinstance(instance, Page):
+        # Redirects to a page follow it once it's published, unpublished,
+        # moved or renamed (see invalidate_for_tree_change), and are
+        # deleted along with it
+        if _changes_routing(instance, created, update_fields):
+            invalidate_index()
+    elif isinstance(instance, Site):
+        # A site's hostname or port is in the URLs of pages that Redirects
+        # point to, when there's more than one site
+        invalidate_index()
+        invalidate_table()
+    elif isinstance(instance, PageViewRestriction):
+        invalidate_index()
+    elif isinstance(instance, Redirect):
+        invalidate_table()
+
+
+def invalidate_for_tree_change(sender, instance, **kwargs):
+    # Publishing, unpublishing, moves and slug changes are what change the
+    # live tree, and so the URLs of pages - moves and unpublishing
+    # descendants update pages in bulk, without saves
+    invalidate_index()
+    invalidate_table()
+
+
+def update_blog_archives(sender, instance, **kwargs):
+    # A post's archives follow its tags and date as published, and its blog
+    # index
+    if sender and issubclass(sender, BlogPage):
+        update_archives(instance.specific)
+
+
+def remove_from_blog_archives(sender, instance, **kwargs):
+    # Wagtail unpublishes live pages as they're deleted - while they're still
+    # live - so this takes deleted posts out of their archives too
+    if sender and issubclass(sender, BlogPage):
+        update_archives(instance.specific, removed=True)
+
+
+def register_signal_handlers():
+    page_published.connect(purge_for_page_change, dispatch_uid="cdn_purge_page_published")
+    page_unpublished.connect(purge_for_page_change, dispatch_uid="cdn_purge_page_unpublished")
+    page_slug_changed.connect(purge_for_slug_change, dispatch_uid="cdn_purge_page_slug_changed")
+    post_page_move.connect(purge_for_page_move, dispatch_uid="cdn_purge_page_moved")
+    for model in (MicrositeSettings, Footer, FormStandardMessages):
+        post_save.connect(
+            purge_for_sitewide_change,
+            sender=model,
+            dispatch_uid=f"cdn_purge_{model._meta.model_name}_saved",
+        )
+    for model in (get_image_model(), get_document_model()):
+        post_save.connect(purge_for_media_change, sender=model, dispatch_uid=f"cdn_purge_{model._meta.model_name}_saved")
+        post_delete.connect(purge_for_media_change, sender=model, dispatch_uid=f"cdn_purge_{model._meta.model_name}_deleted")
+
+    # Page saves are sent with the specific page type as the sender, so
+    # these can't be limited to a sender
+    post_save.connect(invalidate_in_memory_tables, dispatch_uid="in_memory_tables_saved")
+    post_delete.connect(invalidate_in_memory_tables, dispatch_uid="in_memory_tables_deleted")
+    page_published.connect(invalidate_for_tree_change, dispatch_uid="in_memory_tables_page_published")
+    page_unpublished.connect(invalidate_for_tree_change, dispatch_uid="in_memory_tables_page_unpublished")
+    post_page_move.connect(invalidate_for_tree_change, dispatch_uid="in_memory_tables_page_moved")
+    page_slug_changed.connect(invalidate_for_tree_change, dispatch_uid="in_memory_tables_page_slug_changed")
+
+    page_published.connect(update_blog_archives, dispatch_uid="blog_archives_page_published")
+    page_unpublished.connect(remove_from_blog_archives, dispatch_uid="blog_archives_page_unpublished")
+    post_page_move.connect(update_blog_archives, dispatch_uid="blog_archives_page_moved")
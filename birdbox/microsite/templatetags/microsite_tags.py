@@ -8,11 +8,22 @@ from typing import Dict, List
 
 from django.conf import settings
 from django.template import Library
+from django.templatetags.static import static
 
 from product_details import product_details
 from wagtail.blocks.struct_block import StructBlock
 from wagtail.models import Site
 
+from common.cache_tags import (
+    BASKET_TAG,
+    NAV_TAG,
+    add_cache_tags,
+    children_tag,
+    model_tag,
+    page_tag,
+    tags_for_references,
+)
+from common.preload import STYLE, add_preload
 from common.utils import (
     find_streamfield_blocks_by_types,
     get_freshest_newsletter_data,
@@ -54,8 +65,13 @@ def navigation(context) -> Dict:
         "cta_url": "",
     }
 
+    add_cache_tags(request, model_tag(microsite_settings), NAV_TAG)
+
     if microsite_settings.navigation_generate_nav_from_page_tree:
         context["nav_links"] = [child_page for child_page in homepage.get_children().defer_streamfields().live().public().in_menu()]
+        for nav_page in context["nav_links"]:
+            # The nav also lists each top-level page's in-menu children
+            add_cache_tags(request, page_tag(nav_page), children_tag(nav_page))
 
     if microsite_settings.navigation_show_cta_button:
         context["cta_label"] = microsite_settings.navigation_cta_button_label
@@ -69,8 +85,11 @@ def site_footer(context) -> Dict:
     request = context["request"]
 
     footer = Footer.load(request_or_site=request)
+    add_cache_tags(request, model_tag(Footer))
     if footer and not footer.display_footer:
         footer = None
+    if footer:
+        add_cache_tags(request, *tags_for_references(footer))
 
     return {"footer": footer}
 
@@ -79,7 +98,9 @@ def site_footer(context) -> Dict:
 def global_css_tag(context) -> Dict:
     request = context["request"]
     microsite_settings = MicrositeSettings.load(request_or_site=request)
+    add_cache_tags(request, model_tag(microsite_settings))
     filepath = f"css/protocol-{microsite_settings.site_theme}-theme.css"
+    add_preload(request, static(filepath), STYLE)
     return {"filepath": filepath}
 
 
@@ -136,6 +157,7 @@ def _get_language_name_for_locale(locale_code):
 @register.inclusion_tag("microsite/blocks/partials/_newsletter_fieldsets.html", takes_context=True)
 def newsletter_form_fieldset(context, newsletter_slugs: List[str]) -> Dict:
     newsletter_data = get_freshest_newsletter_data()
+    add_cache_tags(context.get("request"), BASKET_TAG)
 
     country_choices = sorted(
         # TODO: localise me, taking the locale code from context
@@ -170,8 +192,9 @@ def newsletter_form_fieldset(context, newsletter_slugs: List[str]) -> Dict:
     }
 
 
-@register.simple_tag
-def get_form_standard_messages():
+@register.simple_tag(takes_context=True)
+def get_form_standard_messages(context):
+    add_cache_tags(context.get("request"), model_tag(FormStandardMessages))
     return FormStandardMessages.objects.first()
 
 
@@ -213,23 +236,24 @@ def block_with_h1_exists_in_page(page: Page) -> bool:
     return len(candidate_blocks) > 0
 
 
-@register.inclusion_tag("microsite/partials/breadcrumbs.html")
-def breadcrumbs(page: Page) -> Dict[str, str]:
-    context = defaultdict(list)
-    context["show_breadcrumbs"] = page.specific.show_breadcrumbs
-    context["page"] = page
+@register.inclusion_tag("microsite/partials/breadcrumbs.html", takes_context=True)
+def breadcrumbs(context, page: Page) -> Dict[str, str]:
+    data = defaultdict(list)
+    data["show_breadcrumbs"] = page.specific.show_breadcrumbs
+    data["page"] = page
 
     # Exclude the Wagtail-internal site Root page, because that's not a viewable page
     ancestors_up_to_homepage = page.get_ancestors().defer_streamfields().live().public()[1:]
     for ancestor in ancestors_up_to_homepage:
-        context["ancestors"].append(
+        add_cache_tags(context.get("request"), page_tag(ancestor))
+        data["ancestors"].append(
             {
                 "title": ancestor.title,
                 "url": ancestor.url if not isinstance(ancestor.specific, StructuralPage) else None,
             }
         )
 
-    return context
+    return data
 
 
 @register.filter
@@ -0,0 +1,109 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from datetime import date
+
+from django.core.management import call_command
+
+import pytest
+
+from microsite.archives import rebuild_archives
+from microsite.models import ArchiveKind, BlogArchive, BlogIndexPage, BlogPage
+
+pytestmark = pytest.mark.django_db
+
+
+def _archives(blog_index):
+    return {
+        (archive.kind, archive.key): (archive.label, archive.post_count, sorted(archive.posts.values_list("post_id", flat=True)))
+        for archive in BlogArchive.objects.filter(blog_index=blog_index)
+    }
+
+
+def _publish(post, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        post.save_revision().publish()
+
+
+@pytest.fixture
+def blog_index(minimal_site_with_blog, django_capture_on_commit_callbacks):
+    blog_index = BlogIndexPage.objects.get()
+    bp1, bp2, bp3 = BlogPage.objects.order_by("date")
+    bp1.tags.add("Firefox", "Privacy")
+    bp3.tags.add("Firefox")
+    for post in (bp1, bp2, bp3):
+        _publish(post, django_capture_on_commit_callbacks)
+    return blog_index
+
+
+def test_archives_follow_publishing(blog_index, django_capture_on_commit_callbacks):
+    bp1, bp2, bp3 = BlogPage.objects.order_by("date")
+    assert _archives(blog_index) == {
+        (ArchiveKind.TAG, "firefox"): ("Firefox", 2, sorted([bp1.pk, bp3.pk])),
+        (ArchiveKind.TAG, "privacy"): ("Privacy", 1, [bp1.pk]),
+        (ArchiveKind.MONTH, "2023-05"): ("May 2023", 2, sorted([bp1.pk, bp2.pk])),
+        (ArchiveKind.MONTH, "2023-06"): ("June 2023", 1, [bp3.pk]),
+    }
+
+    # Retagged and redated
+    bp1.tags.set(["Privacy", "Security"])
+    bp1.date = date(2023, 6, 1)
+    _publish(bp1, django_capture_on_commit_callbacks)
+    assert _archives(blog_index) == {
+        (ArchiveKind.TAG, "firefox"): ("Firefox", 1, [bp3.pk]),
+        (ArchiveKind.TAG, "privacy"): ("Privacy", 1, [bp1.pk]),
+        (ArchiveKind.TAG, "security"): ("Security", 1, [bp1.pk]),
+        (ArchiveKind.MONTH, "2023-05"): ("May 2023", 1, [bp2.pk]),
+        (ArchiveKind.MONTH, "2023-06"): ("June 2023", 2, sorted([bp1.pk, bp3.pk])),
+    }
+
+    # Empty archives go
+    bp2.unpublish()
+    bp3.delete()
+    assert _archives(blog_index) == {
+        (ArchiveKind.TAG, "privacy"): ("Privacy", 1, [bp1.pk]),
+        (ArchiveKind.TAG, "security"): ("Security", 1, [bp1.pk]),
+        (ArchiveKind.MONTH, "2023-06"): ("June 2023", 1, [bp1.pk]),
+    }
+
+    # A post moved out of the blog leaves its archives
+    bp1.move(blog_index.get_parent(), pos="last-child")
+    assert _archives(blog_index) == {}
+
+
+def test_rebuilding_archives(blog_index, django_capture_on_commit_callbacks):
+    archives = _archives(blog_index)
+    BlogArchive.objects.all().delete()
+    call_command("rebuild_blog_archives")
+    assert _archives(blog_index) == archives
+    assert rebuild_archives(blog_index) == 4
+    assert _archives(blog_index) == archives
+
+
+def test_archive_pages(client, blog_index, settings):
+    settings.BLOG_PAGINATION_PAGE_SIZE = 1
+    bp1, bp2_featured, bp3 = BlogPage.objects.order_by("date")
+
+    content = client.get(blog_index.url).content.decode()
+    assert 'href="/blog-index/tag/firefox/">Firefox</a> (2)' in content
+    assert 'href="/blog-index/2023/05/">May 2023</a> (2)' in content
+
+    resp = client.get(f"{blog_index.url}tag/firefox/")
+    assert resp.status_code == 200
+    assert resp.context["archive"].label == "Firefox"
+    assert resp.context["featured_post"] is None
+    assert list(resp.context["non_featured_posts"]) == [bp3]
+    # Paged through as the index is
+    resp = client.get(f"{blog_index.url}tag/firefox/?{resp.context['non_featured_posts'].next_query()}")
+    assert list(resp.context["non_featured_posts"]) == [bp1]
+    assert list(client.get(f"{blog_index.url}tag/firefox/?page=2").context["non_featured_posts"]) == [bp1]
+
+    # A featured post is listed in its archives like any other
+    resp = client.get(f"{blog_index.url}2023/05/?page=1")
+    assert list(resp.context["non_featured_posts"]) == [bp2_featured]
+    assert "etag" in resp.headers
+
+    assert client.get(f"{blog_index.url}tag/unknown/").status_code == 404
+    assert client.get(f"{blog_index.url}2023/01/").status_code == 404
+    assert client.get(f"{blog_index.url}{bp1.slug}/").status_code == 200
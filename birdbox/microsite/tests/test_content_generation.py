@@ -0,0 +1,64 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from microsite.content_generation import stream_data
+from microsite.models import (
+    BlogPage,
+    FAQPage,
+    GeneralPurposePage,
+    InnovationsContentPage,
+    LongformArticlePage,
+    ProductPage,
+    ProtocolTestPage,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize(
+    "model, stream_field_name",
+    [
+        (GeneralPurposePage, "content"),
+        (ProductPage, "content"),
+        (LongformArticlePage, "content"),
+        (FAQPage, "content"),
+        (InnovationsContentPage, "content"),
+        (ProtocolTestPage, "body"),
+    ],
+)
+def test_stream_data_has_every_block(client, homepage, model, stream_field_name):
+    stream_field = getattr(model, stream_field_name)
+    data = stream_data(stream_field)
+    assert [block["type"] for block in data] == list(stream_field.field.stream_block.child_blocks)
+
+    page = homepage.add_child(instance=model(title=model.__name__, slug="generated", **{stream_field_name: data}))
+    resp = client.get(page.url)
+    assert resp.status_code == 200
+    _assert_forms_rendered(resp, data)
+
+
+def _assert_forms_rendered(resp, data):
+    content = resp.content.decode()
+    blocks = {block["type"] for block in data}
+    if "contact_form" in blocks:
+        assert "Get in touch" in content
+    if "newsletter_form" in blocks:
+        assert "Love the Web?" in content
+
+
+def test_stream_data_for_the_home_page(client, homepage):
+    homepage.content = stream_data(type(homepage).content)
+    homepage.save_revision().publish()
+    resp = client.get(homepage.url)
+    assert resp.status_code == 200
+    _assert_forms_rendered(resp, homepage.content.raw_data)
+
+
+def test_stream_data_for_blog_posts(minimal_site_with_blog, client):
+    post = BlogPage.objects.get(title="blog post 1")
+    post.body = stream_data(BlogPage.body, images=iter(lambda: post.feed_image_id, None))
+    post.save_revision().publish()
+    assert client.get(post.url).status_code == 200
@@ -0,0 +1,111 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from datetime import date
+from xml.etree import ElementTree
+
+import pytest
+from wagtail.images.tests.utils import get_test_image_file
+
+from microsite import feeds
+from microsite.models import BlogIndexPage, BlogPage
+
+pytestmark = pytest.mark.django_db
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+
+@pytest.fixture
+def blog_index(minimal_site_with_blog):
+    blog_index = BlogIndexPage.objects.get()
+    for post in BlogPage.objects.all():
+        post.standfirst = f"All about {post.title}"
+        post.save()
+    return blog_index
+
+
+@pytest.fixture
+def feed_builds(monkeypatch):
+    builds = []
+
+    def build_feed(*args, **kwargs):
+        builds.append(args)
+        return original(*args, **kwargs)
+
+    original = feeds.build_feed
+    monkeypatch.setattr(feeds, "build_feed", build_feed)
+    return builds
+
+
+def test_rss_feed(client, blog_index, settings):
+    settings.BLOG_FEED_LENGTH = 2
+    bp1, bp2, bp3 = BlogPage.objects.order_by("date")
+
+    resp = client.get(f"{blog_index.url}feed/rss/")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "application/rss+xml; charset=utf-8"
+    channel = ElementTree.fromstring(resp.content).find("channel")
+    assert channel.findtext("title") == blog_index.title
+    items = channel.findall("item")
+    # The latest posts, up to BLOG_FEED_LENGTH
+    assert [item.findtext("title") for item in items] == [bp3.title, bp2.title]
+    assert items[0].findtext("link") == bp3.get_full_url()
+    description = items[0].findtext("description")
+    assert "<p>All about blog post 3</p>" in description
+    assert f"{bp3.feed_image.get_rendition(feeds.FEED_IMAGE_FILTER).url}" in description
+
+
+def test_atom_feed(client, blog_index):
+    resp = client.get(f"{blog_index.url}feed/atom/")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "application/atom+xml; charset=utf-8"
+    entries = ElementTree.fromstring(resp.content).findall(f"{ATOM}entry")
+    assert [entry.findtext(f"{ATOM}title") for entry in entries] == ["blog post 3", "blog post 2 (featured)", "blog post 1"]
+
+
+def test_blog_index_links_to_its_feeds(client, blog_index):
+    content = client.get(blog_index.url).content.decode()
+    assert 'type="application/rss+xml" title="Blog Index" href="/blog-index/feed/rss/"' in content
+    assert 'type="application/atom+xml" title="Blog Index" href="/blog-index/feed/atom/"' in content
+
+
+def test_feed_is_only_built_again_when_the_posts_change(client, blog_index, feed_builds, django_capture_on_commit_callbacks):
+    url = f"{blog_index.url}feed/rss/"
+    resp = client.get(url)
+    etag = resp["ETag"]
+    assert resp["Last-Modified"]
+    assert len(feed_builds) == 1
+
+    # Pollers with a current copy get a 304, and others the stored copy
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert client.get(url).content == resp.content
+    # Nor is the XML built again for a new URL, eg with a query string
+    assert client.get(f"{url}?utm_source=reader").content == resp.content
+    assert len(feed_builds) == 1
+
+    post = BlogPage.objects.order_by("date").first()
+    new_post = blog_index.add_child(instance=BlogPage(title="blog post 4", slug="blog-post-4", date=date(2023, 7, 1), feed_image=post.feed_image))
+    with django_capture_on_commit_callbacks(execute=True):
+        new_post.save_revision().publish()
+
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+    assert b"blog post 4" in resp.content
+    assert len(feed_builds) == 2
+
+
+def test_feed_is_built_again_when_an_image_is_replaced(client, blog_index, feed_builds, django_capture_on_commit_callbacks):
+    url = f"{blog_index.url}feed/rss/"
+    etag = client.get(url)["ETag"]
+
+    image = BlogPage.objects.order_by("date").last().feed_image
+    image.file = get_test_image_file(filename="replaced.png")
+    with django_capture_on_commit_callbacks(execute=True):
+        image.save()
+
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert len(feed_builds) == 2
+    assert image.get_rendition(feeds.FEED_IMAGE_FILTER).url in resp.content.decode()
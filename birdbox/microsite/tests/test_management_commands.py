@@ -2,11 +2,18 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import json
+from datetime import date, datetime, timezone
+
 from django.core.management import call_command
 
 import pytest
+from wagtail.contrib.redirects.models import Redirect
+from wagtail.images.models import Image
+from wagtail.models import Page, ReferenceIndex
+from wagtail.rich_text import RichText
 
-from microsite.models import Footer
+from microsite.models import BlogIndexPage, BlogPage, Footer, GeneralPurposePage, StructuralPage
 
 
 @pytest.mark.django_db
@@ -53,3 +60,149 @@ def test_bootstrap_footer__smoke_test():
     assert fifth_link.get("label") == "Firefox Nightly for Android"
     assert fifth_link.get("page") is None
     assert fifth_link.get("rel") is None
+
+
+@pytest.mark.django_db
+def test_backfill_reference_index(minimal_site_with_blog):
+    post1, post2, post3 = BlogPage.objects.order_by("date")
+    post1.body = [("blogtext", RichText(f'<p><a linktype="page" id="{post3.pk}">Read this</a></p>'))]
+    post1.save()
+
+    expected = set(ReferenceIndex.objects.values_list("base_content_type", "object_id", "to_content_type", "to_object_id"))
+    assert expected
+
+    ReferenceIndex.objects.all().delete()
+    call_command("backfill_reference_index", batch_size=2)
+
+    assert set(ReferenceIndex.objects.values_list("base_content_type", "object_id", "to_content_type", "to_object_id")) == expected
+    assert ReferenceIndex.get_references_to(post3).get().object_id == str(post1.pk)
+
+    # Re-running is harmless
+    call_command("backfill_reference_index")
+    assert ReferenceIndex.objects.count() == len(expected)
+
+
+@pytest.mark.django_db
+def test_compression_report(minimal_site_with_blog, capsys):
+    call_command("compression_report", pages=3, repeat=1)
+    output = capsys.readouterr().out
+    assert "Sampled 3 pages" in output
+    assert "gzip           6" in output
+
+
+@pytest.mark.django_db
+def test_bulk_import_redirects(tmp_path, client, minimal_site_with_blog, capsys):
+    Redirect.objects.create(old_path="/existing", redirect_link="https://example.com/old")
+    csv_file = tmp_path / "redirects.csv"
+    csv_file.write_text(
+        "from,to\n"
+        "/existing/,https://example.com/new\n"
+        "/one/,https://example.com/one\n"
+        "two,/blog-index/\n"
+        "/bad/,not-a-link\n"
+        "/self/,/self/\n"
+        "/one/,https://example.com/one-again\n"
+    )
+
+    call_command("bulk_import_redirects", str(csv_file), batch_size=2)
+
+    output = capsys.readouterr().out
+    assert "created 2 and updated 1 redirects, skipped 2 invalid rows" in output
+    assert dict(Redirect.objects.values_list("old_path", "redirect_link")) == {
+        "/existing": "https://example.com/new",
+        "/one": "https://example.com/one-again",
+        "/two": "/blog-index/",
+    }
+    assert all(redirect.is_permanent and redirect.site is None for redirect in Redirect.objects.all())
+
+    # Bulk inserts send no signals, but the redirects take effect straight away
+    resp = client.get("/two/")
+    assert resp.status_code == 301
+    assert resp["Location"] == "/blog-index/"
+
+
+@pytest.mark.django_db
+def test_load_test__made_up_requests(tmp_path, minimal_site_with_blog, capsys):
+    report_file = tmp_path / "report.json"
+    call_command("load_test", requests=40, concurrency=1, warmup=0, json=str(report_file))
+
+    output = capsys.readouterr().out
+    assert "40 requests, 1 at a time (threads)" in output
+    assert "Slowest paths, by median:" in output
+    report = json.loads(report_file.read_text())
+    assert report["requests"] == 40
+    assert report["statuses"]["200"] > 30
+    assert report["error_rate"] == 0
+    assert report["queries"]["mean"] > 0
+    assert report["cache_calls"]["mean"] > 0
+    assert set(report["latency_ms"]) == {"p50", "p90", "p95", "p99", "max"}
+
+
+@pytest.mark.django_db
+def test_load_test__access_log(tmp_path, minimal_site_with_blog, capsys):
+    access_log = tmp_path / "access.log"
+    access_log.write_text(
+        '10.0.0.1 - - [19/Oct/2026:12:00:00 +0000] "GET /blog-index/?page=1 HTTP/1.1" 200 1234 "-" "Mozilla/5.0"\n'
+        '10.0.0.2 - - [19/Oct/2026:12:00:01 +0000] "POST /newsletter/ HTTP/1.1" 302 0 "-" "Mozilla/5.0"\n'
+        '10.0.0.3 - - [19/Oct/2026:12:00:02 +0000] "HEAD /nothing-here/ HTTP/1.1" 404 0 "-" "curl/8.0"\n'
+        "Not an access log line\n"
+    )
+    report_file = tmp_path / "report.json"
+    call_command("load_test", access_log=str(access_log), requests=5, concurrency=1, host="testserver", json=str(report_file))
+
+    assert "Skipped 2 lines" in capsys.readouterr().out
+    assert json.loads(report_file.read_text())["statuses"] == {"200": 3, "404": 2}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test__concurrent(tmp_path, minimal_site_with_blog):
+    report_file = tmp_path / "report.json"
+    call_command("load_test", requests=20, concurrency=4, json=str(report_file))
+    report = json.loads(report_file.read_text())
+    assert report["requests"] == 20
+    # Not checking for errors: the in-memory test database can be locked by
+    # another thread's write, where a real SQLite file would wait its turn
+    assert sum(report["statuses"].values()) == 20
+
+
+@pytest.mark.django_db
+def test_generate_content(client, homepage, settings, tmp_path, capsys):
+    settings.MEDIA_ROOT = str(tmp_path)
+    options = dict(parent=homepage.pk, images=3, blog_posts=5, tags=4, authors=2, depth=2, breadth=2, nav_sections=2, nav_pages=2, blocks=2, seed=1)
+    call_command("generate_content", **options)
+
+    assert "Generated content in" in capsys.readouterr().out
+    assert Image.objects.count() == 3
+    assert BlogPage.objects.count() == 5
+    # The hierarchy's 2 sections with 2 pages each, and each nav section's 2 pages
+    assert GeneralPurposePage.objects.count() == 4 + 4
+    assert StructuralPage.objects.count() == 1 + 2 + 2
+    # The tree is intact, treebeard's paths and numchild and all
+    assert Page.find_problems() == ([], [], [], [], [])
+
+    post = BlogPage.objects.order_by("pk").first()
+    assert post.tags.count() == 3
+    assert post.authors.count() == 1
+    assert client.get(post.url).status_code == 200
+    nav_page = GeneralPurposePage.objects.filter(show_in_menus=True).first()
+    assert len(nav_page.content) == 2 * len(GeneralPurposePage.content.field.stream_block.child_blocks)
+    resp = client.get(nav_page.url)
+    assert resp.status_code == 200
+    assert b"Generated section" in resp.content
+
+    # The same seed generates the same content again, alongside the first lot
+    call_command("generate_content", **options)
+    first, second = (blog_index.get_children().specific().first() for blog_index in BlogIndexPage.objects.order_by("pk"))
+    assert first.slug == second.slug
+    assert list(first.tags.names()) == list(second.tags.names())
+    assert first.feed_image.title == second.feed_image.title
+    # Whatever day it's run on
+    assert first.date == second.date == date(2024, 1, 1)
+    assert first.first_published_at == second.first_published_at == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.django_db
+def test_generate_content__base_date(homepage):
+    call_command("generate_content", f"--parent={homepage.pk}", "--blog-posts=3", "--base-date=2023-03-02")
+    assert list(BlogPage.objects.order_by("date").values_list("date", flat=True)) == [date(2023, 2, 28), date(2023, 3, 1), date(2023, 3, 2)]
+    assert {post.first_published_at.date() for post in BlogPage.objects.all()} == {date(2023, 3, 2)}
@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from datetime import date
 
 from django.test import RequestFactory
 
@@ -77,3 +78,95 @@ def test_live_vs_draft_blog_post_visibility__draft_view(
     context = index.get_context(request)
     assert context["featured_post"] == bp2_featured
     assert [x for x in context["non_featured_posts"]] == [bp3, bp1]
+
+
+@pytest.mark.django_db
+def test_blog_index_page__cache_tag_headers(
+    client,
+    minimal_site_with_blog,
+):
+    index = BlogIndexPage.objects.get()
+    posts = BlogPage.objects.live().all()
+
+    resp = client.get(index.url)
+    assert resp.status_code == 200
+
+    surrogate_keys = resp["Surrogate-Key"].split(" ")
+    assert surrogate_keys[0] == f"p{index.pk}"
+    assert f"c{index.pk}" in surrogate_keys
+    for post in posts:
+        assert f"p{post.pk}" in surrogate_keys
+
+    assert resp["Cache-Tag"].split(",") == surrogate_keys
+
+
+@pytest.mark.django_db
+def test_blog_index_page__preload_headers(
+    client,
+    minimal_site_with_blog,
+):
+    index = BlogIndexPage.objects.get()
+    featured_post = index.get_specific_featured_post()
+
+    resp = client.get(index.url)
+    assert resp.status_code == 200
+
+    links = resp["Link"].split(", ")
+    assert any(link.endswith("; rel=preload; as=style") and "/css/protocol-mozilla-theme" in link for link in links)
+    assert any(link.endswith("; rel=preload; as=script") and "/js/protocol-base" in link for link in links)
+    image_links = [link for link in links if link.endswith("as=image")]
+    assert len(image_links) == 1
+    assert featured_post.feed_image.get_rendition("original").url in image_links[0]
+
+    # And served with the stored copy of the page, without rendering
+    resp = client.get(index.url)
+    assert getattr(resp, "precompressed", False)
+    assert resp["Link"].split(", ") == links
+
+
+@pytest.mark.django_db
+def test_blog_index_page__pagination(
+    client,
+    minimal_site_with_blog,
+    settings,
+    django_capture_on_commit_callbacks,
+):
+    settings.BLOG_PAGINATION_PAGE_SIZE = 1
+    index = BlogIndexPage.objects.get()
+    bp1, bp2_featured, bp3 = BlogPage.objects.live().all()
+
+    resp = client.get(index.url)
+    assert list(resp.context["non_featured_posts"]) == [bp3]
+    content = resp.content.decode()
+    # The featured post is only on the first page
+    assert bp2_featured.title in content
+    assert f'href="?after={bp3.date}.{bp3.pk}" class="next"' in content
+    assert 'href="?page=2"' in content
+
+    resp = client.get(f"{index.url}?after={bp3.date}.{bp3.pk}")
+    assert list(resp.context["non_featured_posts"]) == [bp1]
+    content = resp.content.decode()
+    assert bp2_featured.title not in content
+    assert f'href="?before={bp1.date}.{bp1.pk}" class="prev"' in content
+    assert 'class="next"' not in content
+    # The old numbered links still work
+    assert list(client.get(f"{index.url}?page=2").context["non_featured_posts"]) == [bp1]
+
+    # Publishing a post changes the pages
+    bp4 = index.add_child(instance=BlogPage(title="blog post 4", slug="blog-post-4", date=date(2023, 7, 1), feed_image=bp1.feed_image))
+    with django_capture_on_commit_callbacks(execute=True):
+        bp4.save_revision().publish()
+    assert list(client.get(f"{index.url}?page=2").context["non_featured_posts"]) == [bp3]
+
+
+@pytest.mark.django_db
+def test_featured_post_without_an_image(client, minimal_site_with_blog):
+    featured = BlogPage.objects.get(is_featured=True)
+    # Its image is deleted, leaving feed_image null
+    featured.feed_image.delete()
+
+    resp = client.get(BlogIndexPage.objects.get().url)
+    assert resp.status_code == 200
+    assert b'src=""' not in resp.content
+    assert "<>" not in resp.get("Link", "")
+    assert featured.title in resp.content.decode()
@@ -0,0 +1,168 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+from unittest import mock
+
+import pytest
+import wagtail_factories
+from wagtail.images.tests.utils import get_test_image_file
+
+from microsite.models import BlogIndexPage, BlogPage, Footer, HomePage, MicrositeSettings
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def mock_dispatcher():
+    with mock.patch("common.purging.dispatcher") as _mock_dispatcher:
+        yield _mock_dispatcher
+
+
+def test_publishing_a_page_purges_it_and_its_siblings_listing(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    post = BlogPage.objects.get(title="blog post 1")
+    post.title = "Updated"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.save_revision().publish()
+
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"p{post.pk}", f"c{post.get_parent().pk}"])
+
+
+def test_unpublishing_a_page_purges_it(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    post = BlogPage.objects.get(title="blog post 1")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post.unpublish()
+
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"p{post.pk}", f"c{post.get_parent().pk}"])
+
+
+def test_publishing_a_page_shown_in_the_nav_purges_the_nav(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    index = BlogIndexPage.objects.get()
+    index.show_in_menus = True
+
+    with django_capture_on_commit_callbacks(execute=True):
+        index.save_revision().publish()
+
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"p{index.pk}", f"c{index.get_parent().pk}", "nav"])
+
+
+def test_changing_a_slug_purges_the_subtree_and_anything_linking_to_it(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    index = BlogIndexPage.objects.get()
+    post1, post2, post3 = BlogPage.objects.order_by("date")
+    homepage = HomePage.objects.get()
+    footer = Footer.load()
+    footer.columns = json.dumps(
+        [
+            {
+                "type": "grouped_links",
+                "value": {
+                    "title": "Blog",
+                    "links": [{"label": "Post 3", "page": post3.pk, "external_url": "", "rel": ""}],
+                },
+            }
+        ]
+    )
+    footer.save()
+    mock_dispatcher.reset_mock()
+
+    index.slug = "news"
+    with django_capture_on_commit_callbacks(execute=True):
+        index.save_revision().publish()
+
+    keys = set()
+    for call in mock_dispatcher.queue.call_args_list:
+        keys.update(call.kwargs["keys"])
+    assert keys == {
+        f"p{index.pk}",
+        f"p{post1.pk}",
+        f"p{post2.pk}",
+        f"p{post3.pk}",
+        f"c{homepage.pk}",
+        # The Footer links to post3, so every page with the footer is stale
+        "footer",
+    }
+
+
+def test_moving_a_page_purges_the_subtree_and_both_listings(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    index = BlogIndexPage.objects.get()
+    post1 = BlogPage.objects.order_by("date").first()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        post1.move(index.get_parent(), pos="last-child")
+
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"p{post1.pk}", f"c{index.pk}", f"c{index.get_parent().pk}"])
+
+
+def test_purge_only_happens_if_the_transaction_commits(
+    minimal_site_with_blog,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    post = BlogPage.objects.get(title="blog post 1")
+    with django_capture_on_commit_callbacks(execute=False):
+        post.save_revision().publish()
+    assert mock_dispatcher.queue.call_count == 0
+
+
+@pytest.mark.parametrize("model", (MicrositeSettings, Footer))
+def test_saving_sitewide_settings_purges_pages_tagged_with_them(
+    model,
+    bootstrap_minimal_site,
+    mock_dispatcher,
+    django_capture_on_commit_callbacks,
+):
+    instance = model.load()
+    with django_capture_on_commit_callbacks(execute=True):
+        instance.save()
+
+    mock_dispatcher.queue.assert_called_once_with(keys=[model._meta.model_name])
+
+
+def test_replacing_or_deleting_an_image_purges_pages_tagged_with_it(mock_dispatcher, django_capture_on_commit_callbacks):
+    image = wagtail_factories.ImageFactory()
+    image_id = image.pk
+
+    image.file = get_test_image_file(filename="replaced.png")
+    with django_capture_on_commit_callbacks(execute=True):
+        image.save()
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"i{image_id}"])
+
+    mock_dispatcher.reset_mock()
+    with django_capture_on_commit_callbacks(execute=True):
+        image.delete()
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"i{image_id}"])
+
+
+def test_saving_or_deleting_a_document_purges_pages_tagged_with_it(mock_dispatcher, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        document = wagtail_factories.DocumentFactory()
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"d{document.pk}"])
+
+    document_id = document.pk
+    mock_dispatcher.reset_mock()
+    with django_capture_on_commit_callbacks(execute=True):
+        document.delete()
+    mock_dispatcher.queue.assert_called_once_with(keys=[f"d{document_id}"])
@@ -2,15 +2,65 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import time
 from datetime import date
 
 import pytest
 import wagtail_factories
+from wagtailstreamforms.models import Form
 
 from microsite.models import HomePage
 from microsite.tests.factories import BlogIndexPageFactory, BlogPageFactory, HomePageFactory
 
 
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="Run the benchmarks in birdbox/benchmarks, which are skipped by default",
+    )
+    parser.addoption(
+        "--benchmark-json",
+        default=None,
+        help="Write the benchmarks' results to this file, as JSON",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: slow performance measurement, only run with --run-benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="Benchmarks only run with --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
+
+
+@pytest.fixture
+def log_in(client):
+    "Logs the test client in as the given user"
+
+    def _log_in(user):
+        client.force_login(user)
+        session = client.session
+        # Stops mozilla_django_oidc.middleware.SessionRefresh from sending us to log in again
+        session["oidc_id_token_expiration"] = time.time() + 3600
+        session.save()
+
+    return _log_in
+
+
+@pytest.fixture
+def staff_client(client, admin_user, log_in):
+    "The test client, logged in as a superuser"
+    log_in(admin_user)
+    return client
+
+
 @pytest.fixture
 def bootstrap_minimal_site(
     client,
@@ -54,3 +104,14 @@ def minimal_site_with_blog(bootstrap_minimal_site):
         title="blog post 3",
         date=date(2023, 6, 12),
     )
+
+
+@pytest.fixture
+def streamform():
+    "A wagtailstreamforms form with no fields, which thanks whoever submits it"
+    return Form.objects.create(
+        title="Feedback",
+        slug="feedback",
+        template_name="streamforms/form_block.html",
+        success_message="Thanks for your feedback",
+    )
@@ -7,6 +7,7 @@
 set -exo pipefail
 
 python birdbox/manage.py collectstatic --noinput --clear
+python birdbox/manage.py build_css_bundles
 
 # See Bedrock's build_staticfiles.sh if we want to link unhashed to hashed to
 # reduce Docker image space
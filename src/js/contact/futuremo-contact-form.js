@@ -13,6 +13,8 @@ import {
     postToEmailServer,
 } from "./form-utils";
 
+import { fetchCsrfToken } from "../csrf/csrf-token";
+
 // import "@mozilla-protocol/core/protocol/js/protocol-newsletter.min.js";
 import MzpNewsletter from "@mozilla-protocol/core/protocol/js/newsletter";
 
@@ -94,17 +96,6 @@ const EmailForm = {
     },
 
     submit: (e) => {
-        const csrfToken = form.querySelector(
-            '[name="csrfmiddlewaretoken"]'
-        ).value;
-        const email = form.querySelector('input[type="email"]').value;
-        const url = form.getAttribute("action");
-        const interests = Array.from(
-            form.querySelectorAll('input[name="interests"]:checked')
-        )
-            .map((interests) => `${interests.value}`)
-            .join(",");
-
         e.preventDefault();
         e.stopPropagation();
 
@@ -119,6 +110,22 @@ const EmailForm = {
             return;
         }
 
+        // The page may have been rendered without a CSRF token, in which
+        // case one is fetched now.
+        fetchCsrfToken(form).then(EmailForm.send, () =>
+            EmailForm.handleFormError()
+        );
+    },
+
+    send: (csrfToken) => {
+        const email = form.querySelector('input[type="email"]').value;
+        const url = form.getAttribute("action");
+        const interests = Array.from(
+            form.querySelectorAll('input[name="interests"]:checked')
+        )
+            .map((interests) => `${interests.value}`)
+            .join(",");
+
         if (isBuilderPage) {
             const newsletters =
                 interests.length > 0
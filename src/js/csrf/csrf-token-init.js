@@ -0,0 +1,36 @@
+/*
+ * This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+// For regular (non-XHR) forms rendered without a CSRF token: fetch one
+// just before the form is submitted.
+
+import { fetchCsrfToken } from "./csrf-token";
+
+const fields = document.querySelectorAll("input[data-csrf-token-url]");
+
+for (let i = 0; i < fields.length; i++) {
+    const field = fields[i];
+    const form = field.form;
+
+    // This script is included once per form, so may run more than once
+    if (form && !form.dataset.csrfTokenBound) {
+        form.dataset.csrfTokenBound = "true";
+
+        form.addEventListener("submit", (e) => {
+            if (field.value) {
+                return;
+            }
+            e.preventDefault();
+            // If the token can't be fetched, submit anyway (without firing
+            // this handler again) and let the server show its usual CSRF
+            // failure page
+            fetchCsrfToken(form).then(
+                () => form.requestSubmit(e.submitter),
+                () => form.submit()
+            );
+        });
+    }
+}
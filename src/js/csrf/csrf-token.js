@@ -0,0 +1,42 @@
+/*
+ * This Source Code Form is subject to the terms of the Mozilla Public
+ * License, v. 2.0. If a copy of the MPL was not distributed with this
+ * file, You can obtain one at https://mozilla.org/MPL/2.0/.
+ */
+
+/**
+ * Get the CSRF token for a form.
+ * When FORMS_FETCH_CSRF_TOKEN is on, the page is rendered with an empty
+ * token field that names the URL to fetch a token from; otherwise the
+ * token is already in the page.
+ * @param {HTMLFormElement} form
+ * @returns {Promise<String>}
+ */
+function fetchCsrfToken(form) {
+    const field = form.querySelector('[name="csrfmiddlewaretoken"]');
+
+    if (!field) {
+        return Promise.resolve("");
+    }
+
+    const url = field.getAttribute("data-csrf-token-url");
+    if (!url || field.value) {
+        return Promise.resolve(field.value);
+    }
+
+    return fetch(url, { credentials: "same-origin", cache: "no-store" })
+        .then((response) => {
+            if (!response.ok) {
+                throw new Error(
+                    `Could not fetch CSRF token: ${response.status}`
+                );
+            }
+            return response.json();
+        })
+        .then((data) => {
+            field.value = data.csrfToken;
+            return data.csrfToken;
+        });
+}
+
+export { fetchCsrfToken };
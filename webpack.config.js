@@ -63,6 +63,7 @@ module.exports = {
 
         // custom JS
         "futuremo-contact-form-js": "./src/js/contact/futuremo-contact-form.js",
+        "csrf-token": "./src/js/csrf/csrf-token-init.js",
     },
     output: {
         filename: "js/[name].js",